@@ -2,6 +2,7 @@ from .client import Client
 from .deezer import DeezerClient
 from .downloadable import BasicDownloadable, Downloadable
 from .qobuz import QobuzClient
+from .session_store import SessionStore
 from .soundcloud import SoundcloudClient
 from .tidal import TidalClient
 
@@ -13,4 +14,5 @@ __all__ = [
     "SoundcloudClient",
     "Downloadable",
     "BasicDownloadable",
+    "SessionStore",
 ]
@@ -9,6 +9,7 @@ import aiolimiter
 
 from ..utils.ssl_utils import get_aiohttp_connector_kwargs
 from .downloadable import Downloadable
+from .session_store import SessionStore
 
 logger = logging.getLogger("streamrip")
 
@@ -22,6 +23,8 @@ class Client(ABC):
     max_quality: int
     session: aiohttp.ClientSession
     logged_in: bool
+    # Saved login state from previous runs. None disables it.
+    sessions: SessionStore | None = None
 
     @abstractmethod
     async def login(self):
@@ -39,6 +42,21 @@ class Client(ABC):
     async def get_downloadable(self, item: str, quality: int) -> Downloadable:
         raise NotImplementedError
 
+    def load_session(self, credentials: str) -> dict | None:
+        """Get the login state saved by a previous run, if still valid."""
+        if self.sessions is None:
+            return None
+        return self.sessions.get(self.source, credentials)
+
+    def save_session(self, credentials: str, state: dict, expiry: float):
+        """Save login state so that later runs can skip logging in."""
+        if self.sessions is not None:
+            self.sessions.set(self.source, credentials, state, expiry)
+
+    def forget_session(self):
+        if self.sessions is not None:
+            self.sessions.remove(self.source)
+
     @staticmethod
     def get_rate_limiter(
         requests_per_min: int,
@@ -2,6 +2,7 @@ import asyncio
 import binascii
 import hashlib
 import logging
+import time
 
 import deezer
 from Cryptodome.Cipher import AES
@@ -14,10 +15,14 @@ from ..exceptions import (
 )
 from .client import Client
 from .downloadable import DeezerDownloadable
+from .session_store import SessionStore
 
 logger = logging.getLogger("streamrip")
 logging.captureWarnings(True)
 
+# How long a logged in ARL session is reused before logging in again
+SESSION_TTL = 86400
+
 
 class DeezerClient(Client):
     """Client to handle deezer API. Does not do rate limiting.
@@ -34,11 +39,12 @@ class DeezerClient(Client):
     source = "deezer"
     max_quality = 2
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, sessions: SessionStore | None = None):
         self.global_config = config
         self.client = deezer.Deezer()
         self.logged_in = False
         self.config = config.session.deezer
+        self.sessions = sessions
 
     async def login(self):
         # Used for track downloads
@@ -48,11 +54,35 @@ class DeezerClient(Client):
         arl = self.config.arl
         if not arl:
             raise MissingCredentialsError
-        success = self.client.login_via_arl(arl)
-        if not success:
-            raise AuthenticationError
+
+        saved = self.load_session(arl)
+        if saved is not None:
+            logger.debug("Using saved Deezer session")
+            self._restore_session(saved, arl)
+        else:
+            success = await asyncio.to_thread(self.client.login_via_arl, arl)
+            if not success:
+                raise AuthenticationError
+            self.save_session(arl, self._session_state(), time.time() + SESSION_TTL)
         self.logged_in = True
 
+    def _session_state(self) -> dict:
+        # The cookies hold the ARL and the session ID, which are credentials.
+        # They are left out and the ARL cookie is set again from the config.
+        state = self.client.get_session()
+        state.pop("cookies", None)
+        return state
+
+    def _restore_session(self, state: dict, arl: str):
+        self.client.set_session(state | {"cookies": {}})
+        self.client.session.cookies.set(
+            "arl", arl.strip(), domain=".deezer.com", path="/"
+        )
+        # deezer-py's set_session replaces its requests session without
+        # updating the API wrappers, which still hold the old one
+        self.client.api.session = self.client.gw.session = self.client.session
+        self.client.change_account(self.client.selected_account)
+
     async def get_metadata(self, item_id: str, media_type: str) -> dict:
         # TODO: open asyncio PR to deezer py and integrate
         if media_type == "track":
@@ -172,13 +202,14 @@ class DeezerClient(Client):
             raise NonStreamableError(
                 "The requested quality is not available with your subscription. "
                 "Deezer HiFi is required for quality 2. Otherwise, the maximum "
-                "quality allowed is 1.",
+                "quality allowed is 1."
             )
         except deezer.WrongGeolocation:
             if not is_retry and fallback_id:
                 return await self.get_downloadable(fallback_id, quality, is_retry=True)
             raise NonStreamableError(
                 "The requested track is not available. This may be due to your country/location.",
+                permanent=True,
             )
 
         if url is None:
@@ -22,7 +22,8 @@ from Cryptodome.Cipher import AES, Blowfish
 from Cryptodome.Util import Counter
 
 from .. import converter
-from ..exceptions import NonStreamableError
+from ..exceptions import NonStreamableError, restriction_error
+from ..metadata import TagSpaceReserver
 
 logger = logging.getLogger("streamrip")
 
@@ -37,16 +38,22 @@ def generate_temp_path(url: str):
     )
 
 
-async def fast_async_download(path, url, headers, callback):
+async def fast_async_download(
+    path, url, headers, callback, extension: str = "", tag_space: int = 0
+):
     """Synchronous download with yield for every 1MB read.
 
     Using aiofiles/aiohttp resulted in a yield to the event loop for every 1KB,
     which made file downloads CPU-bound. This resulted in a ~10MB max total download
     speed. This fixes the issue by only yielding to the event loop for every 1MB read.
+
+    If `tag_space` is given, at least that many bytes are reserved for tags at
+    the start of the file, so that tagging it doesn't rewrite the whole file.
     """
     chunk_size: int = 2**17  # 131 KB
     counter = 0
     yield_every = 8  # 1 MB
+    reserver = TagSpaceReserver(extension, tag_space)
     with open(path, "wb") as file:  # noqa: ASYNC101
         with requests.get(  # noqa: ASYNC100
             url,
@@ -55,11 +62,12 @@ async def fast_async_download(path, url, headers, callback):
             stream=True,
         ) as resp:
             for chunk in resp.iter_content(chunk_size=chunk_size):
-                file.write(chunk)
+                file.write(reserver.feed(chunk))
                 callback(len(chunk))
                 if counter % yield_every == 0:
                     await asyncio.sleep(0)
                 counter += 1
+        file.write(reserver.flush())
 
 
 @dataclass(slots=True)
@@ -70,8 +78,10 @@ class Downloadable(ABC):
     source: str = "Unknown"
     _size_base: Optional[int] = None
 
-    async def download(self, path: str, callback: Callable[[int], Any]):
-        await self._download(path, callback)
+    async def download(
+        self, path: str, callback: Callable[[int], Any], tag_space: int = 0
+    ):
+        await self._download(path, callback, tag_space)
 
     async def size(self) -> int:
         if hasattr(self, "_size") and self._size is not None:
@@ -92,7 +102,9 @@ class Downloadable(ABC):
         self._size_base = v
 
     @abstractmethod
-    async def _download(self, path: str, callback: Callable[[int], None]):
+    async def _download(
+        self, path: str, callback: Callable[[int], None], tag_space: int = 0
+    ):
         raise NotImplementedError
 
 
@@ -112,8 +124,10 @@ class BasicDownloadable(Downloadable):
         self._size = None
         self.source: str = source or "Unknown"
 
-    async def _download(self, path: str, callback):
-        await fast_async_download(path, self.url, self.session.headers, callback)
+    async def _download(self, path: str, callback, tag_space: int = 0):
+        await fast_async_download(
+            path, self.url, self.session.headers, callback, self.extension, tag_space
+        )
 
 
 class DeezerDownloadable(Downloadable):
@@ -130,6 +144,7 @@ class DeezerDownloadable(Downloadable):
         if len(qualities_available) == 0:
             raise NonStreamableError(
                 "Missing download info. Skipping.",
+                permanent=True,
             )
         max_quality_available = max(qualities_available)
         self.quality = min(info["quality"], max_quality_available)
@@ -140,7 +155,7 @@ class DeezerDownloadable(Downloadable):
             self.extension = "flac"
         self.id = str(info["id"])
 
-    async def _download(self, path: str, callback):
+    async def _download(self, path: str, callback, tag_space: int = 0):
         # with requests.Session().get(self.url, allow_redirects=True) as resp:
         async with self.session.get(self.url, allow_redirects=True) as resp:
             resp.raise_for_status()
@@ -160,7 +175,12 @@ class DeezerDownloadable(Downloadable):
             if self.is_encrypted.search(self.url) is None:
                 logger.debug(f"Deezer file at {self.url} not encrypted.")
                 await fast_async_download(
-                    path, self.url, self.session.headers, callback
+                    path,
+                    self.url,
+                    self.session.headers,
+                    callback,
+                    self.extension,
+                    tag_space,
                 )
             else:
                 blowfish_key = self._generate_blowfish_key(self.id)
@@ -177,6 +197,7 @@ class DeezerDownloadable(Downloadable):
                     callback(len(data))
 
                 encrypt_chunk_size = 3 * 2048
+                reserver = TagSpaceReserver(self.extension, tag_space)
                 async with aiofiles.open(path, "wb") as audio:
                     buflen = len(buf)
                     for i in range(0, buflen, encrypt_chunk_size):
@@ -188,7 +209,8 @@ class DeezerDownloadable(Downloadable):
                             )
                         else:
                             decrypted_chunk = data
-                        await audio.write(decrypted_chunk)
+                        await audio.write(reserver.feed(decrypted_chunk))
+                    await audio.write(reserver.flush())
 
     @staticmethod
     def _decrypt_chunk(key, data):
@@ -240,12 +262,8 @@ class TidalDownloadable(Downloadable):
             self.extension = "m4a"
 
         if url is None:
-            # Turn CamelCase code into a readable sentence
             if restrictions:
-                words = re.findall(r"([A-Z][a-z]+)", restrictions[0]["code"])
-                raise NonStreamableError(
-                    words[0] + " " + " ".join(map(str.lower, words[1:])),
-                )
+                raise restriction_error(restrictions[0]["code"])
             raise NonStreamableError(
                 f"Tidal download: dl_info = {url, codec, encryption_key}"
             )
@@ -253,12 +271,16 @@ class TidalDownloadable(Downloadable):
         self.enc_key = encryption_key
         self.downloadable = BasicDownloadable(session, url, self.extension, "tidal")
 
-    async def _download(self, path: str, callback):
+    async def _download(self, path: str, callback, tag_space: int = 0):
+        if self.enc_key is None:
+            await self.downloadable._download(path, callback, tag_space)
+            return
+
         await self.downloadable._download(path, callback)
-        if self.enc_key is not None:
-            dec_bytes = await self._decrypt_mqa_file(path, self.enc_key)
-            async with aiofiles.open(path, "wb") as audio:
-                await audio.write(dec_bytes)
+        dec_bytes = await self._decrypt_mqa_file(path, self.enc_key)
+        reserver = TagSpaceReserver(self.extension, tag_space)
+        async with aiofiles.open(path, "wb") as audio:
+            await audio.write(reserver.feed(dec_bytes) + reserver.flush())
 
     @property
     def _size(self):
@@ -319,7 +341,8 @@ class SoundcloudDownloadable(Downloadable):
             raise Exception(f"Invalid file type: {self.file_type}")
         self.url = info["url"]
 
-    async def _download(self, path, callback):
+    async def _download(self, path, callback, tag_space: int = 0):
+        # Both are written by FFmpeg, which sets its own padding
         if self.file_type == "mp3":
             await self._download_mp3(path, callback)
         else:
@@ -389,11 +412,12 @@ async def concat_audio_files(paths: list[str], out: str, ext: str, max_files_ope
     num_batches = len(paths) // max_files_open + (
         1 if len(paths) % max_files_open != 0 else 0
     )
-    tempdir = tempfile.gettempdir()
+    # Next to the output, so that the final move is a rename, not a copy
+    tempdir = os.path.dirname(out) or os.curdir
     outpaths = [
         os.path.join(
             tempdir,
-            f"__streamrip_ffmpeg_{hash(paths[i*max_files_open])}.{ext}",
+            f".__streamrip_ffmpeg_{hash(paths[i*max_files_open])}.{ext}",
         )
         for i in range(num_batches)
     ]
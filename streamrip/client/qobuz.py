@@ -5,7 +5,7 @@ import logging
 import re
 import time
 from collections import OrderedDict
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
 import aiohttp
 
@@ -17,14 +17,22 @@ from ..exceptions import (
     InvalidAppSecretError,
     MissingCredentialsError,
     NonStreamableError,
+    restriction_error,
 )
 from .client import Client
 from .downloadable import BasicDownloadable, Downloadable
+from .session_store import SessionStore
 
 logger = logging.getLogger("streamrip")
 
 QOBUZ_BASE_URL = "https://www.qobuz.com/api.json/0.2"
 
+# How long a user auth token is reused before logging in again
+SESSION_TTL = 7 * 86400
+
+# Maximum number of items the API returns per request
+PAGE_LIMIT = 500
+
 QOBUZ_FEATURED_KEYS = {
     "most-streamed",
     "recent-releases",
@@ -145,13 +153,16 @@ class QobuzClient(Client):
     source = "qobuz"
     max_quality = 4
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, sessions: SessionStore | None = None):
         self.logged_in = False
         self.config = config
+        self.sessions = sessions
         self.rate_limiter = self.get_rate_limiter(
             config.session.downloads.requests_per_minute,
         )
         self.secret: Optional[str] = None
+        self._secret_lock = asyncio.Lock()
+        self._login_lock = asyncio.Lock()
 
     async def login(self):
         self.session = await self.get_session(
@@ -172,73 +183,55 @@ class QobuzClient(Client):
         if not c.app_id or not c.secrets:
             logger.info("App id/secrets not found, fetching")
             c.app_id, c.secrets = await self._get_app_id_and_secrets()
+            c.validated_secret = ""
             # write to file
             f = self.config.file
             f.qobuz.app_id = c.app_id
             f.qobuz.secrets = c.secrets
+            f.qobuz.validated_secret = ""
             f.set_modified()
 
         self.session.headers.update({"X-App-Id": str(c.app_id)})
 
-        if c.use_auth_token:
-            params = {
-                "user_id": c.email_or_userid,
-                "user_auth_token": c.password_or_token,
-                "app_id": str(c.app_id),
-            }
+        saved = self.load_session(self._credentials())
+        if saved is not None:
+            logger.debug("Using saved Qobuz session")
+            self.session.headers.update({"X-User-Auth-Token": saved["uat"]})
         else:
-            params = {
-                "email": c.email_or_userid,
-                "password": c.password_or_token,
-                "app_id": str(c.app_id),
-            }
-
-        logger.debug("Request params %s", params)
-        status, resp = await self._api_request("user/login", params)
-        logger.debug("Login resp: %s", resp)
-
-        if status == 401:
-            raise AuthenticationError(f"Invalid credentials from params {params}")
-        elif status == 400:
-            raise InvalidAppIdError(f"Invalid app id from params {params}")
-
-        logger.debug("Logged in to Qobuz")
-
-        if not resp["user"]["credential"]["parameters"]:
-            raise IneligibleError("Free accounts are not eligible to download tracks.")
-
-        uat = resp["user_auth_token"]
-        self.session.headers.update({"X-User-Auth-Token": uat})
+            await self._login_user()
 
-        self.secret = await self._get_valid_secret(c.secrets)
+        if c.validated_secret and c.validated_secret in c.secrets:
+            logger.debug(
+                "Using secret validated at %s", time.ctime(c.validated_secret_timestamp)
+            )
+            self.secret = c.validated_secret
+        else:
+            self.secret = await self._get_valid_secret(c.secrets)
+            self._save_validated_secret(self.secret)
 
         self.logged_in = True
 
     async def get_metadata(self, item: str, media_type: str):
-        if media_type == "label":
-            return await self.get_label(item)
-
         c = self.config.session.qobuz
         params = {
             "app_id": str(c.app_id),
             f"{media_type}_id": item,
-            # Do these matter?
-            "limit": 500,
-            "offset": 0,
         }
 
+        # Items listed under these keys are paginated by the API
         extras = {
             "artist": "albums",
             "playlist": "tracks",
             "label": "albums",
         }
 
-        if media_type in extras:
-            params.update({"extra": extras[media_type]})
-
+        epoint = f"{media_type}/get"
         logger.debug("request params: %s", params)
 
-        epoint = f"{media_type}/get"
+        if media_type in extras:
+            key = extras[media_type]
+            params.update({"extra": key})
+            return await self._get_all_pages(epoint, params, key)
 
         status, resp = await self._api_request(epoint, params)
 
@@ -250,44 +243,7 @@ class QobuzClient(Client):
         return resp
 
     async def get_label(self, label_id: str) -> dict:
-        c = self.config.session.qobuz
-        page_limit = 500
-        params = {
-            "app_id": str(c.app_id),
-            "label_id": label_id,
-            "limit": page_limit,
-            "offset": 0,
-            "extra": "albums",
-        }
-        epoint = "label/get"
-        status, label_resp = await self._api_request(epoint, params)
-        assert status == 200
-        albums_count = label_resp["albums_count"]
-
-        if albums_count <= page_limit:
-            return label_resp
-
-        requests = [
-            self._api_request(
-                epoint,
-                {
-                    "app_id": str(c.app_id),
-                    "label_id": label_id,
-                    "limit": page_limit,
-                    "offset": offset,
-                    "extra": "albums",
-                },
-            )
-            for offset in range(page_limit, albums_count, page_limit)
-        ]
-
-        results = await asyncio.gather(*requests)
-        items = label_resp["albums"]["items"]
-        for status, resp in results:
-            assert status == 200
-            items.extend(resp["albums"]["items"])
-
-        return label_resp
+        return await self.get_metadata(label_id, "label")
 
     async def search(self, media_type: str, query: str, limit: int = 500) -> list[dict]:
         if media_type not in ("artist", "album", "track", "playlist"):
@@ -313,7 +269,7 @@ class QobuzClient(Client):
         params = {"type": f"{media_type}s"}
         epoint = "favorite/getUserFavorites"
 
-        return await self._paginate(epoint, params, limit=limit)
+        return await self._paginate(epoint, params, limit=limit, key=f"{media_type}s")
 
     async def get_user_playlists(self, limit: int = 500) -> list[dict]:
         epoint = "playlist/getUserPlaylists"
@@ -321,77 +277,185 @@ class QobuzClient(Client):
 
     async def get_downloadable(self, item: str, quality: int) -> Downloadable:
         assert self.secret is not None and self.logged_in and 1 <= quality <= 4
-        status, resp_json = await self._request_file_url(item, quality, self.secret)
+        secret = self.secret
+        status, resp_json = await self._request_file_url(item, quality, secret)
+        if status == 401:
+            # The saved user auth token is no longer accepted
+            await self._renew_user_auth_token(self.session.headers["X-User-Auth-Token"])
+            status, resp_json = await self._request_file_url(item, quality, secret)
+        if status == 400:
+            # The cached secret was rejected, find a new one and try again
+            await self._revalidate_secret(secret)
+            status, resp_json = await self._request_file_url(item, quality, self.secret)
         assert status == 200
         stream_url = resp_json.get("url")
 
         if stream_url is None:
             restrictions = resp_json["restrictions"]
             if restrictions:
-                # Turn CamelCase code into a readable sentence
-                words = re.findall(r"([A-Z][a-z]+)", restrictions[0]["code"])
-                raise NonStreamableError(
-                    words[0] + " " + " ".join(map(str.lower, words[1:])) + ".",
-                )
+                raise restriction_error(restrictions[0]["code"])
             raise NonStreamableError
 
         return BasicDownloadable(
             self.session, stream_url, "flac" if quality > 1 else "mp3", source="qobuz"
         )
 
+    async def iter_pages(
+        self,
+        epoint: str,
+        params: dict,
+        key: str,
+        limit: int | None = None,
+    ) -> AsyncIterator[dict]:
+        """Fetch all pages of a paginated endpoint concurrently.
+
+        The first page is requested to learn the total item count and the page
+        size the API settled on. Requests for every remaining offset are then
+        sent at once, and the pages are yielded in order as they arrive. The
+        first page is yielded while the others are still in flight, but
+        `get_metadata` and the search helpers collect every page before
+        returning.
+
+        Args:
+        ----
+            epoint: API endpoint, e.g. "artist/get"
+            params: query parameters sent with every page
+            key: response key holding the paginated items, e.g. "albums"
+            limit: If None, every item is fetched. Otherwise at most
+                `limit` items are fetched.
+
+        Raises:
+        ------
+            NonStreamableError: if any page returns a non-200 status.
+        """
+        params = params | {"limit": min(limit or PAGE_LIMIT, PAGE_LIMIT), "offset": 0}
+        status, page = await self._api_request(epoint, params)
+        self._check_page(status, page)
+
+        items = page.get(key, {})
+        total = items.get("total", 0)
+        if limit is not None and limit < total:
+            total = limit
+
+        page_limit = int(items.get("limit") or PAGE_LIMIT)
+        start = int(items.get("offset", 0)) + page_limit
+        logger.debug(
+            "paginate: %s has %d items, fetching pages of %d",
+            epoint,
+            total,
+            page_limit,
+        )
+
+        tasks = [
+            asyncio.create_task(
+                self._api_request(epoint, params | {"limit": page_limit, "offset": o})
+            )
+            for o in range(start, total, page_limit)
+        ]
+        try:
+            yield page
+            for task in tasks:
+                status, resp = await task
+                self._check_page(status, resp)
+                yield resp
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get_all_pages(self, epoint: str, params: dict, key: str) -> dict:
+        """Fetch every page of `epoint` and merge the `key` items into the
+        first response.
+        """
+        pages = self.iter_pages(epoint, params, key)
+        resp = await anext(pages)
+        items = resp.get(key, {}).get("items")
+        async for page in pages:
+            assert items is not None
+            items.extend(page[key]["items"])
+        return resp
+
     async def _paginate(
         self,
         epoint: str,
         params: dict,
         limit: int = 500,
+        key: str | None = None,
     ) -> list[dict]:
         """Paginate search results.
 
         params:
-            limit: If None, all the results are yielded. Otherwise a maximum
-            of `limit` results are yielded.
+            limit: Maximum number of results.
+            key: Response key that holds the items. Defaults to the plural
+            of the endpoint's media type.
 
         Returns
         -------
-            Generator that yields (status code, response) tuples
+            List of the response pages
         """
-        params.update({"limit": limit})
-        status, page = await self._api_request(epoint, params)
-        assert status == 200, status
-        logger.debug("paginate: initial request made with status %d", status)
-        # albums, tracks, etc.
-        key = epoint.split("/")[0] + "s"
-        items = page.get(key, {})
-        total = items.get("total", 0)
-        if limit is not None and limit < total:
-            total = limit
-
-        logger.debug("paginate: %d total items requested", total)
+        if key is None:
+            # albums, tracks, etc.
+            key = epoint.split("/")[0] + "s"
 
-        if total == 0:
+        pages = [page async for page in self.iter_pages(epoint, params, key, limit)]
+        if pages[0].get(key, {}).get("total", 0) == 0:
             logger.debug("Nothing found from %s epoint", epoint)
             return []
 
-        limit = int(page.get(key, {}).get("limit", 500))
-        offset = int(page.get(key, {}).get("offset", 0))
+        return pages
+
+    @staticmethod
+    def _check_page(status: int, resp: dict):
+        if status != 200:
+            raise NonStreamableError(
+                f'Error fetching metadata. Message: "{resp.get("message")}"',
+            )
+
+    def _credentials(self) -> str:
+        c = self.config.session.qobuz
+        return f"{c.email_or_userid}:{c.password_or_token}:{c.app_id}"
+
+    async def _login_user(self):
+        """Log in with the configured credentials and set the user auth token."""
+        c = self.config.session.qobuz
+        if c.use_auth_token:
+            params = {
+                "user_id": c.email_or_userid,
+                "user_auth_token": c.password_or_token,
+                "app_id": str(c.app_id),
+            }
+        else:
+            params = {
+                "email": c.email_or_userid,
+                "password": c.password_or_token,
+                "app_id": str(c.app_id),
+            }
+
+        logger.debug("Request params %s", params)
+        status, resp = await self._api_request("user/login", params)
+        logger.debug("Login resp: %s", resp)
 
-        logger.debug("paginate: from response: limit=%d, offset=%d", limit, offset)
-        params.update({"limit": limit})
+        if status == 401:
+            raise AuthenticationError(f"Invalid credentials from params {params}")
+        elif status == 400:
+            raise InvalidAppIdError(f"Invalid app id from params {params}")
 
-        pages = []
-        requests = []
-        assert status == 200, status
-        pages.append(page)
-        while (offset + limit) < total:
-            offset += limit
-            params.update({"offset": offset})
-            requests.append(self._api_request(epoint, params.copy()))
+        logger.debug("Logged in to Qobuz")
 
-        for status, resp in await asyncio.gather(*requests):
-            assert status == 200
-            pages.append(resp)
+        if not resp["user"]["credential"]["parameters"]:
+            raise IneligibleError("Free accounts are not eligible to download tracks.")
 
-        return pages
+        uat = resp["user_auth_token"]
+        self.session.headers.update({"X-User-Auth-Token": uat})
+        self.save_session(self._credentials(), {"uat": uat}, time.time() + SESSION_TTL)
+
+    async def _renew_user_auth_token(self, rejected: str):
+        async with self._login_lock:
+            if self.session.headers.get("X-User-Auth-Token") != rejected:
+                # Already renewed by another request
+                return
+            logger.info("Qobuz session expired, logging in again")
+            self.forget_session()
+            await self._login_user()
 
     async def _get_app_id_and_secrets(self) -> tuple[str, list[str]]:
         async with QobuzSpoofer(
@@ -408,6 +472,30 @@ class QobuzClient(Client):
         logger.warning("Got status %d when testing secret", status)
         return None
 
+    async def _revalidate_secret(self, rejected: str):
+        """Replace a secret that Qobuz rejected with a working one.
+
+        Concurrent callers that saw the same rejection wait for a single
+        round of probing instead of each testing every secret.
+        """
+        async with self._secret_lock:
+            if self.secret != rejected:
+                # Already replaced by another request
+                return
+            logger.info("Qobuz secret rejected, validating secrets again")
+            self.secret = await self._get_valid_secret(
+                self.config.session.qobuz.secrets
+            )
+            self._save_validated_secret(self.secret)
+
+    def _save_validated_secret(self, secret: str):
+        now = int(time.time())
+        c = self.config.session.qobuz
+        c.validated_secret, c.validated_secret_timestamp = secret, now
+        f = self.config.file
+        f.qobuz.validated_secret, f.qobuz.validated_secret_timestamp = secret, now
+        f.set_modified()
+
     async def _get_valid_secret(self, secrets: list[str]) -> str:
         results = await asyncio.gather(
             *[self._test_secret(secret) for secret in secrets],
@@ -0,0 +1,82 @@
+"""Persists authenticated client sessions between runs."""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+from ..config import APP_DIR
+
+logger = logging.getLogger("streamrip")
+
+DEFAULT_SESSION_STORE_PATH = os.path.join(APP_DIR, "sessions.json")
+
+
+class SessionStore:
+    """A JSON file holding the login state of each source.
+
+    Every entry is tied to the credentials it was created with and has an
+    expiry time. An entry is only returned if both still match, so changing
+    accounts in the config or letting a token age out falls back to a
+    normal login.
+    """
+
+    def __init__(self, path: str = DEFAULT_SESSION_STORE_PATH):
+        self.path = path
+        self._modified = False
+        try:
+            with open(path) as f:
+                self._sessions: dict[str, dict] = json.load(f)
+        except FileNotFoundError:
+            self._sessions = {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Ignoring unreadable session store %s: %s", path, e)
+            self._sessions = {}
+
+    def get(self, source: str, credentials: str) -> dict | None:
+        """Get the saved state for `source` if it is still usable.
+
+        :param source: qobuz, tidal, deezer or soundcloud
+        :param credentials: identifies the account the state belongs to
+        """
+        entry = self._sessions.get(source)
+        if entry is None:
+            return None
+        if (
+            entry["credentials"] != _digest(credentials)
+            or entry["expiry"] < time.time()
+        ):
+            logger.debug("Saved %s session is stale", source)
+            return None
+        return entry["state"]
+
+    def set(self, source: str, credentials: str, state: dict, expiry: float):
+        """Save the login state of `source`, valid until the Unix time `expiry`."""
+        self._sessions[source] = {
+            "credentials": _digest(credentials),
+            "expiry": expiry,
+            "state": state,
+        }
+        self._modified = True
+
+    def remove(self, source: str):
+        if self._sessions.pop(source, None) is not None:
+            self._modified = True
+
+    def save(self):
+        """Write the sessions to disk if they have changed."""
+        if not self._modified:
+            return
+
+        tmp = f"{self.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._sessions, f)
+        os.replace(tmp, self.path)
+        self._modified = False
+
+
+def _digest(credentials: str) -> str:
+    # Entries only need to be matched against the config, not read back
+    return hashlib.sha256(credentials.encode("utf-8")).hexdigest()
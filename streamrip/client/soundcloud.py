@@ -3,11 +3,13 @@ import itertools
 import logging
 import random
 import re
+import time
 
 from ..config import Config
 from ..exceptions import NonStreamableError
 from .client import Client
 from .downloadable import SoundcloudDownloadable
+from .session_store import SessionStore
 
 # e.g. 123456-293847-121314-209849
 USER_ID = "-".join(str(random.randint(111111, 999999)) for _ in range(4))
@@ -17,6 +19,9 @@ STOCK_URL = "https://soundcloud.com/"
 # for playlists
 MAX_BATCH_SIZE = 50
 
+# How long a verified client_id is trusted before checking it again
+SESSION_TTL = 86400
+
 logger = logging.getLogger("streamrip")
 
 
@@ -28,9 +33,10 @@ class SoundcloudClient(Client):
     ORIGINAL_DOWNLOAD = "_original_download"
     NOT_RESOLVED = "_not_resolved"
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, sessions: SessionStore | None = None):
         self.global_config = config
         self.config = config.session.soundcloud
+        self.sessions = sessions
         self.rate_limiter = self.get_rate_limiter(
             config.session.downloads.requests_per_minute,
         )
@@ -40,16 +46,23 @@ class SoundcloudClient(Client):
             verify_ssl=self.global_config.session.downloads.verify_ssl
         )
         client_id, app_version = self.config.client_id, self.config.app_version
-        if not client_id or not app_version or not (await self._announce_success()):
-            client_id, app_version = await self._refresh_tokens()
-            # update file and session configs and save to disk
-            cf = self.global_config.file.soundcloud
-            cs = self.global_config.session.soundcloud
-            cs.client_id = client_id
-            cs.app_version = app_version
-            cf.client_id = client_id
-            cf.app_version = app_version
-            self.global_config.file.set_modified()
+        if self.load_session(f"{client_id}:{app_version}") is not None:
+            logger.debug("Using saved soundcloud client id")
+        else:
+            if not client_id or not app_version or not (await self._announce_success()):
+                client_id, app_version = await self._refresh_tokens()
+                # update file and session configs and save to disk
+                cf = self.global_config.file.soundcloud
+                cs = self.global_config.session.soundcloud
+                cs.client_id = client_id
+                cs.app_version = app_version
+                cf.client_id = client_id
+                cf.app_version = app_version
+                self.global_config.file.set_modified()
+
+            self.save_session(
+                f"{client_id}:{app_version}", {}, time.time() + SESSION_TTL
+            )
 
         logger.debug(f"Current valid {client_id=} {app_version=}")
         self.logged_in = True
@@ -115,7 +128,7 @@ class SoundcloudClient(Client):
         assert re.match(r"\d+", item_id) is not None
 
         if download_info == self.NON_STREAMABLE:
-            raise NonStreamableError(item_info)
+            raise NonStreamableError(item_info, permanent=True)
 
         if download_info == self.ORIGINAL_DOWNLOAD:
             resp_json, status = await self._api_request(f"tracks/{item_id}/download")
@@ -5,6 +5,7 @@ import logging
 import re
 import time
 from json import JSONDecodeError
+from typing import AsyncIterator
 
 import aiohttp
 
@@ -12,6 +13,7 @@ from ..config import Config
 from ..exceptions import NonStreamableError
 from .client import Client
 from .downloadable import TidalDownloadable
+from .session_store import SessionStore
 
 logger = logging.getLogger("streamrip")
 
@@ -27,6 +29,9 @@ STREAM_URL_REGEX = re.compile(
     r"#EXT-X-STREAM-INF:BANDWIDTH=\d+,AVERAGE-BANDWIDTH=\d+,CODECS=\"(?!jpeg)[^\"]+\",RESOLUTION=\d+x\d+\n(.+)"
 )
 
+# Maximum number of items the API returns per request
+PAGE_LIMIT = 100
+
 QUALITY_MAP = {
     0: "LOW",  # AAC
     1: "HIGH",  # AAC
@@ -41,9 +46,10 @@ class TidalClient(Client):
     source = "tidal"
     max_quality = 3
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, sessions: SessionStore | None = None):
         self.logged_in = False
         self.global_config = config
+        self.sessions = sessions
         self.config = config.session.tidal
         self.rate_limiter = self.get_rate_limiter(
             config.session.downloads.requests_per_minute,
@@ -62,8 +68,17 @@ class TidalClient(Client):
 
         if self.token_expiry - time.time() < 86400:  # 1 day
             await self._refresh_access_token()
+        elif (saved := self.load_session(c.access_token)) is not None:
+            # The token was checked by a previous run and has not expired
+            c.country_code = saved["country_code"]
+            self._update_authorization_from_config()
         else:
             await self._login_by_access_token(c.access_token, c.user_id)
+            self.save_session(
+                c.access_token,
+                {"country_code": c.country_code},
+                self.token_expiry - 86400,
+            )
 
         self.logged_in = True
 
@@ -87,20 +102,13 @@ class TidalClient(Client):
         url = f"{media_type}s/{item_id}"
         item = await self._api_request(url)
         if media_type in ("playlist", "album"):
-            # TODO: move into new method and make concurrent
-            resp = await self._api_request(f"{url}/items")
-            tracks_left = item["numberOfTracks"]
-            if tracks_left > 100:
-                offset = 0
-                while tracks_left > 0:
-                    offset += 100
-                    tracks_left -= 100
-                    items_resp = await self._api_request(
-                        f"{url}/items", {"offset": offset}
-                    )
-                    resp["items"].extend(items_resp["items"])
-
-            item["tracks"] = [item["item"] for item in resp["items"]]
+            item["tracks"] = [
+                entry["item"]
+                async for page in self.iter_pages(
+                    f"{url}/items", item["numberOfTracks"]
+                )
+                for entry in page["items"]
+            ]
         elif media_type == "artist":
             logger.debug("filtering eps")
             album_resp, ep_resp = await asyncio.gather(
@@ -137,19 +145,64 @@ class TidalClient(Client):
         :type query: str
         :param media_type: track, album, playlist, or video.
         :type media_type: str
-        :param limit: max is 100
+        :param limit: maximum number of results. Pages past the first are
+            fetched concurrently.
         :type limit: int
         :rtype: dict
         """
-        params = {
-            "query": query,
-            "limit": limit,
-        }
         assert media_type in ("album", "track", "playlist", "video", "artist")
-        resp = await self._api_request(f"search/{media_type}s", params=params)
-        if len(resp["items"]) > 1:
-            return [resp]
-        return []
+        path = f"search/{media_type}s"
+        params = {"query": query, "limit": min(limit, PAGE_LIMIT)}
+        first = await self._api_request(path, params=params.copy())
+        if len(first["items"]) == 0:
+            return []
+
+        total = min(first.get("totalNumberOfItems", 0), limit)
+        pages = [first]
+        pages.extend(
+            [page async for page in self.iter_pages(path, total, params, PAGE_LIMIT)]
+        )
+        return pages
+
+    async def iter_pages(
+        self,
+        path: str,
+        total: int,
+        params: dict | None = None,
+        start: int = 0,
+    ) -> AsyncIterator[dict]:
+        """Fetch the pages of a paginated endpoint concurrently.
+
+        One request is sent per `PAGE_LIMIT` items between `start` and `total`.
+        They all go through the rate limiter at once, and the responses are
+        yielded in order as soon as each is available. `get_metadata` and
+        `search` still collect every page before returning.
+
+        :param path: endpoint, relative to the API base
+        :param total: total number of items (e.g. `numberOfTracks`)
+        :param params: extra query parameters sent with every page
+        :param start: offset of the first item to fetch
+        """
+        if params is None:
+            params = {}
+
+        tasks = [
+            asyncio.create_task(
+                self._api_request(
+                    path,
+                    params
+                    | {"offset": offset, "limit": min(PAGE_LIMIT, total - offset)},
+                )
+            )
+            for offset in range(start, total, PAGE_LIMIT)
+        ]
+        logger.debug("Fetching %d pages from %s", len(tasks), path)
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def get_downloadable(self, track_id: str, quality: int):
         params = {
@@ -348,12 +401,12 @@ class TidalClient(Client):
             params = {}
 
         params["countryCode"] = self.config.country_code
-        params["limit"] = 100
+        params.setdefault("limit", PAGE_LIMIT)
 
         async with self.rate_limiter:
             async with self.session.get(f"{base}/{path}", params=params) as resp:
                 if resp.status == 404:
                     logger.warning("TIDAL: track not found", resp)
-                    raise NonStreamableError("TIDAL: Track not found")
+                    raise NonStreamableError("TIDAL: Track not found", permanent=True)
                 resp.raise_for_status()
                 return await resp.json()
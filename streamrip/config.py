@@ -17,13 +17,26 @@ logger = logging.getLogger("streamrip")
 APP_DIR = click.get_app_dir("streamrip")
 os.makedirs(APP_DIR, exist_ok=True)
 DEFAULT_CONFIG_PATH = os.path.join(APP_DIR, "config.toml")
-CURRENT_CONFIG_VERSION = "2.0.6"
+CURRENT_CONFIG_VERSION = "2.1.0"
+ISRC_DUPLICATE_POLICIES = ("download", "skip", "link")
+# Keys of a conversion target table: (type, required)
+CONVERSION_TARGET_KEYS: dict[str, tuple[type, bool]] = {
+    "codec": (str, True),
+    "folder": (str, True),
+    "sampling_rate": (int, False),
+    "bit_depth": (int, False),
+    "lossy_bitrate": (int, False),
+}
 
 
 class OutdatedConfigError(Exception):
     pass
 
 
+class InvalidConfigError(Exception):
+    pass
+
+
 @dataclass(slots=True)
 class QobuzConfig:
     use_auth_token: bool
@@ -37,6 +50,10 @@ class QobuzConfig:
     download_booklets: bool
     # Do not change
     secrets: list[str]
+    # Do not change. The secret that last passed validation and the Unix time
+    # it was validated. It is only re-validated when Qobuz rejects it.
+    validated_secret: str
+    validated_secret_timestamp: int
 
 
 @dataclass(slots=True)
@@ -99,10 +116,32 @@ class DatabaseConfig:
     downloads_path: str
     failed_downloads_enabled: bool
     failed_downloads_path: str
+    # What to do with a track whose ISRC matches an earlier download, possibly
+    # from another source: "download", "skip", or "link"
+    isrc_duplicates: str
+    # Link tracks of playlists that were already downloaded into the playlist
+    # folder, instead of skipping them
+    link_playlist_tracks: bool
+    # Hours that an item which failed is skipped for before it is tried again,
+    # for failures that will likely repeat (e.g. the item was removed or is
+    # region locked) and for others (e.g. network errors). 0 never skips.
+    permanent_failure_ttl_hours: int
+    transient_failure_ttl_hours: int
+
+    def __post_init__(self):
+        if self.isrc_duplicates not in ISRC_DUPLICATE_POLICIES:
+            raise InvalidConfigError(
+                f"database.isrc_duplicates must be one of {ISRC_DUPLICATE_POLICIES}, "
+                f"not {self.isrc_duplicates!r}"
+            )
+        for key in ("permanent_failure_ttl_hours", "transient_failure_ttl_hours"):
+            if getattr(self, key) < 0:
+                raise InvalidConfigError(f"database.{key} must not be negative")
 
 
 @dataclass(slots=True)
 class ConversionConfig:
+    # Replace each downloaded file with its `codec` conversion
     enabled: bool
     # FLAC, ALAC, OPUS, MP3, VORBIS, or AAC
     codec: str
@@ -114,6 +153,44 @@ class ConversionConfig:
     bit_depth: int
     # Only applicable for lossy codecs
     lossy_bitrate: int
+    # Extra conversions, written by the same ffmpeg process so that each track
+    # is decoded once. They are made whether or not `enabled` is set, so with it
+    # unset the downloaded file is kept as it is. Tables with the keys "codec",
+    # "folder", where the downloads folder layout is recreated for that
+    # conversion, and optionally "sampling_rate", "bit_depth", and
+    # "lossy_bitrate" (in kbps).
+    targets: list[dict]
+
+    def __post_init__(self):
+        from .converter import get
+
+        for target in self.targets:
+            if not isinstance(target, dict):
+                raise InvalidConfigError(
+                    f"conversion.targets entries must be tables, not {target!r}"
+                )
+            unknown = target.keys() - CONVERSION_TARGET_KEYS.keys()
+            if len(unknown) > 0:
+                raise InvalidConfigError(
+                    f"Unknown keys {sorted(unknown)} in conversion target {target}"
+                )
+            for key, (kind, required) in CONVERSION_TARGET_KEYS.items():
+                if key not in target:
+                    if required:
+                        raise InvalidConfigError(
+                            f"Conversion target {target} is missing {key!r}"
+                        )
+                elif not isinstance(target[key], kind):
+                    raise InvalidConfigError(
+                        f"{key!r} of conversion target {target} must be a "
+                        f"{kind.__name__}"
+                    )
+            try:
+                get(target["codec"])
+            except KeyError:
+                raise InvalidConfigError(
+                    f"Unknown codec {target['codec']!r} in conversion target {target}"
+                ) from None
 
 
 @dataclass(slots=True)
@@ -148,6 +225,9 @@ class ArtworkConfig:
     save_artwork: bool
     # If artwork is saved, downscale it to these dimensions, or ignore if -1
     saved_max_width: int
+    # Keep downloaded artwork on disk between sessions, up to this many MB.
+    # Set to 0 to disable the cache.
+    cache_size_mb: int
 
 
 @dataclass(slots=True)
@@ -3,15 +3,21 @@
 import asyncio
 import logging
 import os
+import re
 import shutil
-from tempfile import gettempdir
-from typing import Final, Optional
+from typing import Final, Optional, Sequence
+
+import mutagen
+from mutagen import flac, mp3, mp4, oggopus, oggvorbis
 
 from .exceptions import ConversionError
+from .filepath_utils import staging_path
 
 logger = logging.getLogger("streamrip")
 
 SAMPLING_RATES = {44100, 48000, 88200, 96000, 176400, 192000}
+# Matches a bitrate argument like "-b:a 128k"
+_BITRATE_ARG = re.compile(r"-b:a\s+(\d+)k\b")
 
 
 class Converter:
@@ -55,12 +61,15 @@ class Converter:
 
         self.filename = filename
         self.final_fn = f"{os.path.splitext(filename)[0]}.{self.container}"
-        self.tempfile = os.path.join(gettempdir(), os.path.basename(self.final_fn))
+        # Next to the output, so that moving it into place is a rename
+        self.tempfile = staging_path(self.final_fn)
         self.remove_source = remove_source
         self.sampling_rate = sampling_rate
         self.bit_depth = bit_depth
         self.copy_art = copy_art
         self.show_progress = show_progress
+        # Set when the source already satisfies this codec, see `convert_all`
+        self.copy_stream = False
 
         if ffmpeg_arg is None:
             logger.debug("No arguments provided. Codec defaults will be used")
@@ -68,6 +77,7 @@ class Converter:
         else:
             self.ffmpeg_arg = ffmpeg_arg
             self._is_command_valid()
+        self.explicit_ffmpeg_arg = self.ffmpeg_arg != self.default_ffmpeg_arg
 
         logger.debug("FFmpeg codec extra argument: %s", self.ffmpeg_arg)
 
@@ -79,48 +89,28 @@ class Converter:
         :type custom_fn: Optional[str]
         """
         if custom_fn:
-            self.final_fn = custom_fn
-
-        self.command = self._gen_command()
-        logger.debug("Generated conversion command: %s", self.command)
-
-        process = await asyncio.create_subprocess_exec(
-            *self.command,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        out, err = await process.communicate()
-        if process.returncode == 0 and os.path.isfile(self.tempfile):
-            if self.remove_source:
-                os.remove(self.filename)
-                logger.debug("Source removed: %s", self.filename)
-
-            shutil.move(self.tempfile, self.final_fn)
-            logger.debug("Moved: %s -> %s", self.tempfile, self.final_fn)
-        else:
-            raise ConversionError(f"FFmpeg output:\n{out, err}")
-
-    def _gen_command(self):
-        command = [
-            "ffmpeg",
-            "-i",
-            self.filename,
-        ]
+            self.set_output(custom_fn)
+        await convert_all([self])
 
-        if logger.getEffectiveLevel() != logging.DEBUG:
-            command.extend(("-loglevel", "panic"))
+    def set_output(self, path: str):
+        """Set the path that the converted file is written to."""
+        self.final_fn = path
+        self.tempfile = staging_path(path)
 
-        command.extend(("-c:a", self.codec_lib))
+    def _gen_command(self):
+        return _gen_command(self.filename, [self])
 
-        if self.show_progress:
-            command.append("-stats")
+    def _output_args(self) -> list[str]:
+        """Get the ffmpeg options for this converter's output file."""
+        args = ["-c:a", "copy" if self.copy_stream else self.codec_lib]
 
         if self.copy_art:
-            command.extend(["-c:v", "copy"])
+            args.extend(["-c:v", "copy"])
 
-        if self.ffmpeg_arg:
-            command.extend(self.ffmpeg_arg.split())
+        if self.ffmpeg_arg and not self.copy_stream:
+            args.extend(self.ffmpeg_arg.split())
 
-        if self.lossless:
+        if self.lossless and not self.copy_stream:
             aformat = []
 
             if isinstance(self.sampling_rate, int):
@@ -148,14 +138,46 @@ class Converter:
 
             if aformat:
                 aformat_params = ":".join(aformat)
-                command.extend(["-af", f"aformat={aformat_params}"])
+                args.extend(["-af", f"aformat={aformat_params}"])
+
+        args.append(self.tempfile)
+        return args
 
-        # automatically overwrite
-        command.extend(["-y", self.tempfile])
+    def satisfied_by_source(self) -> bool:
+        """Check whether the source is already in this codec, and within the
+        sampling rate and bit depth limits, or the bitrate limit of a lossy
+        codec.
 
-        logger.debug(command)
+        Only the stream info that mutagen reads from the header is used.
+        """
+        try:
+            audio = mutagen.File(self.filename)  # type: ignore
+        except mutagen.MutagenError:
+            return False
+        if audio is None or _codec_name(audio) != self.codec_name:
+            return False
+        if not self.lossless:
+            if not self.explicit_ffmpeg_arg:
+                return True
+            # Other quality arguments can't be compared with the source
+            bitrate = _BITRATE_ARG.search(self.ffmpeg_arg)
+            source_bitrate = getattr(audio.info, "bitrate", 0)
+            return (
+                bitrate is not None
+                and 0 < source_bitrate <= int(bitrate.group(1)) * 1000
+            )
 
-        return command
+        sampling_rate = getattr(audio.info, "sample_rate", None)
+        bit_depth = getattr(audio.info, "bits_per_sample", None)
+        if self.sampling_rate is not None and (
+            sampling_rate is None or sampling_rate > self.sampling_rate
+        ):
+            return False
+        if self.bit_depth is not None and (
+            bit_depth is None or bit_depth > self.bit_depth
+        ):
+            return False
+        return True
 
     def _is_command_valid(self):
         # TODO: add error handling for lossy codecs
@@ -278,6 +300,93 @@ class AAC(Converter):
         return ""
 
 
+async def convert_all(converters: Sequence[Converter]):
+    """Convert a file into the outputs of several converters at once.
+
+    A single ffmpeg process writes every output, so the source is read and
+    decoded once. All of the converters must have the same source file. The
+    source is removed if any converter has `remove_source` set, unless it is
+    also one of the outputs.
+    """
+    if len(converters) == 0:
+        return
+    filename = converters[0].filename
+    if any(c.filename != filename for c in converters):
+        raise ValueError("Converters must share a source file")
+
+    pending = []
+    for engine in converters:
+        # Re-encoding the same codec within the same limits changes nothing
+        engine.copy_stream = engine.satisfied_by_source()
+        if engine.copy_stream and engine.filename == engine.final_fn:
+            logger.debug(
+                "Skipping conversion, already %s: %s", engine.codec_name, filename
+            )
+        else:
+            pending.append(engine)
+
+    if len(pending) == 0:
+        return
+
+    command = _gen_command(filename, pending)
+    logger.debug("Generated conversion command: %s", command)
+
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await process.communicate()
+    _finish_conversion(
+        converters, pending, process.returncode == 0, f"FFmpeg output:\n{out, err}"
+    )
+
+
+def _gen_command(filename: str, converters: Sequence[Converter]) -> list[str]:
+    command = ["ffmpeg", "-i", filename]
+
+    if logger.getEffectiveLevel() != logging.DEBUG:
+        command.extend(("-loglevel", "panic"))
+
+    if any(c.show_progress for c in converters):
+        command.append("-stats")
+
+    # automatically overwrite
+    command.append("-y")
+    for engine in converters:
+        command.extend(engine._output_args())
+
+    logger.debug(command)
+
+    return command
+
+
+def _finish_conversion(
+    converters: Sequence[Converter],
+    pending: Sequence[Converter],
+    succeeded: bool,
+    output: str,
+):
+    """Move the converted files into place, or clean them up on failure."""
+    if not succeeded or not all(os.path.isfile(c.tempfile) for c in pending):
+        for engine in pending:
+            try:
+                os.remove(engine.tempfile)
+            except FileNotFoundError:
+                pass
+        raise ConversionError(output)
+
+    filename = converters[0].filename
+    for engine in pending:
+        os.replace(engine.tempfile, engine.final_fn)
+        logger.debug("Moved: %s -> %s", engine.tempfile, engine.final_fn)
+
+    if any(c.remove_source for c in converters) and all(
+        c.final_fn != filename for c in converters
+    ):
+        os.remove(filename)
+        logger.debug("Source removed: %s", filename)
+
+
 def get(codec: str) -> type[Converter]:
     converter_classes = {
         "FLAC": FLAC,
@@ -290,3 +399,22 @@ def get(codec: str) -> type[Converter]:
         "M4A": AAC,
     }
     return converter_classes[codec.upper()]
+
+
+def _codec_name(audio) -> str | None:
+    """Get the `Converter.codec_name` of the codec in a mutagen file."""
+    if isinstance(audio, flac.FLAC):
+        return FLAC.codec_name
+    if isinstance(audio, mp3.MP3):
+        return LAME.codec_name
+    if isinstance(audio, oggopus.OggOpus):
+        return OPUS.codec_name
+    if isinstance(audio, oggvorbis.OggVorbis):
+        return Vorbis.codec_name
+    if isinstance(audio, mp4.MP4):
+        codec = getattr(audio.info, "codec", "")
+        if codec == "alac":
+            return ALAC.codec_name
+        if codec.startswith("mp4a"):
+            return AAC.codec_name
+    return None
@@ -1,14 +1,37 @@
 """Wrapper over a database that stores item IDs."""
 
+import asyncio
+import functools
+import hashlib
 import logging
 import os
 import sqlite3
+import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Final
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Final, Iterable, Iterator
 
 logger = logging.getLogger("streamrip")
 
+# Default number of seconds a failed item is skipped before it is tried again.
+# Permanent failures are removed items, region restrictions and the like,
+# transient ones are network or server errors.
+PERMANENT_FAILURE_TTL = 30 * 24 * 60 * 60
+TRANSIENT_FAILURE_TTL = 6 * 60 * 60
+
+# Added rows are held in memory and written together once this many are
+# pending, or once the oldest pending row is this many seconds old.
+WRITE_BATCH_SIZE = 50
+WRITE_BATCH_SECONDS = 5.0
+
+# Source recorded for files imported from an existing library. Their IDs are
+# their paths, since the service and ID they came from are unknown.
+LIBRARY_SOURCE = "library"
+# Media type recorded for links of downloaded tracks into playlist folders,
+# see `link_id`
+LINK_MEDIA_TYPE = "link"
+
 
 class DatabaseInterface(ABC):
     @abstractmethod
@@ -23,6 +46,10 @@ class DatabaseInterface(ABC):
     def add(self, kvs):
         pass
 
+    @abstractmethod
+    def add_many(self, rows):
+        pass
+
     @abstractmethod
     def remove(self, kvs):
         pass
@@ -31,6 +58,22 @@ class DatabaseInterface(ABC):
     def all(self) -> list:
         pass
 
+    @abstractmethod
+    def existing_ids(self, ids: Iterable[str], source: str | None = None) -> set[str]:
+        pass
+
+    @abstractmethod
+    def find(self, **items) -> list:
+        pass
+
+    @abstractmethod
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[list[tuple]]:
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
 
 class Dummy(DatabaseInterface):
     """This exists as a mock to use in case databases are disabled."""
@@ -44,18 +87,42 @@ class Dummy(DatabaseInterface):
     def add(self, *_):
         pass
 
-    def remove(self, *_):
+    def add_many(self, *_):
+        pass
+
+    def remove(self, *_, **__):
         pass
 
     def all(self):
         return []
 
+    def existing_ids(self, *_, **__):
+        return set()
+
+    def find(self, **_):
+        return []
+
+    def iter_batches(self, *_, **__):
+        return iter(())
+
+    def close(self):
+        pass
+
 
 class DatabaseBase(DatabaseInterface):
     """A wrapper for an sqlite database."""
 
     structure: dict
     name: str
+    # Sets of columns whose combined values must be unique
+    unique: tuple[tuple[str, ...], ...] = ()
+    # Sets of columns to index for lookups
+    indexes: tuple[tuple[str, ...], ...] = ()
+    # What to do when an added row conflicts with a unique constraint
+    on_conflict: str = "IGNORE"
+    # Schema version, stored in the file's user_version. Bump it and extend
+    # `migrate` when the structure changes.
+    version: int = 1
 
     def __init__(self, path: str):
         """Create a Database instance.
@@ -67,22 +134,76 @@ class DatabaseBase(DatabaseInterface):
         assert path
 
         self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._pending: list[tuple] = []
+        self._pending_since = 0.0
+
+        columns = ", ".join(self.structure.keys())
+        question_marks = ", ".join("?" for _ in self.structure)
+        self._insert_command = (
+            f"INSERT OR {self.on_conflict} INTO {self.name} ({columns}) "
+            f"VALUES ({question_marks})"
+        )
 
         if not os.path.exists(self.path):
             self.create()
+            self._set_version()
+        else:
+            current = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if current < self.version:
+                logger.info(
+                    "Migrating %s database from version %d to %d",
+                    self.name,
+                    current,
+                    self.version,
+                )
+                self.migrate(current)
+                self._set_version()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The connection to the database, opened on first use."""
+        if self._conn is None:
+            # The connection is created on the thread that first uses the
+            # table, but AsyncDatabase uses it from its own thread after that
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL lets readers run alongside the batched writes and makes
+            # each commit much cheaper than the default rollback journal
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
 
     def create(self):
         """Create a database."""
-        with sqlite3.connect(self.path) as conn:
-            params = ", ".join(
-                f"{key} {' '.join(map(str.upper, props))} NOT NULL"
-                for key, props in self.structure.items()
-            )
-            command = f"CREATE TABLE {self.name} ({params})"
-
-            logger.debug("executing %s", command)
+        params = [
+            f"{key} {' '.join(map(str.upper, props))} NOT NULL"
+            for key, props in self.structure.items()
+        ]
+        params.extend(f"UNIQUE ({', '.join(cols)})" for cols in self.unique)
+        command = f"CREATE TABLE IF NOT EXISTS {self.name} ({', '.join(params)})"
+
+        logger.debug("executing %s", command)
+
+        with self.conn:
+            self.conn.execute(command)
+            for cols in self.indexes:
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.name}_{'_'.join(cols)} "
+                    f"ON {self.name} ({', '.join(cols)})"
+                )
+
+    def migrate(self, from_version: int):
+        """Bring a file created with an older schema version up to date.
+
+        :param from_version: the user_version stored in the file
+        """
+        # Files from before versioning have user_version 0 but the same
+        # structure as version 1
+        assert from_version <= 1, f"No migration from version {from_version}"
 
-            conn.execute(command)
+    def _set_version(self):
+        with self.conn:
+            self.conn.execute(f"PRAGMA user_version={self.version}")
 
     def keys(self):
         """Get the column names of the table."""
@@ -101,35 +222,65 @@ class DatabaseBase(DatabaseInterface):
 
         items = {k: str(v) for k, v in items.items()}
 
-        with sqlite3.connect(self.path) as conn:
-            conditions = " AND ".join(f"{key}=?" for key in items.keys())
-            command = f"SELECT EXISTS(SELECT 1 FROM {self.name} WHERE {conditions})"
+        if self._pending_contains(items):
+            return True
 
-            logger.debug("Executing %s", command)
+        conditions = " AND ".join(f"{key}=?" for key in items.keys())
+        command = f"SELECT EXISTS(SELECT 1 FROM {self.name} WHERE {conditions})"
+
+        logger.debug("Executing %s", command)
 
-            return bool(conn.execute(command, tuple(items.values())).fetchone()[0])
+        return bool(self.conn.execute(command, tuple(items.values())).fetchone()[0])
+
+    def _pending_contains(self, items: dict[str, str]) -> bool:
+        keys = list(self.structure.keys())
+        indices = [(keys.index(key), value) for key, value in items.items()]
+        return any(
+            all(row[i] == value for i, value in indices) for row in self._pending
+        )
 
     def add(self, items: tuple[str]):
         """Add a row to the table.
 
+        The row is written with the next batch, see `flush`.
+
         :param items: Column-name + value. Values must be provided for all cols.
         :type items: Tuple[str]
         """
         assert len(items) == len(self.structure)
 
-        params = ", ".join(self.structure.keys())
-        question_marks = ", ".join("?" for _ in items)
-        command = f"INSERT INTO {self.name} ({params}) VALUES ({question_marks})"
-
-        logger.debug("Executing %s", command)
         logger.debug("Items to add: %s", items)
 
-        with sqlite3.connect(self.path) as conn:
-            try:
-                conn.execute(command, tuple(items))
-            except sqlite3.IntegrityError as e:
-                # tried to insert an item that was already there
-                logger.debug(e)
+        if len(self._pending) == 0:
+            self._pending_since = time.monotonic()
+        self._pending.append(tuple(map(str, items)))
+
+        if (
+            len(self._pending) >= WRITE_BATCH_SIZE
+            or time.monotonic() - self._pending_since >= WRITE_BATCH_SECONDS
+        ):
+            self.flush()
+
+    def add_many(self, rows: Iterable[tuple]):
+        """Add many rows to the table in a single transaction."""
+        rows = [tuple(row) for row in rows]
+        assert all(len(row) == len(self.structure) for row in rows)
+        self.flush()
+        with self.conn:
+            self.conn.executemany(self._insert_command, rows)
+
+    def flush(self):
+        """Write all pending rows in a single transaction."""
+        if len(self._pending) == 0:
+            return
+
+        logger.debug(
+            "Executing %s for %d rows", self._insert_command, len(self._pending)
+        )
+
+        with self.conn:
+            self.conn.executemany(self._insert_command, self._pending)
+        self._pending.clear()
 
     def remove(self, **items):
         """Remove items from a table.
@@ -138,33 +289,267 @@ class DatabaseBase(DatabaseInterface):
 
         :param items:
         """
+        self.flush()
+
         conditions = " AND ".join(f"{key}=?" for key in items.keys())
         command = f"DELETE FROM {self.name} WHERE {conditions}"
 
-        with sqlite3.connect(self.path) as conn:
-            logger.debug(command)
-            conn.execute(command, tuple(items.values()))
+        logger.debug(command)
+        with self.conn:
+            self.conn.execute(command, tuple(items.values()))
 
     def all(self):
         """Iterate through the rows of the table."""
-        with sqlite3.connect(self.path) as conn:
-            return list(conn.execute(f"SELECT * FROM {self.name}"))
+        self.flush()
+        return list(self.conn.execute(f"SELECT * FROM {self.name}"))
+
+    def iter_rows(
+        self,
+        where: dict[str, str] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+        batch_size: int = 1000,
+    ) -> Iterator[tuple]:
+        """Stream the rows of the table in insertion order.
+
+        Only `batch_size` rows are held in memory at a time.
+
+        :param where: column-name + value pairs the rows must match. Values
+        containing * or ? are matched as glob patterns.
+        :param limit: maximum number of rows, or None for all of them
+        :param offset: number of matching rows to skip
+        """
+        where = where or {}
+        allowed_keys = set(self.structure.keys())
+        assert all(
+            key in allowed_keys for key in where.keys()
+        ), f"Invalid key. Valid keys: {allowed_keys}"
+        self.flush()
+
+        conditions = [
+            f"{key} GLOB ?" if any(c in value for c in "*?") else f"{key}=?"
+            for key, value in where.items()
+        ]
+        command = f"SELECT * FROM {self.name}"
+        if len(conditions) > 0:
+            command += " WHERE " + " AND ".join(conditions)
+        command += " ORDER BY rowid LIMIT ? OFFSET ?"
+        params = (*where.values(), -1 if limit is None else limit, offset)
+
+        # A separate cursor so that writes on the connection don't reset it
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(command, params)
+            while batch := cursor.fetchmany(batch_size):
+                yield from batch
+        finally:
+            cursor.close()
+
+    def existing_ids(self, ids: Iterable[str], source: str | None = None) -> set[str]:
+        """Get the values of `ids` that are in the id column of the table.
+
+        :param source: only match rows from this source, if given
+        """
+        self.flush()
+        ids = list(map(str, ids))
+        found = set()
+        # Stay below SQLite's limit on the number of bound parameters
+        chunk_size = 500
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start : start + chunk_size]
+            question_marks = ", ".join("?" for _ in chunk)
+            command = f"SELECT id FROM {self.name} WHERE id IN ({question_marks})"
+            if source is not None:
+                command += " AND source=?"
+                chunk = [*chunk, source]
+            found.update(row[0] for row in self.conn.execute(command, chunk))
+        return found
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[list[tuple]]:
+        """Get the rows of the table in batches of at most `batch_size`.
+
+        Only the rows that exist when iteration starts are yielded. Each batch
+        is a separate query, so the table can be changed between batches, and
+        rows added or replaced in the meantime are not yielded again.
+        """
+        self.flush()
+        last = self.conn.execute(f"SELECT MAX(rowid) FROM {self.name}").fetchone()[0]
+        if last is None:
+            return
+        command = (
+            f"SELECT rowid, * FROM {self.name} "
+            "WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?"
+        )
+        after = 0
+        while rows := self.conn.execute(command, (after, last, batch_size)).fetchall():
+            after = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def find(self, **items) -> list:
+        """Get the rows matching all of the column-name + value pairs in `items`."""
+        allowed_keys = set(self.structure.keys())
+        assert all(
+            key in allowed_keys for key in items.keys()
+        ), f"Invalid key. Valid keys: {allowed_keys}"
+        self.flush()
+
+        command = f"SELECT * FROM {self.name}"
+        if len(items) > 0:
+            command += " WHERE " + " AND ".join(f"{key}=?" for key in items.keys())
+        return list(self.conn.execute(command, tuple(items.values())))
+
+    def close(self):
+        """Write pending rows and close the connection."""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def reset(self):
         """Delete the database file."""
-        try:
-            os.remove(self.path)
-        except FileNotFoundError:
-            pass
+        self._pending.clear()
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
 
 
 class Downloads(DatabaseBase):
-    """A table that stores the downloaded IDs."""
+    """A table that stores the downloaded items.
+
+    The IDs, (source, id) pairs and ISRCs are also kept in sets, loaded on
+    first use, so that lookups don't need a query. Rows migrated from the
+    old ID-only table have an empty source and match any source. Files
+    imported from a library only match by ISRC, and links aren't downloads
+    of their own, so their IDs are left out of the sets.
+    """
 
     name = "downloads"
     structure: Final[dict] = {
-        "id": ["text", "unique"],
+        "source": ["text"],
+        "media_type": ["text"],
+        "id": ["text"],
+        "path": ["text"],
+        "size": ["integer"],
+        "quality": ["integer"],
+        "isrc": ["text"],
+        "timestamp": ["integer"],
     }
+    unique = (("source", "media_type", "id"),)
+    indexes = (("id",), ("isrc",), ("path",))
+    # A download of an item that is already there replaces its record
+    on_conflict = "REPLACE"
+    version = 2
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._ids: set[str] | None = None
+        self._keys: set[tuple[str, str]] = set()
+        self._isrcs: set[str] = set()
+
+    def migrate(self, from_version: int):
+        if from_version >= 2:
+            return
+        # Version 1 only had a unique id column
+        with self.conn:
+            self.conn.execute(f"ALTER TABLE {self.name} RENAME TO {self.name}_v1")
+        self.create()
+        with self.conn:
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO {self.name} "
+                "SELECT '', 'track', id, '', 0, 0, '', 0 "
+                f"FROM {self.name}_v1"
+            )
+            self.conn.execute(f"DROP TABLE {self.name}_v1")
+
+    @property
+    def ids(self) -> set[str]:
+        if self._ids is None:
+            self._load_index()
+        return self._ids  # type: ignore
+
+    @property
+    def isrcs(self) -> set[str]:
+        if self._ids is None:
+            self._load_index()
+        return self._isrcs
+
+    def _load_index(self):
+        self.flush()
+        rows = self.conn.execute(
+            f"SELECT source, media_type, id, isrc FROM {self.name}"
+        )
+        self._keys = set()
+        self._isrcs = set()
+        for source, media_type, item_id, isrc in rows:
+            if _indexed(source, media_type):
+                self._keys.add((source, item_id))
+            if isrc != "":
+                self._isrcs.add(isrc)
+        self._ids = {item_id for _, item_id in self._keys}
+        logger.debug("Loaded %d downloaded IDs", len(self._ids))
+
+    def _has(self, source: str | None, item_id: str) -> bool:
+        if item_id not in self.ids:
+            return False
+        return (
+            source is None
+            or (source, item_id) in self._keys
+            or ("", item_id) in self._keys
+        )
+
+    def contains(self, **items) -> bool:
+        if items.keys() == {"id"}:
+            return self._has(None, str(items["id"]))
+        if items.keys() == {"source", "id"}:
+            return self._has(items["source"], str(items["id"]))
+        if items.keys() == {"isrc"}:
+            return items["isrc"] in self.isrcs
+        return super().contains(**items)
+
+    def add(self, items: tuple):
+        ids = self.ids
+        super().add(items)
+        source, item_id, isrc = str(items[0]), str(items[2]), str(items[6])
+        if _indexed(source, str(items[1])):
+            ids.add(item_id)
+            self._keys.add((source, item_id))
+        if isrc != "":
+            self._isrcs.add(isrc)
+
+    def add_many(self, rows: Iterable[tuple]):
+        rows = list(rows)
+        super().add_many(rows)
+        if self._ids is not None:
+            for row in rows:
+                if _indexed(str(row[0]), str(row[1])):
+                    self._ids.add(str(row[2]))
+                    self._keys.add((str(row[0]), str(row[2])))
+                if row[6] != "":
+                    self._isrcs.add(str(row[6]))
+
+    def remove(self, **items):
+        super().remove(**items)
+        self._ids = None
+
+    def existing_ids(self, ids: Iterable[str], source: str | None = None) -> set[str]:
+        return {i for i in map(str, ids) if self._has(source, i)}
+
+
+def _indexed(source: str, media_type: str) -> bool:
+    return source != LIBRARY_SOURCE and media_type != LINK_MEDIA_TYPE
+
+
+def link_id(item_id: str, folder: str) -> str:
+    """Get the downloads table ID of the link of a track into `folder`.
+
+    Links get their own rows, so the row of the track's download keeps its
+    path and size, and a track can be linked into many folders.
+    """
+    digest = hashlib.sha1(folder.encode("utf-8")).hexdigest()[:16]
+    return f"{item_id}@{digest}"
 
 
 class Failed(DatabaseBase):
@@ -174,23 +559,230 @@ class Failed(DatabaseBase):
     structure: Final[dict] = {
         "source": ["text"],
         "media_type": ["text"],
-        "id": ["text", "unique"],
+        "id": ["text"],
+        # 1 if the item will keep failing, e.g. because of region restrictions
+        "permanent": ["integer"],
+        "reason": ["text"],
+        "timestamp": ["integer"],
     }
+    unique = (("source", "media_type", "id"),)
+    # Failing again updates the reason and time
+    on_conflict = "REPLACE"
+    version = 2
+
+    def migrate(self, from_version: int):
+        if from_version >= 2:
+            return
+        # Version 1 only had the source, media type and a unique id
+        with self.conn:
+            self.conn.execute(f"ALTER TABLE {self.name} RENAME TO {self.name}_v1")
+        self.create()
+        with self.conn:
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO {self.name} "
+                "SELECT source, media_type, id, 0, '', 0 "
+                f"FROM {self.name}_v1"
+            )
+            self.conn.execute(f"DROP TABLE {self.name}_v1")
+
+
+@dataclass(slots=True)
+class DownloadRecord:
+    """A row of the downloads table."""
+
+    source: str
+    media_type: str
+    id: str
+    # Final location of the file, after conversion
+    path: str = ""
+    # In bytes
+    size: int = 0
+    quality: int = 0
+    isrc: str = ""
+    # Unix time of the download
+    timestamp: int = 0
+
+    def as_row(self) -> tuple:
+        return (
+            self.source,
+            self.media_type,
+            self.id,
+            self.path,
+            self.size,
+            self.quality,
+            self.isrc,
+            self.timestamp or int(time.time()),
+        )
 
 
 @dataclass(slots=True)
 class Database:
     downloads: DatabaseInterface
     failed: DatabaseInterface
-
-    def downloaded(self, item_id: str) -> bool:
-        return self.downloads.contains(id=item_id)
-
-    def set_downloaded(self, item_id: str):
-        self.downloads.add((item_id,))
-
-    def get_failed_downloads(self) -> list[tuple[str, str, str]]:
+    # (source, media_type, id) of failed items being retried, which
+    # `unavailable` doesn't skip
+    retrying: set[tuple[str, str, str]] = field(default_factory=set)
+    # Seconds failed items are skipped for, 0 to never skip them
+    permanent_ttl: float = PERMANENT_FAILURE_TTL
+    transient_ttl: float = TRANSIENT_FAILURE_TTL
+
+    def downloaded(self, item_id: str, source: str | None = None) -> bool:
+        if source is None:
+            return self.downloads.contains(id=item_id)
+        return self.downloads.contains(source=source, id=item_id)
+
+    def downloaded_many(
+        self, item_ids: Iterable[str], source: str | None = None
+    ) -> set[str]:
+        """Get the IDs in `item_ids` that have already been downloaded."""
+        return self.downloads.existing_ids(item_ids, source)
+
+    def set_downloaded(self, record: DownloadRecord):
+        self.downloads.add(record.as_row())
+
+    def get_downloads(self, **items) -> list[DownloadRecord]:
+        """Get the downloads matching the column-name + value pairs in `items`.
+
+        For example, ``get_downloads(isrc="USUM71703861")``.
+        """
+        return [DownloadRecord(*row) for row in self.downloads.find(**items)]
+
+    def find_download(self, item_id: str, source: str) -> DownloadRecord | None:
+        """Get the download of this track whose file still exists."""
+        for record in self.get_downloads(source=source, id=item_id):
+            if record.path and os.path.isfile(record.path):
+                return record
+        return None
+
+    def linked(self, item_id: str, source: str, folder: str) -> bool:
+        """Check whether the track was linked into `folder` and still is."""
+        records = self.get_downloads(
+            source=source, media_type=LINK_MEDIA_TYPE, id=link_id(item_id, folder)
+        )
+        return any(os.path.isfile(record.path) for record in records)
+
+    def find_isrc(self, isrc: str) -> DownloadRecord | None:
+        """Get a download of the recording with this ISRC whose file still exists."""
+        isrc = isrc.strip().upper()
+        if not self.downloads.contains(isrc=isrc):
+            return None
+        for record in self.get_downloads(isrc=isrc):
+            if os.path.isfile(record.path):
+                return record
+        return None
+
+    def get_failed_downloads(self) -> list[tuple]:
         return self.failed.all()
 
-    def set_failed(self, source: str, media_type: str, id: str):
-        self.failed.add((source, media_type, id))
+    def iter_failed_downloads(self, batch_size: int = 1000) -> Iterator[list[tuple]]:
+        return self.failed.iter_batches(batch_size)
+
+    def set_failed(
+        self,
+        source: str,
+        media_type: str,
+        id: str,
+        permanent: bool = False,
+        reason: str = "",
+    ):
+        self.failed.add(
+            (source, media_type, id, int(permanent), reason, int(time.time()))
+        )
+
+    def remove_failed(self, source: str, media_type: str, id: str):
+        self.failed.remove(source=source, media_type=media_type, id=str(id))
+
+    def unavailable(self, source: str, media_type: str, id: str) -> bool:
+        """Check whether the item failed recently enough to be skipped."""
+        if (source, media_type, str(id)) in self.retrying:
+            return False
+        rows = self.failed.find(source=source, media_type=media_type, id=str(id))
+        if len(rows) == 0:
+            return False
+        _, _, _, permanent, _, timestamp = rows[0]
+        ttl = self.permanent_ttl if permanent else self.transient_ttl
+        return ttl > 0 and time.time() - timestamp < ttl
+
+    def close(self):
+        self.downloads.close()
+        self.failed.close()
+
+
+class AsyncDatabase:
+    """Runs the calls of a Database on a dedicated thread.
+
+    SQLite calls block, and the database may live on a slow or network
+    filesystem. Coroutines use this so that they never stall the event
+    loop, and with it every other download, while waiting on the database.
+    Calls are queued and run one at a time, in order.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="streamrip-db"
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def downloaded(self, item_id: str, source: str | None = None) -> bool:
+        return await self._run(self.db.downloaded, item_id, source)
+
+    async def downloaded_many(
+        self, item_ids: Iterable[str], source: str | None = None
+    ) -> set[str]:
+        return await self._run(self.db.downloaded_many, list(item_ids), source)
+
+    async def set_downloaded(self, record: DownloadRecord):
+        await self._run(self.db.set_downloaded, record)
+
+    async def get_downloads(self, **items) -> list[DownloadRecord]:
+        return await self._run(self.db.get_downloads, **items)
+
+    async def find_download(self, item_id: str, source: str) -> DownloadRecord | None:
+        return await self._run(self.db.find_download, item_id, source)
+
+    async def linked(self, item_id: str, source: str, folder: str) -> bool:
+        return await self._run(self.db.linked, item_id, source, folder)
+
+    async def find_isrc(self, isrc: str) -> DownloadRecord | None:
+        return await self._run(self.db.find_isrc, isrc)
+
+    async def get_failed_downloads(self) -> list[tuple]:
+        return await self._run(self.db.get_failed_downloads)
+
+    async def iter_failed_downloads(
+        self, batch_size: int = 1000
+    ) -> AsyncIterator[list[tuple]]:
+        """Get the rows of the failed downloads table in batches."""
+        batches = self.db.iter_failed_downloads(batch_size)
+        while (batch := await self._run(next, batches, None)) is not None:
+            yield batch
+
+    @property
+    def retrying(self) -> set[tuple[str, str, str]]:
+        return self.db.retrying
+
+    async def set_failed(
+        self,
+        source: str,
+        media_type: str,
+        id: str,
+        permanent: bool = False,
+        reason: str = "",
+    ):
+        await self._run(self.db.set_failed, source, media_type, id, permanent, reason)
+
+    async def remove_failed(self, source: str, media_type: str, id: str):
+        await self._run(self.db.remove_failed, source, media_type, id)
+
+    async def unavailable(self, source: str, media_type: str, id: str) -> bool:
+        return await self._run(self.db.unavailable, source, media_type, id)
+
+    async def close(self):
+        await self._run(self.db.close)
+        self._executor.shutdown()
@@ -1,5 +1,7 @@
 """Streamrip specific exceptions."""
 
+import re
+
 from click import echo, style
 
 
@@ -32,12 +34,15 @@ class NonStreamableError(Exception):
     A versatile error that can have many causes.
     """
 
-    def __init__(self, message=None):
+    def __init__(self, message=None, permanent: bool = False):
         """Create a NonStreamable exception.
 
         :param message:
+        :param permanent: whether retrying later will fail the same way, e.g.
+        because the item was removed or is blocked in the user's region
         """
         self.message = message
+        self.permanent = permanent
         super().__init__(self.message)
 
     def print(self, item):
@@ -66,5 +71,23 @@ class NonStreamableError(Exception):
         return " ".join(base_msg)
 
 
+# Words in Qobuz and Tidal restriction codes that mean the item itself can't be
+# streamed. Others, such as format or subscription restrictions, depend on the
+# account or the requested quality.
+PERMANENT_RESTRICTIONS = ("NotFound", "NotStreamable", "Geo", "Country", "Region")
+
+
+def restriction_error(code: str) -> NonStreamableError:
+    """Create the error for a Qobuz or Tidal restriction code.
+
+    :param code: CamelCase code, e.g. "TrackRestrictedByGeolocation"
+    """
+    # Turn CamelCase code into a readable sentence
+    words = re.findall(r"([A-Z][a-z]+)", code)
+    message = " ".join([words[0], *map(str.lower, words[1:])]) + "."
+    permanent = any(word in code for word in PERMANENT_RESTRICTIONS)
+    return NonStreamableError(message, permanent=permanent)
+
+
 class ConversionError(Exception):
     """ConversionError."""
@@ -1,8 +1,19 @@
+import hashlib
+import os
+import shutil
 from string import printable
 
 from pathvalidate import sanitize_filename, sanitize_filepath  # type: ignore
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
 ALLOWED_CHARS = set(printable)
+# ioctl that makes a file share another file's data until either is changed,
+# on filesystems that support it, like btrfs and XFS
+FICLONE = 0x40049409
 
 
 # TODO: remove this when new pathvalidate release arrives with https://github.com/thombashi/pathvalidate/pull/48
@@ -26,3 +37,80 @@ def clean_filepath(fn: str, restrict: bool = False) -> str:
         path = "".join(c for c in path if c in ALLOWED_CHARS)
 
     return path
+
+
+def link_or_copy(src: str, dst: str):
+    """Hard link `src` to `dst`, or copy it if they are on different filesystems.
+
+    A different file already at `dst` is replaced.
+    """
+    try:
+        if os.path.samefile(src, dst):
+            return
+    except FileNotFoundError:
+        pass
+    # Made under another name first and moved into place, since a link can't
+    # overwrite `dst`, and so that a partial copy is never seen
+    tmp = staging_path(dst)
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def reflink_or_copy(src: str, dst: str):
+    """Copy `src` to `dst`, sharing its data copy-on-write if possible.
+
+    Unlike a hard link, changing `dst` afterwards doesn't change `src`.
+    """
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(s, d)
+
+
+def replace_with_copy(src: str, dst: str):
+    """Replace `dst` with a copy of `src`, made with `reflink_or_copy`.
+
+    The copy is moved into place once it is complete, so `dst` is never
+    partially written, and changing either file afterwards doesn't change
+    the other.
+    """
+    tmp = staging_path(dst)
+    try:
+        reflink_or_copy(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def staging_path(path: str) -> str:
+    """Return a hidden path to write `path` to until it is complete.
+
+    It is in the same folder, so it can be moved into place with `os.replace`,
+    which is atomic. The extension is kept for tools that rely on it.
+    """
+    folder, name = os.path.split(path)
+    ext = os.path.splitext(name)[1]
+    digest = hashlib.sha1(name.encode()).hexdigest()[:16]
+    return os.path.join(folder, f".streamrip-{digest}{ext}")
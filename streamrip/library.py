@@ -0,0 +1,164 @@
+"""Imports an existing music library into the downloads database."""
+
+import logging
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+import mutagen
+from mutagen.flac import FLAC
+from mutagen.mp3 import MP3
+from mutagen.mp4 import MP4
+
+from .db import LIBRARY_SOURCE, DatabaseInterface, DownloadRecord
+from .metadata.tagger import FLAC_KEY, MP4_KEY
+
+logger = logging.getLogger("streamrip")
+
+AUDIO_EXTENSIONS = (".flac", ".mp3", ".m4a")
+# Number of paths handed to the worker processes at a time, which bounds
+# memory use on libraries with millions of files.
+SCAN_CHUNK_SIZE = 2000
+# Number of folders listed at the same time. Listing a folder mostly waits on
+# the disk, so threads are enough to hide the latency of network shares and
+# hard drives.
+SCAN_THREADS = 16
+
+
+def _scan_folder(folder: str) -> tuple[list[str], list[str]]:
+    """List the subfolders and audio files directly inside `folder`."""
+    folders, files = [], []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    files.append(entry.path)
+    except OSError as e:
+        logger.warning("Skipping unreadable folder: %s", e)
+    return folders, files
+
+
+def iter_audio_files(folder: str, threads: int = SCAN_THREADS) -> Iterator[str]:
+    """Yield the paths of the audio files under `folder`.
+
+    Folders are listed in a thread pool, so the order of the paths is not
+    deterministic.
+    """
+    with ThreadPoolExecutor(threads, thread_name_prefix="streamrip-scan") as pool:
+        pending = {pool.submit(_scan_folder, folder)}
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                folders, files = future.result()
+                pending.update(pool.submit(_scan_folder, f) for f in folders)
+                yield from files
+
+
+def read_library_row(path: str) -> tuple | None:
+    """Read the downloads table row for the audio file at `path`.
+
+    This runs in a worker process, so it returns a plain tuple.
+
+    :rtype: tuple | None
+    """
+    try:
+        audio = mutagen.File(path)  # type: ignore
+        stat = os.stat(path)
+    except (mutagen.MutagenError, OSError):
+        return None
+    if audio is None:
+        return None
+
+    return DownloadRecord(
+        source=LIBRARY_SOURCE,
+        media_type="track",
+        id=path,
+        path=path,
+        size=stat.st_size,
+        quality=_quality(audio),
+        isrc=_isrc(audio),
+        timestamp=int(stat.st_mtime),
+    ).as_row()
+
+
+def _isrc(audio) -> str:
+    tags = audio.tags
+    if tags is None:
+        return ""
+    if isinstance(audio, FLAC):
+        values = tags.get(FLAC_KEY["isrc"], [])
+    elif isinstance(audio, MP3):
+        values = [text for frame in tags.getall("TSRC") for text in frame.text]
+    elif isinstance(audio, MP4):
+        values = [v.decode("utf-8") for v in tags.get(MP4_KEY["isrc"], [])]
+    else:
+        return ""
+    return str(values[0]).strip().upper() if len(values) > 0 else ""
+
+
+def _quality(audio) -> int:
+    # Same scale as the source quality settings
+    lossless = isinstance(audio, FLAC) or (
+        isinstance(audio, MP4) and getattr(audio.info, "codec", "") == "alac"
+    )
+    if not lossless:
+        return 1
+    if getattr(audio.info, "bits_per_sample", 16) <= 16:
+        return 2
+    if audio.info.sample_rate <= 96000:
+        return 3
+    return 4
+
+
+def _chunks(it: Iterable[str], n: int) -> Iterator[list[str]]:
+    it = iter(it)
+    while chunk := list(islice(it, n)):
+        yield chunk
+
+
+def import_library(
+    folder: str,
+    downloads: DatabaseInterface,
+    workers: int | None = None,
+    callback: Callable[[int], None] | None = None,
+) -> int:
+    """Add a record for every audio file under `folder` to `downloads`.
+
+    The folder is walked in a thread pool and tags are read in a process pool
+    while the next chunk of files is found, and the records are inserted in
+    bulk.
+
+    :param workers: number of worker processes, defaults to the CPU count
+    :param callback: called with the number of files imported so far
+    :return: number of files imported
+    """
+    count = 0
+
+    def add(results: Iterator[tuple | None]):
+        nonlocal count
+        rows = [row for row in results if row is not None]
+        downloads.add_many(rows)
+        count += len(rows)
+        if callback is not None:
+            callback(count)
+
+    with ProcessPoolExecutor(workers) as pool:
+        # `map` submits the whole chunk at once, so the workers read it while
+        # the previous chunk is inserted and the next one is found
+        reading = None
+        for paths in _chunks(iter_audio_files(folder), SCAN_CHUNK_SIZE):
+            results = pool.map(read_library_row, paths, chunksize=64)
+            if reading is not None:
+                add(reading)
+            reading = results
+        if reading is not None:
+            add(reading)
+    return count
@@ -9,7 +9,7 @@ from .playlist import (
     PendingPlaylistTrack,
     Playlist,
 )
-from .track import PendingSingle, PendingTrack, Track
+from .track import LinkedTrack, PendingSingle, PendingTrack, Track
 
 __all__ = [
     "Media",
@@ -24,6 +24,7 @@ __all__ = [
     "PendingPlaylist",
     "PendingLastfmPlaylist",
     "Track",
+    "LinkedTrack",
     "PendingTrack",
     "PendingPlaylistTrack",
     "PendingSingle",
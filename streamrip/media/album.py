@@ -6,7 +6,7 @@ from dataclasses import dataclass
 from .. import progress
 from ..client import Client
 from ..config import Config
-from ..db import Database
+from ..db import AsyncDatabase
 from ..exceptions import NonStreamableError
 from ..filepath_utils import clean_filepath
 from ..metadata import AlbumMetadata
@@ -25,7 +25,7 @@ class Album(Media):
     config: Config
     # folder where the tracks will be downloaded
     folder: str
-    db: Database
+    db: AsyncDatabase
 
     async def preprocess(self):
         progress.add_title(self.meta.album)
@@ -57,15 +57,28 @@ class PendingAlbum(Pending):
     id: str
     client: Client
     config: Config
-    db: Database
+    db: AsyncDatabase
 
     async def resolve(self) -> Album | None:
+        if await self.db.unavailable(self.client.source, "album", self.id):
+            logger.info(
+                f"Skipping album {self.id}. It failed recently on {self.client.source}."
+            )
+            return None
+
         try:
             resp = await self.client.get_metadata(self.id, "album")
         except NonStreamableError as e:
             logger.error(
                 f"Album {self.id} not available to stream on {self.client.source} ({e})",
             )
+            await self.db.set_failed(
+                self.client.source,
+                "album",
+                self.id,
+                permanent=e.permanent,
+                reason=str(e),
+            )
             return None
 
         try:
@@ -81,8 +94,20 @@ class PendingAlbum(Pending):
             return None
 
         tracklist = get_album_track_ids(self.client.source, resp)
+        downloaded = await self.db.downloaded_many(tracklist, self.client.source)
+        if len(downloaded) > 0:
+            logger.info(
+                f"Skipping {len(downloaded)} tracks of album {self.id} already logged in database."
+            )
+            tracklist = [id for id in tracklist if str(id) not in downloaded]
         folder = self.config.session.downloads.folder
         album_folder = self._album_folder(folder, meta)
+        if len(tracklist) == 0:
+            # Nothing left to download, so don't create the folder or fetch
+            # artwork. The album is still returned so discography filters
+            # see the same set of albums as before.
+            return Album(meta, [], self.config, album_folder, self.db)
+
         os.makedirs(album_folder, exist_ok=True)
         embed_cover, _ = await download_artwork(
             self.client.session,
@@ -6,7 +6,7 @@ from dataclasses import dataclass
 from ..client import Client
 from ..config import Config, QobuzDiscographyFilterConfig
 from ..console import console
-from ..db import Database
+from ..db import AsyncDatabase
 from ..exceptions import NonStreamableError
 from ..metadata import ArtistMetadata
 from .album import Album, PendingAlbum
@@ -182,7 +182,7 @@ class PendingArtist(Pending):
     id: str
     client: Client
     config: Config
-    db: Database
+    db: AsyncDatabase
 
     async def resolve(self) -> Artist | None:
         try:
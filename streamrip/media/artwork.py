@@ -1,19 +1,250 @@
 import asyncio
+import functools
+import hashlib
 import logging
 import os
 import shutil
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import aiohttp
 from PIL import Image
 
 from ..client import BasicDownloadable
-from ..config import ArtworkConfig
+from ..config import APP_DIR, ArtworkConfig
+from ..filepath_utils import replace_with_copy
 from ..metadata import Covers
 
 _artwork_tempdirs: set[str] = set()
+# Artwork downloaded this session, keyed by URL and max width. Each image is
+# downloaded and downscaled once, then linked or copied to other paths.
+_artwork_paths: dict[tuple[str, int], str] = {}
+_artwork_downloads: dict[tuple[str, int], asyncio.Future[str]] = {}
 
 logger = logging.getLogger("streamrip")
 
+DEFAULT_ARTWORK_CACHE_PATH = os.path.join(APP_DIR, "artwork_cache")
+# Fraction of the maximum size that a full artwork cache is shrunk to
+EVICTION_LOW_WATER = 0.9
+
+# Decoding and resizing covers is CPU bound, so it runs off the event loop.
+# Pillow releases the GIL while doing it, so threads are enough.
+_image_executor = ThreadPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1),
+    thread_name_prefix="streamrip-artwork",
+)
+
+
+class ArtworkCache:
+    """Cover images kept on disk across sessions, keyed by URL.
+
+    The original image and each downscaled version of it are stored as
+    separate files. Once the cache is larger than `max_size` bytes, the least
+    recently used files are removed until it is below `EVICTION_LOW_WATER` of
+    that, so that the next covers don't each trigger an eviction.
+
+    The folder is scanned once, and the cache is tracked in memory afterwards.
+    Entries being copied from are pinned, so that they aren't evicted by
+    concurrent fetches.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        # Entry path -> file size, least recently used first. Loaded on first use
+        self._entries: OrderedDict[str, int] | None = None
+        self._size = 0
+        self._load_lock = threading.Lock()
+        # Number of fetches using each entry
+        self._pinned: Counter[str] = Counter()
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        max_width: int,
+        path: str,
+        source: str | None = None,
+    ) -> str:
+        """Copy the image at `url` to `path`, downloading it if it isn't cached.
+
+        If `max_width` is positive, the image is downscaled to fit it, from
+        `source` if given. It should be a larger version of the same image.
+
+        :return: path of the cache entry
+        """
+        if self._entries is None:
+            await _run_in_executor(self.size)
+        entry = await self._entry(session, url, max_width, source)
+        try:
+            # Not a hard link, which would make the entry change with the file
+            await _run_in_executor(replace_with_copy, entry, path)
+        finally:
+            self._unpin(entry)
+        return entry
+
+    def entry_path(self, url: str, max_width: int) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        if max_width > 0:
+            return os.path.join(self.path, f"{key}_{max_width}.jpg")
+        return os.path.join(self.path, f"{key}.jpg")
+
+    def size(self) -> int:
+        """Total size of the entries, scanning the folder on first use."""
+        with self._load_lock:
+            if self._entries is None:
+                self._entries = self._scan()
+                self._size = sum(self._entries.values())
+        return self._size
+
+    def _scan(self) -> OrderedDict[str, int]:
+        entries = []
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".jpg"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return OrderedDict((path, size) for _, path, size in sorted(entries))
+
+    async def _entry(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        max_width: int,
+        source: str | None,
+    ) -> str:
+        """Return the pinned entry for the image, adding it if needed."""
+        path = await self._get(url, max_width)
+        if path is not None:
+            return path
+        if max_width <= 0:
+            return await self._download(session, url)
+        if source is not None:
+            return await self._downscale(source, url, max_width)
+
+        original = await self._get(url, -1) or await self._download(session, url)
+        try:
+            return await self._downscale(original, url, max_width)
+        finally:
+            self._unpin(original)
+
+    async def _get(self, url: str, max_width: int) -> str | None:
+        assert self._entries is not None
+        path = self.entry_path(url, max_width)
+        if path not in self._entries:
+            return None
+        self._entries.move_to_end(path)
+        self._pin(path)
+        try:
+            # Marks it as recently used for the next sessions
+            await _run_in_executor(os.utime, path)
+        except FileNotFoundError:
+            # Removed by something else
+            self._unpin(path)
+            self._size -= self._entries.pop(path, 0)
+            return None
+        return path
+
+    async def _download(self, session: aiohttp.ClientSession, url: str) -> str:
+        tmp = await _run_in_executor(self._temp_path)
+        try:
+            await BasicDownloadable(session, url, "jpg").download(tmp, lambda _: None)
+            return await self._add(tmp, url, -1)
+        finally:
+            await _run_in_executor(_remove, tmp)
+
+    async def _downscale(self, original: str, url: str, max_width: int) -> str:
+        tmp = await _run_in_executor(self._temp_path)
+        try:
+            await _run_in_executor(shutil.copyfile, original, tmp)
+            await downscale(tmp, max_width)
+            return await self._add(tmp, url, max_width)
+        finally:
+            await _run_in_executor(_remove, tmp)
+
+    def _temp_path(self) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+        os.close(fd)
+        return tmp
+
+    async def _add(self, tmp: str, url: str, max_width: int) -> str:
+        """Move `tmp` into the cache, and return the pinned entry."""
+        assert self._entries is not None
+        path = self.entry_path(url, max_width)
+        self._pin(path)
+        try:
+            size = await _run_in_executor(_replace, tmp, path)
+        except BaseException:
+            self._unpin(path)
+            raise
+        self._size += size - self._entries.pop(path, 0)
+        self._entries[path] = size
+        if self._size > self.max_size:
+            await self._evict()
+        return path
+
+    async def _evict(self):
+        assert self._entries is not None
+        low_water = self.max_size * EVICTION_LOW_WATER
+        evicted = []
+        for path, size in list(self._entries.items()):
+            if self._size <= low_water:
+                break
+            if self._pinned[path] > 0:
+                continue
+            del self._entries[path]
+            self._size -= size
+            evicted.append(path)
+        await _run_in_executor(_remove_all, evicted)
+        logger.debug("Artwork cache is now %d bytes", self._size)
+
+    def _pin(self, path: str):
+        self._pinned[path] += 1
+
+    def _unpin(self, path: str):
+        self._pinned[path] -= 1
+        if self._pinned[path] <= 0:
+            del self._pinned[path]
+
+
+def _replace(src: str, dst: str) -> int:
+    """Move `src` to `dst`, and return its size."""
+    os.replace(src, dst)
+    return os.path.getsize(dst)
+
+
+def _remove_all(paths: list[str]):
+    for path in paths:
+        _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_artwork_cache: ArtworkCache | None = None
+
+
+def get_artwork_cache(config: ArtworkConfig) -> ArtworkCache | None:
+    """Return the artwork cache shared by this session, or None if disabled."""
+    global _artwork_cache
+    if config.cache_size_mb <= 0:
+        return None
+    if _artwork_cache is None:
+        _artwork_cache = ArtworkCache(
+            DEFAULT_ARTWORK_CACHE_PATH, config.cache_size_mb * 2**20
+        )
+    return _artwork_cache
+
 
 def remove_artwork_tempdirs():
     logger.debug("Removing dirs %s", _artwork_tempdirs)
@@ -22,6 +253,7 @@ def remove_artwork_tempdirs():
             shutil.rmtree(path)
         except FileNotFoundError:
             pass
+    _artwork_paths.clear()
 
 
 async def download_artwork(
@@ -44,6 +276,9 @@ async def download_artwork(
 
     Hi-res (saved) artworks are kept in `folder` as "cover.jpg".
 
+    If the artwork cache is enabled, images are served from it, and copied
+    into place.
+
     Args:
     ----
         session (aiohttp.ClientSession):
@@ -64,6 +299,7 @@ async def download_artwork(
         # No need to download anything
         return None, None
 
+    cache = get_artwork_cache(config)
     downloadables = []
 
     _, l_url, saved_cover_path = covers.largest()
@@ -71,9 +307,8 @@ async def download_artwork(
         saved_cover_path = os.path.join(folder, "cover.jpg")
         assert l_url is not None
         downloadables.append(
-            BasicDownloadable(session, l_url, "jpg").download(
-                saved_cover_path,
-                lambda _: None,
+            _download_once(
+                session, cache, l_url, config.saved_max_width, saved_cover_path
             ),
         )
 
@@ -85,9 +320,8 @@ async def download_artwork(
         _artwork_tempdirs.add(embed_dir)
         embed_cover_path = os.path.join(embed_dir, f"cover{hash(embed_url)}.jpg")
         downloadables.append(
-            BasicDownloadable(session, embed_url, "jpg").download(
-                embed_cover_path,
-                lambda _: None,
+            _download_once(
+                session, cache, embed_url, config.embed_max_width, embed_cover_path
             ),
         )
 
@@ -104,18 +338,114 @@ async def download_artwork(
     if save_artwork:
         assert saved_cover_path is not None
         covers.set_largest_path(saved_cover_path)
-        if config.saved_max_width > 0:
-            downscale_image(saved_cover_path, config.saved_max_width)
 
     if embed:
         assert embed_cover_path is not None
         covers.set_path(config.embed_size, embed_cover_path)
-        if config.embed_max_width > 0:
-            downscale_image(embed_cover_path, config.embed_max_width)
 
     return embed_cover_path, saved_cover_path
 
 
+async def _download_once(
+    session: aiohttp.ClientSession,
+    cache: ArtworkCache | None,
+    url: str,
+    max_width: int,
+    path: str,
+):
+    """Download the image at `url` to `path`, downscaled to `max_width`.
+
+    Concurrent calls for the same image share one download, and later calls
+    copy the finished image instead of downloading it again. Copies rather
+    than hard links are used, since the user may edit or replace the files.
+    """
+    key = (url, max_width)
+    source = _artwork_paths.get(key)
+    if source is not None:
+        try:
+            await _run_in_executor(replace_with_copy, source, path)
+            return
+        except FileNotFoundError:
+            # Removed since it was downloaded
+            del _artwork_paths[key]
+
+    task = _artwork_downloads.get(key)
+    if task is None:
+        task = asyncio.ensure_future(
+            _download_image(session, cache, url, max_width, path)
+        )
+        _artwork_downloads[key] = task
+        task.add_done_callback(functools.partial(_downloaded, key))
+    # Cancelling one waiter shouldn't cancel the download for the others
+    source = await asyncio.shield(task)
+    if source != path:
+        await _run_in_executor(replace_with_copy, source, path)
+
+
+def _downloaded(key: tuple[str, int], task: asyncio.Future[str]):
+    del _artwork_downloads[key]
+    if not task.cancelled() and task.exception() is None:
+        _artwork_paths[key] = task.result()
+
+
+async def _download_image(
+    session: aiohttp.ClientSession,
+    cache: ArtworkCache | None,
+    url: str,
+    max_width: int,
+    path: str,
+) -> str:
+    # Downscaling a larger version of the image that was already downloaded
+    # saves a download, and decoding the original again
+    larger = await _larger_version(url, max_width)
+    if cache is not None:
+        await cache.fetch(session, url, max_width, path, larger)
+        return path
+
+    if larger is not None:
+        await _run_in_executor(shutil.copyfile, larger, path)
+    else:
+        await BasicDownloadable(session, url, "jpg").download(path, lambda _: None)
+    if max_width > 0:
+        await downscale(path, max_width)
+    return path
+
+
+async def _larger_version(url: str, max_width: int) -> str | None:
+    """Return the path of a version of `url` larger than `max_width`, if any."""
+    if max_width <= 0:
+        return None
+
+    def larger(key: tuple[str, int]) -> bool:
+        return key[0] == url and (key[1] <= 0 or key[1] > max_width)
+
+    for key, path in _artwork_paths.items():
+        if larger(key) and _is_file(path):
+            return path
+    for key, task in list(_artwork_downloads.items()):
+        if larger(key):
+            try:
+                return await asyncio.shield(task)
+            except Exception:
+                return None
+    return None
+
+
+def _is_file(path: str) -> bool:
+    return os.path.isfile(path)
+
+
+async def _run_in_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(
+        _image_executor, func, *args
+    )
+
+
+async def downscale(input_image_path: str, max_dimension: int):
+    """Downscale an image in place, off the event loop."""
+    await _run_in_executor(downscale_image, input_image_path, max_dimension)
+
+
 def downscale_image(input_image_path: str, max_dimension: int):
     """Downscale an image in place given a maximum allowed dimension.
 
@@ -146,8 +476,13 @@ def downscale_image(input_image_path: str, max_dimension: int):
         new_height = max_dimension
         new_width = int(width * (max_dimension / height))
 
+    # For JPEGs, decode at the smallest DCT scale that is still larger than
+    # the result, which is much faster than decoding the full image
+    image.draft(image.mode, (new_width, new_height))
+
     # Resize the image with the new dimensions
     resized_image = image.resize((new_width, new_height))
 
-    # Save the resized image
-    resized_image.save(input_image_path)
+    # Save the resized image, in the same format since the path may not have
+    # an image extension
+    resized_image.save(input_image_path, format=image.format)
@@ -6,7 +6,7 @@ from streamrip.exceptions import NonStreamableError
 
 from ..client import Client
 from ..config import Config
-from ..db import Database
+from ..db import AsyncDatabase
 from ..metadata import LabelMetadata
 from .album import PendingAlbum
 from .media import Media, Pending
@@ -60,7 +60,7 @@ class PendingLabel(Pending):
     id: str
     client: Client
     config: Config
-    db: Database
+    db: AsyncDatabase
 
     async def resolve(self) -> Label | None:
         try:
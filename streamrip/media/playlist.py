@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import html
 import logging
 import os
@@ -14,7 +15,7 @@ from .. import progress
 from ..client import Client
 from ..config import Config
 from ..console import console
-from ..db import Database
+from ..db import AsyncDatabase
 from ..exceptions import NonStreamableError
 from ..filepath_utils import clean_filepath
 from ..metadata import (
@@ -27,7 +28,7 @@ from ..metadata import (
 from ..utils.ssl_utils import get_aiohttp_connector_kwargs
 from .artwork import download_artwork
 from .media import Media, Pending
-from .track import Track
+from .track import LinkedTrack, Track, find_duplicate
 
 logger = logging.getLogger("streamrip")
 
@@ -40,16 +41,39 @@ class PendingPlaylistTrack(Pending):
     folder: str
     playlist_name: str
     position: int
-    db: Database
+    db: AsyncDatabase
 
-    async def resolve(self) -> Track | None:
-        if self.db.downloaded(self.id):
-            logger.info(f"Track ({self.id}) already logged in database. Skipping.")
+    async def resolve(self) -> Track | LinkedTrack | None:
+        link = self.config.session.database.link_playlist_tracks
+        existing = None
+        if link and await self.db.linked(self.id, self.client.source, self.folder):
+            logger.info(f"Track ({self.id}) already linked into playlist. Skipping.")
+            return None
+        if await self.db.downloaded(self.id, self.client.source):
+            if link:
+                existing = await self.db.find_download(self.id, self.client.source)
+            if existing is None:
+                logger.info(f"Track ({self.id}) already logged in database. Skipping.")
+                return None
+            if os.path.dirname(existing.path) == self.folder:
+                logger.info(f"Track ({self.id}) already in playlist folder. Skipping.")
+                return None
+        if await self.db.unavailable(self.client.source, "track", self.id):
+            logger.info(
+                f"Track ({self.id}) failed recently on {self.client.source}. Skipping."
+            )
             return None
         try:
             resp = await self.client.get_metadata(self.id, "track")
         except NonStreamableError as e:
             logger.error(f"Could not stream track {self.id}: {e}")
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=e.permanent,
+                reason=str(e),
+            )
             return None
 
         album = AlbumMetadata.from_track_resp(resp, self.client.source)
@@ -57,14 +81,26 @@ class PendingPlaylistTrack(Pending):
             logger.error(
                 f"Track ({self.id}) not available for stream on {self.client.source}",
             )
-            self.db.set_failed(self.client.source, "track", self.id)
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=True,
+                reason="Not streamable",
+            )
             return None
         meta = TrackMetadata.from_resp(album, self.client.source, resp)
         if meta is None:
             logger.error(
                 f"Track ({self.id}) not available for stream on {self.client.source}",
             )
-            self.db.set_failed(self.client.source, "track", self.id)
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=True,
+                reason="Not streamable",
+            )
             return None
 
         c = self.config.session.metadata
@@ -72,6 +108,30 @@ class PendingPlaylistTrack(Pending):
             meta.tracknumber = self.position
         if c.set_playlist_to_album:
             album.album = self.playlist_name
+        # Tags of the existing file are those of its album
+        retag = c.renumber_playlist_tracks or c.set_playlist_to_album
+
+        if existing is not None:
+            logger.info(f"Linking track '{meta.title}' to {existing.path}")
+            return LinkedTrack(
+                meta,
+                self.client.source,
+                existing.path,
+                self.config,
+                self.folder,
+                self.db,
+                retag=retag,
+                as_link=True,
+            )
+
+        duplicate, linked = await find_duplicate(
+            meta, self.client.source, self.config, self.folder, self.db, link=link
+        )
+        if duplicate:
+            if linked is not None:
+                linked.retag = retag
+                linked.as_link = link
+            return linked
 
         quality = self.config.session.get_source(self.client.source).quality
         try:
@@ -81,7 +141,13 @@ class PendingPlaylistTrack(Pending):
             )
         except NonStreamableError as e:
             logger.error(f"Error fetching download info for track {self.id}: {e}")
-            self.db.set_failed(self.client.source, "track", self.id)
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=e.permanent,
+                reason=str(e),
+            )
             return None
 
         return Track(
@@ -91,6 +157,9 @@ class PendingPlaylistTrack(Pending):
             self.folder,
             embedded_cover_path,
             self.db,
+            refresh_downloadable=functools.partial(
+                self.client.get_downloadable, self.id, quality
+            ),
         )
 
     async def _download_cover(self, covers: Covers, folder: str) -> str | None:
@@ -120,23 +189,37 @@ class Playlist(Media):
     async def download(self):
         track_resolve_chunk_size = 20
 
-        async def _resolve_download(item: PendingPlaylistTrack):
+        async def _resolve(item: PendingPlaylistTrack) -> Track | LinkedTrack | None:
+            try:
+                return await item.resolve()
+            except Exception as e:
+                logger.error(f"Error resolving track: {e}")
+                return None
+
+        async def _rip(track: Track | LinkedTrack):
             try:
-                track = await item.resolve()
-                if track is None:
-                    return
                 await track.rip()
             except Exception as e:
                 logger.error(f"Error downloading track: {e}")
 
-        batches = self.batch(
-            [_resolve_download(track) for track in self.tracks],
-            track_resolve_chunk_size,
-        )
+        def _resolve_batch(batch: list[PendingPlaylistTrack]):
+            return asyncio.ensure_future(asyncio.gather(*[_resolve(t) for t in batch]))
 
-        for batch in batches:
-            results = await asyncio.gather(*batch, return_exceptions=True)
+        batches = list(self.batch(self.tracks, track_resolve_chunk_size))
+        if len(batches) == 0:
+            return
 
+        # The next batch, including its stream URLs, is resolved while the
+        # current one downloads, so the downloads don't wait on API requests.
+        resolving = _resolve_batch(batches[0])
+        for i in range(len(batches)):
+            tracks = await resolving
+            if i + 1 < len(batches):
+                resolving = _resolve_batch(batches[i + 1])
+
+            results = await asyncio.gather(
+                *[_rip(t) for t in tracks if t is not None], return_exceptions=True
+            )
             for result in results:
                 if isinstance(result, Exception):
                     logger.error(f"Batch processing error: {result}")
@@ -153,7 +236,7 @@ class PendingPlaylist(Pending):
     id: str
     client: Client
     config: Config
-    db: Database
+    db: AsyncDatabase
 
     async def resolve(self) -> Playlist | None:
         try:
@@ -172,6 +255,16 @@ class PendingPlaylist(Pending):
         name = meta.name
         parent = self.config.session.downloads.folder
         folder = os.path.join(parent, clean_filepath(name))
+        ids = meta.ids()
+        if self.config.session.database.link_playlist_tracks:
+            # Downloaded tracks are linked into the playlist folder
+            downloaded = set()
+        else:
+            downloaded = await self.db.downloaded_many(ids, self.client.source)
+        if len(downloaded) > 0:
+            logger.info(
+                f"Skipping {len(downloaded)} tracks of playlist {self.id} already logged in database."
+            )
         tracks = [
             PendingPlaylistTrack(
                 id,
@@ -182,7 +275,8 @@ class PendingPlaylist(Pending):
                 position + 1,
                 self.db,
             )
-            for position, id in enumerate(meta.ids())
+            for position, id in enumerate(ids)
+            if str(id) not in downloaded
         ]
         return Playlist(name, self.config, self.client, tracks)
 
@@ -193,7 +287,7 @@ class PendingLastfmPlaylist(Pending):
     client: Client
     fallback_client: Client | None
     config: Config
-    db: Database
+    db: AsyncDatabase
 
     @dataclass(slots=True)
     class Status:
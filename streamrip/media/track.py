@@ -1,15 +1,32 @@
 import asyncio
+import functools
 import logging
 import os
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import aiohttp
+import requests
 
 from .. import converter
 from ..client import Client, Downloadable
-from ..config import Config
-from ..db import Database
+from ..config import ISRC_DUPLICATE_POLICIES, Config
+from ..db import LINK_MEDIA_TYPE, AsyncDatabase, DownloadRecord, link_id
 from ..exceptions import NonStreamableError
-from ..filepath_utils import clean_filename
-from ..metadata import AlbumMetadata, Covers, TrackMetadata, tag_file
+from ..filepath_utils import (
+    clean_filename,
+    link_or_copy,
+    reflink_or_copy,
+    staging_path,
+)
+from ..metadata import (
+    AlbumMetadata,
+    Covers,
+    TrackMetadata,
+    reserved_tag_space,
+    tag_file,
+)
 from ..progress import add_title, get_progress_callback, remove_title
 from .artwork import download_artwork
 from .media import Media, Pending
@@ -17,6 +34,10 @@ from .semaphore import global_download_semaphore
 
 logger = logging.getLogger("streamrip")
 
+# Signed stream URLs stop working some time after they are requested. If a
+# track waits longer than this for a download slot, its URL is requested again.
+STREAM_URL_TTL = 10 * 60
+
 
 @dataclass(slots=True)
 class Track(Media):
@@ -26,10 +47,17 @@ class Track(Media):
     folder: str
     # Is None if a cover doesn't exist for the track
     cover_path: str | None
-    db: Database
+    db: AsyncDatabase
     # change?
     download_path: str = ""
+    # Hidden file next to `download_path` that the track is written to. It is
+    # moved to `download_path` once it is downloaded, tagged and converted.
+    staging_path: str = ""
     is_single: bool = False
+    # Requests a fresh downloadable for this track, used when the current one
+    # is stale. None if it can't be refreshed.
+    refresh_downloadable: Callable[[], Awaitable[Downloadable]] | None = None
+    downloadable_time: float = field(default_factory=time.time)
 
     async def preprocess(self):
         self._set_download_path()
@@ -38,15 +66,21 @@ class Track(Media):
             add_title(self.meta.title)
 
     async def download(self):
+        # Reserved in the file's header so that tagging doesn't rewrite the file
+        tag_space = reserved_tag_space(self.meta, self.cover_path)
         # TODO: progress bar description
         async with global_download_semaphore(self.config.session.downloads):
+            if not await self._refresh_stale_downloadable():
+                return
             with get_progress_callback(
                 self.config.session.cli.progress_bars,
                 await self.downloadable.size(),
                 f"Track {self.meta.tracknumber}",
             ) as callback:
                 try:
-                    await self.downloadable.download(self.download_path, callback)
+                    await self.downloadable.download(
+                        self.staging_path, callback, tag_space
+                    )
                     retry = False
                 except Exception as e:
                     logger.error(
@@ -63,53 +97,263 @@ class Track(Media):
                 f"Track {self.meta.tracknumber} (retry)",
             ) as callback:
                 try:
-                    await self.downloadable.download(self.download_path, callback)
+                    await self.downloadable.download(
+                        self.staging_path, callback, tag_space
+                    )
                 except Exception as e:
                     logger.error(
                         f"Persistent error downloading track '{self.meta.title}', skipping: {e}"
                     )
-                    self.db.set_failed(
-                        self.downloadable.source, "track", self.meta.info.id
+                    _remove_partial(self.staging_path)
+                    await self.db.set_failed(
+                        self.downloadable.source,
+                        "track",
+                        self.meta.info.id,
+                        reason=str(e),
                     )
 
+    async def _refresh_stale_downloadable(self) -> bool:
+        """Request a new downloadable if the current one is stale.
+
+        :return: False if the request failed and the track was recorded as
+        failed, True if the track can be downloaded
+        """
+        if (
+            self.refresh_downloadable is None
+            or time.time() - self.downloadable_time < STREAM_URL_TTL
+        ):
+            return True
+
+        logger.debug(f"Stream URL for '{self.meta.title}' is stale, refreshing")
+        try:
+            self.downloadable = await self.refresh_downloadable()
+            self.downloadable_time = time.time()
+        except NonStreamableError as e:
+            logger.error(
+                f"Track '{self.meta.title}' is no longer available for stream, "
+                f"skipping: {e}"
+            )
+            await self.db.set_failed(
+                self.downloadable.source,
+                "track",
+                self.meta.info.id,
+                permanent=e.permanent,
+                reason=str(e),
+            )
+            return False
+        except (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            requests.RequestException,
+        ) as e:
+            logger.error(
+                f"Error refreshing stream URL for '{self.meta.title}', skipping: {e}"
+            )
+            await self.db.set_failed(
+                self.downloadable.source,
+                "track",
+                self.meta.info.id,
+                reason=str(e),
+            )
+            return False
+        return True
+
     async def postprocess(self):
         if self.is_single:
             remove_title(self.meta.title)
 
-        await tag_file(self.download_path, self.meta, self.cover_path)
-        if self.config.session.conversion.enabled:
+        await tag_file(self.staging_path, self.meta, self.cover_path)
+        c = self.config.session.conversion
+        if c.enabled or len(c.targets) > 0:
             await self._convert()
 
-        self.db.set_downloaded(self.meta.info.id)
+        # Only complete tracks appear in the library
+        os.replace(self.staging_path, self.download_path)
+        await self.db.set_downloaded(self._download_record())
+
+    def _download_record(self) -> DownloadRecord:
+        return DownloadRecord(
+            source=self.downloadable.source,
+            media_type="track",
+            id=self.meta.info.id,
+            path=self.download_path,
+            size=os.path.getsize(self.download_path),
+            quality=self.meta.info.quality,
+            isrc=(self.meta.isrc or "").upper(),
+        )
 
     async def _convert(self):
         c = self.config.session.conversion
-        engine_class = converter.get(c.codec)
+        # The targets and the replacement for the downloaded file are all
+        # written by one ffmpeg process
+        engines = [self._target_engine(target) for target in c.targets]
+        engine = None
+        if c.enabled:
+            engine = converter.get(c.codec)(
+                filename=self.staging_path,
+                sampling_rate=c.sampling_rate,
+                bit_depth=c.bit_depth,
+                remove_source=True,  # always going to delete the old file
+            )
+            engines.append(engine)
+
+        await converter.convert_all(engines)
+        if engine is not None:
+            # because the extension changed
+            self.staging_path = engine.final_fn
+            self.download_path = (
+                f"{os.path.splitext(self.download_path)[0]}.{engine.container}"
+            )
+
+    def _target_engine(self, target: dict) -> converter.Converter:
+        """Create the converter for one of the conversion targets."""
+        codec = target["codec"]
+        engine_class = converter.get(codec)
+        lossy_bitrate = target.get("lossy_bitrate")
         engine = engine_class(
-            filename=self.download_path,
-            sampling_rate=c.sampling_rate,
-            bit_depth=c.bit_depth,
-            remove_source=True,  # always going to delete the old file
+            filename=self.staging_path,
+            ffmpeg_arg=(
+                f"-b:a {lossy_bitrate}k"
+                if lossy_bitrate and not engine_class.lossless
+                else None
+            ),
+            sampling_rate=target.get("sampling_rate"),
+            bit_depth=target.get("bit_depth"),
         )
-        await engine.convert()
-        self.download_path = engine.final_fn  # because the extension changed
+
+        # Same place relative to the target's folder as the track has in the
+        # downloads folder
+        relative = os.path.relpath(self.folder, self.config.session.downloads.folder)
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(self.folder)
+        folder = os.path.join(os.path.expanduser(target["folder"]), relative)
+        os.makedirs(folder, exist_ok=True)
+
+        name = os.path.splitext(os.path.basename(self.download_path))[0]
+        engine.set_output(os.path.join(folder, f"{name}.{engine.container}"))
+        return engine
 
     def _set_download_path(self):
-        c = self.config.session.filepaths
-        formatter = c.track_format
-        track_path = clean_filename(
-            self.meta.format_track_path(formatter),
-            restrict=c.restrict_characters,
+        self.download_path = os.path.join(
+            self.folder,
+            f"{track_filename(self.meta, self.config)}.{self.downloadable.extension}",
         )
-        if c.truncate_to > 0 and len(track_path) > c.truncate_to:
-            track_path = track_path[: c.truncate_to]
+        self.staging_path = staging_path(self.download_path)
+
+
+def _remove_partial(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def track_filename(meta: TrackMetadata, config: Config) -> str:
+    """Format the file name of a track, without its extension."""
+    c = config.session.filepaths
+    formatter = c.track_format
+    track_path = clean_filename(
+        meta.format_track_path(formatter),
+        restrict=c.restrict_characters,
+    )
+    if c.truncate_to > 0 and len(track_path) > c.truncate_to:
+        track_path = track_path[: c.truncate_to]
+    return track_path
+
+
+@dataclass(slots=True)
+class LinkedTrack(Media):
+    """A track whose recording was already downloaded, possibly from another
+    source or album.
+
+    The existing file is hard linked to where the track would have been
+    downloaded, and shares its tags. If `retag` is set, it is copied instead,
+    copy-on-write where possible, and tagged with `meta`. If `as_link` is
+    set, it is recorded as a link into `folder` rather than as a download,
+    so the record of the existing download is left as it is.
+    """
+
+    meta: TrackMetadata
+    source: str
+    existing_path: str
+    config: Config
+    folder: str
+    db: AsyncDatabase
+    download_path: str = ""
+    retag: bool = False
+    as_link: bool = False
 
+    async def preprocess(self):
+        extension = os.path.splitext(self.existing_path)[1]
         self.download_path = os.path.join(
-            self.folder,
-            f"{track_path}.{self.downloadable.extension}",
+            self.folder, track_filename(self.meta, self.config) + extension
+        )
+        os.makedirs(self.folder, exist_ok=True)
+        if self.download_path == self.existing_path:
+            self.retag = False
+
+    async def download(self):
+        if self.retag:
+            await asyncio.to_thread(
+                reflink_or_copy, self.existing_path, staging_path(self.download_path)
+            )
+        else:
+            await asyncio.to_thread(
+                link_or_copy, self.existing_path, self.download_path
+            )
+
+    async def postprocess(self):
+        if self.retag:
+            staged = staging_path(self.download_path)
+            # The copy already has the cover
+            await tag_file(staged, self.meta, None)
+            os.replace(staged, self.download_path)
+        item_id = str(self.meta.info.id)
+        await self.db.set_downloaded(
+            DownloadRecord(
+                source=self.source,
+                media_type=LINK_MEDIA_TYPE if self.as_link else "track",
+                id=link_id(item_id, self.folder) if self.as_link else item_id,
+                path=self.download_path,
+                size=os.stat(self.download_path).st_size,
+                quality=self.meta.info.quality,
+                isrc=(self.meta.isrc or "").upper(),
+            )
         )
 
 
+async def find_duplicate(
+    meta: TrackMetadata,
+    source: str,
+    config: Config,
+    folder: str,
+    db: AsyncDatabase,
+    link: bool = False,
+) -> tuple[bool, LinkedTrack | None]:
+    """Check whether the recording of `meta` has been downloaded before.
+
+    :param link: link duplicates regardless of the config
+    :return: whether it has, and the LinkedTrack to use instead of downloading
+    it if the config says to link duplicates
+    """
+    policy = "link" if link else config.session.database.isrc_duplicates
+    if policy not in ISRC_DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown ISRC duplicate policy {policy!r}")
+    if policy == "download" or not meta.isrc:
+        return False, None
+
+    record = await db.find_isrc(meta.isrc)
+    if record is None:
+        return False, None
+
+    if policy == "link":
+        logger.info(f"Linking track '{meta.title}' to {record.path} (same ISRC)")
+        return True, LinkedTrack(meta, source, record.path, config, folder, db)
+
+    logger.info(f"Skipping track '{meta.title}'. Same ISRC as {record.path}")
+    return True, None
+
+
 @dataclass(slots=True)
 class PendingTrack(Pending):
     id: str
@@ -117,22 +361,31 @@ class PendingTrack(Pending):
     client: Client
     config: Config
     folder: str
-    db: Database
+    db: AsyncDatabase
     # cover_path is None <==> Artwork for this track doesn't exist in API
     cover_path: str | None
 
-    async def resolve(self) -> Track | None:
-        if self.db.downloaded(self.id):
+    async def resolve(self) -> Track | LinkedTrack | None:
+        if await self.db.downloaded(self.id, self.client.source):
             logger.info(
                 f"Skipping track {self.id}. Marked as downloaded in the database.",
             )
             return None
 
+        if await self.db.unavailable(self.client.source, "track", self.id):
+            logger.info(
+                f"Skipping track {self.id}. It failed recently on {self.client.source}.",
+            )
+            return None
+
         source = self.client.source
         try:
             resp = await self.client.get_metadata(self.id, "track")
         except NonStreamableError as e:
             logger.error(f"Track {self.id} not available for stream on {source}: {e}")
+            await self.db.set_failed(
+                source, "track", self.id, permanent=e.permanent, reason=str(e)
+            )
             return None
 
         try:
@@ -143,9 +396,23 @@ class PendingTrack(Pending):
 
         if meta is None:
             logger.error(f"Track {self.id} not available for stream on {source}")
-            self.db.set_failed(source, "track", self.id)
+            await self.db.set_failed(
+                source, "track", self.id, permanent=True, reason="Not streamable"
+            )
             return None
 
+        downloads_config = self.config.session.downloads
+        if downloads_config.disc_subdirectories and self.album.disctotal > 1:
+            folder = os.path.join(self.folder, f"Disc {meta.discnumber}")
+        else:
+            folder = self.folder
+
+        duplicate, linked = await find_duplicate(
+            meta, source, self.config, folder, self.db
+        )
+        if duplicate:
+            return linked
+
         quality = self.config.session.get_source(source).quality
         try:
             downloadable = await self.client.get_downloadable(self.id, quality)
@@ -153,14 +420,11 @@ class PendingTrack(Pending):
             logger.error(
                 f"Error getting downloadable data for track {meta.tracknumber} [{self.id}]: {e}"
             )
+            await self.db.set_failed(
+                source, "track", self.id, permanent=e.permanent, reason=str(e)
+            )
             return None
 
-        downloads_config = self.config.session.downloads
-        if downloads_config.disc_subdirectories and self.album.disctotal > 1:
-            folder = os.path.join(self.folder, f"Disc {meta.discnumber}")
-        else:
-            folder = self.folder
-
         return Track(
             meta,
             downloadable,
@@ -168,6 +432,9 @@ class PendingTrack(Pending):
             folder,
             self.cover_path,
             self.db,
+            refresh_downloadable=functools.partial(
+                self.client.get_downloadable, self.id, quality
+            ),
         )
 
 
@@ -182,19 +449,32 @@ class PendingSingle(Pending):
     id: str
     client: Client
     config: Config
-    db: Database
+    db: AsyncDatabase
 
-    async def resolve(self) -> Track | None:
-        if self.db.downloaded(self.id):
+    async def resolve(self) -> Track | LinkedTrack | None:
+        if await self.db.downloaded(self.id, self.client.source):
             logger.info(
                 f"Skipping track {self.id}. Marked as downloaded in the database.",
             )
             return None
 
+        if await self.db.unavailable(self.client.source, "track", self.id):
+            logger.info(
+                f"Skipping track {self.id}. It failed recently on {self.client.source}.",
+            )
+            return None
+
         try:
             resp = await self.client.get_metadata(self.id, "track")
         except NonStreamableError as e:
             logger.error(f"Error fetching track {self.id}: {e}")
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=e.permanent,
+                reason=str(e),
+            )
             return None
         # Patch for soundcloud
         try:
@@ -204,7 +484,13 @@ class PendingSingle(Pending):
             return None
 
         if album is None:
-            self.db.set_failed(self.client.source, "track", self.id)
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=True,
+                reason="Not streamable",
+            )
             logger.error(
                 f"Cannot stream track (am) ({self.id}) on {self.client.source}",
             )
@@ -217,7 +503,13 @@ class PendingSingle(Pending):
             return None
 
         if meta is None:
-            self.db.set_failed(self.client.source, "track", self.id)
+            await self.db.set_failed(
+                self.client.source,
+                "track",
+                self.id,
+                permanent=True,
+                reason="Not streamable",
+            )
             logger.error(
                 f"Cannot stream track (tm) ({self.id}) on {self.client.source}",
             )
@@ -232,6 +524,12 @@ class PendingSingle(Pending):
         else:
             folder = parent
 
+        duplicate, linked = await find_duplicate(
+            meta, self.client.source, self.config, folder, self.db
+        )
+        if duplicate:
+            return linked
+
         os.makedirs(folder, exist_ok=True)
 
         embedded_cover_path, downloadable = await asyncio.gather(
@@ -246,6 +544,9 @@ class PendingSingle(Pending):
             embedded_cover_path,
             self.db,
             is_single=True,
+            refresh_downloadable=functools.partial(
+                self.client.get_downloadable, self.id, quality
+            ),
         )
 
     def _format_folder(self, meta: AlbumMetadata) -> str:
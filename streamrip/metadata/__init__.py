@@ -15,7 +15,7 @@ from .search_results import (
     Summary,
     TrackSummary,
 )
-from .tagger import tag_file
+from .tagger import TagSpaceReserver, reserved_tag_space, tag_file
 from .track import TrackInfo, TrackMetadata
 
 __all__ = [
@@ -28,6 +28,8 @@ __all__ = [
     "PlaylistMetadata",
     "Covers",
     "tag_file",
+    "reserved_tag_space",
+    "TagSpaceReserver",
     "util",
     "AlbumSummary",
     "ArtistSummary",
@@ -1,6 +1,12 @@
+import asyncio
+import functools
 import logging
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
+from typing import Any
 
 import aiofiles
 from mutagen import id3
@@ -17,6 +23,14 @@ from .track import TrackMetadata
 logger = logging.getLogger("streamrip")
 
 FLAC_MAX_BLOCKSIZE = 16777215  # 16.7 MB
+ID3_MAX_SIZE = 2**28 - 1
+# Extra space reserved for tags beyond what is estimated from the metadata
+TAG_SPACE_MARGIN = 4096
+# Number of covers kept in memory. The tracks of an album share a cover and
+# are tagged around the same time, so only a few are needed.
+COVER_CACHE_SIZE = 8
+# Threads that parse and save audio files with mutagen
+TAGGER_WORKERS = 4
 
 MP4_KEYS = (
     "\xa9nam",
@@ -96,11 +110,29 @@ MP4_KEY = dict(zip(METADATA_TYPES, MP4_KEYS))
 MP3_KEY = dict(zip(METADATA_TYPES, MP3_KEYS))
 
 
+# Tags whose values come from the track, rather than its album
+TRACK_TAGS = frozenset(
+    ("title", "artist", "tracknumber", "discnumber", "composer", "isrc", "lyrics")
+)
+ALBUM_TAGS = frozenset(METADATA_TYPES) - TRACK_TAGS
+
+
 class Container(Enum):
     FLAC = 1
     AAC = 2
     MP3 = 3
 
+    @classmethod
+    def from_path(cls, path: str) -> "Container":
+        ext = path.split(".")[-1].lower()
+        if ext == "flac":
+            return cls.FLAC
+        elif ext == "m4a":
+            return cls.AAC
+        elif ext == "mp3":
+            return cls.MP3
+        raise Exception(f"Invalid extension {ext}")
+
     def get_mutagen_class(self, path: str):
         if self == Container.FLAC:
             return FLAC(path)
@@ -114,19 +146,37 @@ class Container(Enum):
         # unreachable
         return {}
 
-    def get_tag_pairs(self, meta) -> list[tuple]:
+    def get_tag_pairs(
+        self, meta, album_pairs: list[tuple] | None = None
+    ) -> list[tuple]:
+        """Return the tags for `meta`.
+
+        If `album_pairs` is given, it is used for the tags that come from
+        the album instead of computing them again.
+        """
+        if album_pairs is None:
+            return self._tag_pairs(meta, METADATA_TYPES)
+        return self._tag_pairs(meta, TRACK_TAGS) + album_pairs
+
+    def get_album_tag_pairs(self, meta) -> list[tuple]:
+        """Return the tags for `meta` that are the same for its whole album."""
+        return self._tag_pairs(meta, ALBUM_TAGS)
+
+    def _tag_pairs(self, meta, keys) -> list[tuple]:
         if self == Container.FLAC:
-            return self._tag_flac(meta)
+            return self._tag_flac(meta, keys)
         elif self == Container.MP3:
-            return self._tag_mp3(meta)
+            return self._tag_mp3(meta, keys)
         elif self == Container.AAC:
-            return self._tag_mp4(meta)
+            return self._tag_mp4(meta, keys)
         # unreachable
         return []
 
-    def _tag_flac(self, meta: TrackMetadata) -> list[tuple]:
+    def _tag_flac(self, meta: TrackMetadata, keys) -> list[tuple]:
         out = []
         for k, v in FLAC_KEY.items():
+            if k not in keys:
+                continue
             tag = self._attr_from_meta(meta, k)
             if tag:
                 if k in {
@@ -140,9 +190,11 @@ class Container(Enum):
                 out.append((v, str(tag)))
         return out
 
-    def _tag_mp3(self, meta: TrackMetadata):
+    def _tag_mp3(self, meta: TrackMetadata, keys):
         out = []
         for k, v in MP3_KEY.items():
+            if k not in keys:
+                continue
             if k == "tracknumber":
                 text = f"{meta.tracknumber}/{meta.album.tracktotal}"
             elif k == "discnumber":
@@ -154,9 +206,11 @@ class Container(Enum):
                 out.append((v.__name__, v(encoding=3, text=text)))
         return out
 
-    def _tag_mp4(self, meta: TrackMetadata):
+    def _tag_mp4(self, meta: TrackMetadata, keys):
         out = []
         for k, v in MP4_KEY.items():
+            if k not in keys:
+                continue
             if k == "tracknumber":
                 text = [(meta.tracknumber, meta.album.tracktotal)]
             elif k == "discnumber":
@@ -207,52 +261,321 @@ class Container(Enum):
             audio[k] = v
 
     async def embed_cover(self, audio, cover_path):
+        self.add_cover(audio, await cover_cache.get(self, cover_path))
+
+    def add_cover(self, audio, cover):
+        """Add a picture built by `make_cover` to `audio`."""
         if self == Container.FLAC:
-            size = os.path.getsize(cover_path)
-            if size > FLAC_MAX_BLOCKSIZE:
+            audio.add_picture(cover)
+        elif self == Container.MP3:
+            audio.add(cover)
+        elif self == Container.AAC:
+            audio["covr"] = [cover]
+
+    def make_cover(self, data: bytes):
+        """Build the picture embedded in this container from image bytes."""
+        if self == Container.FLAC:
+            if len(data) > FLAC_MAX_BLOCKSIZE:
                 raise Exception("Cover art too big for FLAC")
             cover = Picture()
             cover.type = 3
             cover.mime = "image/jpeg"
-            async with aiofiles.open(cover_path, "rb") as img:
-                cover.data = await img.read()
-            audio.add_picture(cover)
+            cover.data = data
+            return cover
         elif self == Container.MP3:
             cover = APIC()
             cover.type = 3
             cover.mime = "image/jpeg"
-            async with aiofiles.open(cover_path, "rb") as img:
-                cover.data = await img.read()
-            audio.add(cover)
+            cover.data = data
+            return cover
         elif self == Container.AAC:
-            async with aiofiles.open(cover_path, "rb") as img:
-                cover = MP4Cover(await img.read(), imageformat=MP4Cover.FORMAT_JPEG)
-            audio["covr"] = [cover]
+            return MP4Cover(data, imageformat=MP4Cover.FORMAT_JPEG)
+        # unreachable
+        return None
 
     def save_audio(self, audio, path):
         if self == Container.FLAC:
-            audio.save()
+            audio.save(padding=_keep_padding)
         elif self == Container.AAC:
-            audio.save()
+            audio.save(padding=_keep_padding)
         elif self == Container.MP3:
-            audio.save(path, "v2_version=3")
+            audio.save(path, "v2_version=3", padding=_keep_padding)
+
+
+class CoverCache:
+    """LRU cache of the pictures built from cover files, keyed by path.
+
+    Concurrent lookups of the same cover share one read and one build. A
+    cover that changes on disk is read again.
+    """
+
+    def __init__(self, maxsize: int = COVER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.covers: OrderedDict[tuple, Any] = OrderedDict()
+        self.pending: dict[tuple, asyncio.Future] = {}
+
+    async def get(self, container: Container, path: str):
+        stat = os.stat(path)
+        key = (container, path, stat.st_mtime_ns, stat.st_size)
+        if key in self.covers:
+            self.covers.move_to_end(key)
+            return self.covers[key]
+
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(container, path))
+            self.pending[key] = task
+            task.add_done_callback(functools.partial(self._loaded, key))
+        # Cancelling one waiter shouldn't cancel the load for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, container: Container, path: str):
+        async with aiofiles.open(path, "rb") as img:
+            return container.make_cover(await img.read())
+
+    def _loaded(self, key: tuple, task: asyncio.Future):
+        del self.pending[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.covers[key] = task.result()
+        if len(self.covers) > self.maxsize:
+            self.covers.popitem(last=False)
+
+    def clear(self):
+        self.covers.clear()
+
+
+cover_cache = CoverCache()
+
+
+def _keep_padding(info) -> int:
+    # mutagen shrinks large padding by default, which rewrites the whole file.
+    # Keep the space reserved while downloading so the tags are written in place.
+    if info.padding >= 0:
+        return info.padding
+    return info.get_default_padding()
+
+
+@dataclass(slots=True)
+class _TagRequest:
+    path: str
+    meta: TrackMetadata
+    container: Container
+    # Built by `Container.make_cover`, None if there is no cover
+    cover: Any
+    future: asyncio.Future
+
+
+class TagWriter:
+    """Tags audio files on a thread pool, off the event loop.
+
+    Files of the same album are written in batches: while one batch is being
+    written, files that arrive for that album are queued, and then written
+    together in the next job with the album's tags computed once.
+    """
+
+    def __init__(self, max_workers: int = TAGGER_WORKERS):
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="streamrip-tagger"
+        )
+        # Keyed by the id of the album's metadata. The requests keep it alive,
+        # so the id isn't reused while a key is present.
+        self.queued: dict[int, list[_TagRequest]] = {}
+        self.running: set[int] = set()
+
+    async def tag(self, path: str, meta: TrackMetadata, cover_path: str | None):
+        """Tag the file at `path`, in the next batch of its album."""
+        container = Container.from_path(path)
+        cover = None
+        if cover_path is not None:
+            cover = await cover_cache.get(container, cover_path)
+        request = _TagRequest(
+            path, meta, container, cover, asyncio.get_running_loop().create_future()
+        )
+
+        key = id(meta.album)
+        self.queued.setdefault(key, []).append(request)
+        if key not in self.running:
+            self._start(key)
+        await request.future
+
+    def _start(self, key: int):
+        batch = self.queued.pop(key)
+        self.running.add(key)
+        job = asyncio.get_running_loop().run_in_executor(
+            self.executor, _write_tags, batch
+        )
+        job.add_done_callback(functools.partial(self._done, key, batch))
+
+    def _done(self, key: int, batch: list[_TagRequest], job: asyncio.Future):
+        self.running.discard(key)
+        if job.cancelled() or job.exception() is not None:
+            errors = [job.exception() or Exception("Tagging cancelled")] * len(batch)
+        else:
+            errors = job.result()
+        for request, error in zip(batch, errors):
+            if request.future.done():
+                continue
+            if error is None:
+                request.future.set_result(None)
+            else:
+                request.future.set_exception(error)
+        if key in self.queued:
+            self._start(key)
+
+
+def _write_tags(batch: list[_TagRequest]) -> list[Exception | None]:
+    """Tag every file in `batch`, which belong to the same album."""
+    album_pairs: dict[Container, list[tuple]] = {}
+    errors: list[Exception | None] = []
+    for request in batch:
+        container = request.container
+        try:
+            if container not in album_pairs:
+                album_pairs[container] = container.get_album_tag_pairs(request.meta)
+            audio = container.get_mutagen_class(request.path)
+            tags = container.get_tag_pairs(request.meta, album_pairs[container])
+            logger.debug("Tagging with %s", tags)
+            container.tag_audio(audio, tags)
+            if request.cover is not None:
+                container.add_cover(audio, request.cover)
+            container.save_audio(audio, request.path)
+            errors.append(None)
+        except Exception as e:
+            errors.append(e)
+    return errors
+
+
+tag_writer = TagWriter()
 
 
 async def tag_file(path: str, meta: TrackMetadata, cover_path: str | None):
-    ext = path.split(".")[-1].lower()
-    if ext == "flac":
-        container = Container.FLAC
-    elif ext == "m4a":
-        container = Container.AAC
-    elif ext == "mp3":
-        container = Container.MP3
-    else:
-        raise Exception(f"Invalid extension {ext}")
+    await tag_writer.tag(path, meta, cover_path)
+
 
-    audio = container.get_mutagen_class(path)
-    tags = container.get_tag_pairs(meta)
-    logger.debug("Tagging with %s", tags)
-    container.tag_audio(audio, tags)
+def reserved_tag_space(meta: TrackMetadata, cover_path: str | None) -> int:
+    """Estimate the space needed to write the tags and cover for `meta`.
+
+    This is an upper bound for every container, so that reserving it while
+    downloading lets `tag_file` write the tags in place.
+    """
+    size = TAG_SPACE_MARGIN
+    for k, v in Container.FLAC.get_tag_pairs(meta):
+        # Frame or comment header, and the text encoded as UTF-8
+        size += 32 + len(k) + len(v.encode("utf-8"))
     if cover_path is not None:
-        await container.embed_cover(audio, cover_path)
-    container.save_audio(audio, path)
+        size += 64 + os.path.getsize(cover_path)
+    return size
+
+
+class TagSpaceReserver:
+    """Enlarges the tag space at the start of an audio stream as it is written.
+
+    Fed the chunks of a FLAC or MP3 stream, it returns the chunks to write with
+    at least `size` bytes of padding in the metadata header. Streams it
+    doesn't recognize are returned unchanged.
+    """
+
+    def __init__(self, extension: str, size: int):
+        self.extension = extension.lower()
+        self.size = size
+        self.buf = bytearray()
+        self.done = size <= 0 or self.extension not in ("flac", "mp3")
+
+    def feed(self, data: bytes) -> bytes:
+        if self.done:
+            return data
+        self.buf += data
+        if self.extension == "flac":
+            out = self._splice_flac()
+        else:
+            out = self._splice_mp3()
+        if out is None:
+            # Header isn't complete yet
+            return b""
+        self.done = True
+        self.buf = bytearray()
+        return out
+
+    def flush(self) -> bytes:
+        out = bytes(self.buf)
+        self.buf = bytearray()
+        self.done = True
+        return out
+
+    def _splice_flac(self) -> bytes | None:
+        buf = self.buf
+        if len(buf) < 4:
+            return None
+        if buf[:4] != b"fLaC":
+            return bytes(buf)
+
+        blocks = bytearray(b"fLaC")
+        padding = 0
+        pos = 4
+        while True:
+            if len(buf) < pos + 4:
+                return None
+            header = buf[pos]
+            length = int.from_bytes(buf[pos + 1 : pos + 4], "big")
+            end = pos + 4 + length
+            if len(buf) < end:
+                return None
+            if header & 0x7F == 1:
+                padding += length
+            else:
+                # Clear the last block flag, padding goes at the end
+                blocks.append(header & 0x7F)
+                blocks += buf[pos + 1 : end]
+            pos = end
+            if header & 0x80:
+                break
+
+        padding = min(max(padding, self.size), FLAC_MAX_BLOCKSIZE)
+        blocks.append(0x80 | 1)
+        blocks += padding.to_bytes(3, "big")
+        blocks += bytes(padding)
+        return bytes(blocks + buf[pos:])
+
+    def _splice_mp3(self) -> bytes | None:
+        buf = self.buf
+        if len(buf) < 10:
+            return None
+        if buf[:3] != b"ID3":
+            if buf[0] != 0xFF or buf[1] & 0xE0 != 0xE0:
+                return bytes(buf)
+            # Bare MPEG frames, add an empty ID3v2.3 tag
+            size = min(self.size, ID3_MAX_SIZE)
+            return _id3_header(3, 0, size) + bytes(size) + bytes(buf)
+
+        version, flags = buf[3], buf[5]
+        if version not in (3, 4) or flags & 0x10:
+            # Unknown version, or has a footer that must stay at the end
+            return bytes(buf)
+        length = _syncsafe_decode(buf[6:10])
+        end = 10 + length
+        if len(buf) < end:
+            return None
+        size = min(max(length, self.size), ID3_MAX_SIZE)
+        # Padding is zeros after the last frame
+        return (
+            _id3_header(version, flags, size)
+            + bytes(buf[10:end])
+            + bytes(size - length)
+            + bytes(buf[end:])
+        )
+
+
+def _id3_header(version: int, flags: int, size: int) -> bytes:
+    return b"ID3" + bytes((version, 0, flags)) + _syncsafe_encode(size)
+
+
+def _syncsafe_encode(n: int) -> bytes:
+    return bytes((n >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def _syncsafe_decode(data) -> int:
+    n = 0
+    for b in data:
+        n = (n << 7) | (b & 0x7F)
+    return n
@@ -1,11 +1,13 @@
 import asyncio
+import csv
 import json
 import logging
 import os
 import shutil
 import subprocess
 from functools import wraps
-from typing import Any
+from itertools import islice
+from typing import Any, Iterable
 
 import aiofiles
 import aiohttp
@@ -56,6 +58,12 @@ def coro(f):
     default=False,
     is_flag=True,
 )
+@click.option(
+    "--ignore-failed",
+    help="Try items again even if they failed recently",
+    default=False,
+    is_flag=True,
+)
 @click.option(
     "-q",
     "--quality",
@@ -87,7 +95,16 @@ def coro(f):
 )
 @click.pass_context
 def rip(
-    ctx, config_path, folder, no_db, quality, codec, no_progress, no_ssl_verify, verbose
+    ctx,
+    config_path,
+    folder,
+    no_db,
+    ignore_failed,
+    quality,
+    codec,
+    no_progress,
+    no_ssl_verify,
+    verbose,
 ):
     """Streamrip: the all in one music downloader."""
     global logger
@@ -141,6 +158,9 @@ def rip(
     # set session config values to command line args
     if no_db:
         c.session.database.downloads_enabled = False
+    if ignore_failed:
+        c.session.database.permanent_failure_ttl_hours = 0
+        c.session.database.transient_failure_ttl_hours = 0
     if folder is not None:
         c.session.downloads.folder = folder
 
@@ -319,10 +339,89 @@ def database():
     """View and modify the downloads and failed downloads databases."""
 
 
+@database.command("import")
+@click.argument("folder", type=click.Path(exists=True, file_okay=False))
+@click.option("-w", "--workers", type=int, help="Number of processes reading tags.")
+@click.pass_context
+def database_import(ctx, folder, workers):
+    """Add the audio files in FOLDER to the downloads database.
+
+    Imported files are only matched by ISRC, so this has no effect unless
+    isrc_duplicates is set to "skip" or "link" in the database config.
+    """
+    from ..library import import_library
+
+    cfg: Config = ctx.obj["config"]
+    if not cfg.session.database.downloads_enabled:
+        console.print("[red]The downloads database is disabled in the config.")
+        return
+
+    downloads = db.Downloads(cfg.session.database.downloads_path)
+    with console.status(f"Scanning {folder}...", spinner="dots") as status:
+
+        def callback(count: int):
+            status.update(f"Scanning {folder}... {count} files imported")
+
+        count = import_library(folder, downloads, workers, callback)
+    downloads.close()
+    console.print(f"[green]Imported [bold]{count}[/bold] files from {folder}")
+    if cfg.session.database.isrc_duplicates == "download":
+        console.print(
+            '[yellow]isrc_duplicates is set to "download" in the database config, '
+            "so tracks matching the imported files will still be downloaded. "
+            'Set it to "skip" or "link" to use them.'
+        )
+
+
+@database.command("retry-failed")
+@click.option(
+    "-c",
+    "--max-concurrent",
+    default=10,
+    show_default=True,
+    help="Maximum number of items resolved at once.",
+)
+@click.pass_context
+@coro
+async def database_retry_failed(ctx, max_concurrent):
+    """Download the items in the failed downloads database again.
+
+    Items that succeed are removed from the database.
+    """
+    with ctx.obj["config"] as cfg:
+        async with Main(cfg) as main:
+            succeeded, total = await main.retry_failed(max_concurrent)
+
+    if total == 0:
+        console.print("[green]There are no failed downloads to retry.")
+    else:
+        console.print(
+            f"[green]Downloaded [bold]{succeeded}[/bold] of [bold]{total}[/bold] "
+            "failed items."
+        )
+
+
 @database.command("browse")
 @click.argument("table")
+@click.option("-l", "--limit", type=int, help="Maximum number of rows to show.")
+@click.option("-o", "--offset", default=0, help="Number of rows to skip.")
+@click.option(
+    "-f",
+    "--filter",
+    "filters",
+    multiple=True,
+    help="Only show rows where COLUMN=VALUE. VALUE can use * and ? wildcards.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "csv", "jsonl"]),
+    default="table",
+    show_default=True,
+    help="Print a table, or export the rows as CSV or JSON lines.",
+)
 @click.pass_context
-def database_browse(ctx, table):
+def database_browse(ctx, table, limit, offset, filters, output_format):
     """Browse the contents of a table.
 
     Available tables:
@@ -330,35 +429,71 @@ def database_browse(ctx, table):
         * Downloads
 
         * Failed
-    """
-    from rich.table import Table
 
+    Rows are streamed, so large tables can be exported with constant memory:
+
+        rip database browse downloads --format csv > downloads.csv
+    """
     cfg: Config = ctx.obj["config"]
 
     if table.lower() == "downloads":
-        downloads = db.Downloads(cfg.session.database.downloads_path)
-        t = Table(title="Downloads database")
-        t.add_column("Row")
-        t.add_column("ID")
-        for i, row in enumerate(downloads.all()):
-            t.add_row(f"{i:02}", *row)
-        console.print(t)
-
+        t = db.Downloads(cfg.session.database.downloads_path)
+        title = "Downloads database"
     elif table.lower() == "failed":
-        failed = db.Failed(cfg.session.database.failed_downloads_path)
-        t = Table(title="Failed downloads database")
-        t.add_column("Source")
-        t.add_column("Media Type")
-        t.add_column("ID")
-        for i, row in enumerate(failed.all()):
-            t.add_row(f"{i:02}", *row)
-        console.print(t)
-
+        t = db.Failed(cfg.session.database.failed_downloads_path)
+        title = "Failed downloads database"
     else:
         console.print(
             f"[red]Invalid database[/red] [bold]{table}[/bold]. [red]Choose[/red] [bold]downloads "
             "[red]or[/red] failed[/bold].",
         )
+        return
+
+    where = {}
+    for f in filters:
+        column, sep, value = f.partition("=")
+        if sep == "" or column not in t.keys():
+            console.print(
+                f"[red]Invalid filter[/red] [bold]{f}[/bold]. [red]Use COLUMN=VALUE "
+                f"with one of the columns[/red] {', '.join(t.keys())}",
+            )
+            return
+        where[column] = value
+
+    rows = t.iter_rows(where, limit, offset)
+    columns = list(t.keys())
+    if output_format == "csv":
+        writer = csv.writer(click.get_text_stream("stdout"))
+        writer.writerow(columns)
+        writer.writerows(rows)
+    elif output_format == "jsonl":
+        out = click.get_text_stream("stdout")
+        for row in rows:
+            out.write(json.dumps(dict(zip(columns, row))) + "\n")
+    else:
+        _print_table(title, columns, rows, offset)
+    t.close()
+
+
+def _print_table(title: str, columns: list[str], rows: Iterable[tuple], offset: int):
+    """Print rows as tables of at most 1000 rows, so they are not all in memory."""
+    from rich.table import Table
+
+    i = offset
+    while True:
+        t = Table(title=title if i == offset else None)
+        t.add_column("Row")
+        for column in columns:
+            t.add_column(column.replace("_", " ").title())
+        for row in islice(rows, 1000):
+            t.add_row(f"{i:02}", *map(str, row))
+            i += 1
+        if t.row_count == 0:
+            break
+        console.print(t)
+
+    if i == offset:
+        console.print(f"[yellow]No rows found in {title.lower()}.")
 
 
 @rip.command()
@@ -2,11 +2,19 @@ import asyncio
 import json
 import logging
 import platform
+from typing import Iterable
 
 import aiofiles
 
 from .. import db
-from ..client import Client, DeezerClient, QobuzClient, SoundcloudClient, TidalClient
+from ..client import (
+    Client,
+    DeezerClient,
+    QobuzClient,
+    SessionStore,
+    SoundcloudClient,
+    TidalClient,
+)
 from ..config import Config
 from ..console import console
 from ..media import (
@@ -27,6 +35,9 @@ from .prompter import get_prompter
 
 logger = logging.getLogger("streamrip")
 
+# Number of failed downloads read from the database and retried at a time
+RETRY_BATCH_SIZE = 500
+
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
@@ -48,14 +59,16 @@ class Main:
         self.pending: list[Pending] = []
         self.media: list[Media] = []
         self.config = config
+        # Login state saved across runs so that most runs skip logging in
+        self.sessions = SessionStore()
         self.clients: dict[str, Client] = {
-            "qobuz": QobuzClient(config),
-            "tidal": TidalClient(config),
-            "deezer": DeezerClient(config),
-            "soundcloud": SoundcloudClient(config),
+            "qobuz": QobuzClient(config, self.sessions),
+            "tidal": TidalClient(config, self.sessions),
+            "deezer": DeezerClient(config, self.sessions),
+            "soundcloud": SoundcloudClient(config, self.sessions),
         }
 
-        self.database: db.Database
+        self.database: db.AsyncDatabase
 
         c = self.config.session.database
         if c.downloads_enabled:
@@ -68,7 +81,14 @@ class Main:
         else:
             failed_downloads_db = db.Dummy()
 
-        self.database = db.Database(downloads_db, failed_downloads_db)
+        self.database = db.AsyncDatabase(
+            db.Database(
+                downloads_db,
+                failed_downloads_db,
+                permanent_ttl=c.permanent_failure_ttl_hours * 60 * 60,
+                transient_ttl=c.transient_failure_ttl_hours * 60 * 60,
+            )
+        )
 
     async def add(self, url: str):
         """Add url as a pending item.
@@ -90,67 +110,142 @@ class Main:
         self._add_by_id_client(client, media_type, id)
 
     async def add_all_by_id(self, info: list[tuple[str, str, str]]):
-        sources = set(s for s, _, _ in info)
-        clients = {s: await self.get_logged_in_client(s) for s in sources}
+        clients = await self.get_logged_in_clients(s for s, _, _ in info)
         for source, media_type, id in info:
             self._add_by_id_client(clients[source], media_type, id)
 
     def _add_by_id_client(self, client: Client, media_type: str, id: str):
+        self.pending.append(self._pending_by_id(client, media_type, id))
+
+    def _pending_by_id(self, client: Client, media_type: str, id: str) -> Pending:
         if media_type == "track":
-            item = PendingSingle(id, client, self.config, self.database)
+            return PendingSingle(id, client, self.config, self.database)
         elif media_type == "album":
-            item = PendingAlbum(id, client, self.config, self.database)
+            return PendingAlbum(id, client, self.config, self.database)
         elif media_type == "playlist":
-            item = PendingPlaylist(id, client, self.config, self.database)
+            return PendingPlaylist(id, client, self.config, self.database)
         elif media_type == "label":
-            item = PendingLabel(id, client, self.config, self.database)
+            return PendingLabel(id, client, self.config, self.database)
         elif media_type == "artist":
-            item = PendingArtist(id, client, self.config, self.database)
+            return PendingArtist(id, client, self.config, self.database)
         else:
             raise Exception(media_type)
 
-        self.pending.append(item)
+    async def retry_failed(self, max_concurrent: int = 10) -> tuple[int, int]:
+        """Download the items in the failed downloads database again.
+
+        Rows are read in batches of `RETRY_BATCH_SIZE`. The sources in a batch
+        are logged into together, and at most `max_concurrent` items are
+        resolved at a time. An item's row is only removed once it has been
+        downloaded, so interrupting a retry leaves the table as it was.
+
+        :return: the number of items that succeeded, and the number retried
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def _retry(client: Client, row: tuple) -> bool:
+            source, media_type, id, permanent, _, _ = row
+            key = (source, media_type, id)
+            async with semaphore:
+                # The negative cache would skip the item otherwise. Failures
+                # in the pipeline update its row with a new reason.
+                self.database.retrying.add(key)
+                error = None
+                media = None
+                try:
+                    pending = self._pending_by_id(client, media_type, id)
+                    media = await pending.resolve()
+                    if media is not None:
+                        await media.rip()
+                except Exception as e:
+                    logger.error(f"Error retrying {media_type} {id} on {source}: {e}")
+                    media = None
+                    error = e
+                finally:
+                    self.database.retrying.discard(key)
+
+                if media_type == "track":
+                    succeeded = await self.database.downloaded(id, source)
+                else:
+                    succeeded = media is not None
+                if succeeded:
+                    await self.database.remove_failed(source, media_type, id)
+                elif error is not None:
+                    await self.database.set_failed(
+                        source, media_type, id, bool(permanent), str(error)
+                    )
+                return succeeded
+
+        succeeded = total = 0
+        async for rows in self.database.iter_failed_downloads(RETRY_BATCH_SIZE):
+            clients = await self.get_logged_in_clients({row[0] for row in rows})
+            results = await asyncio.gather(
+                *[_retry(clients[row[0]], row) for row in rows]
+            )
+            succeeded += sum(results)
+            total += len(results)
+        return succeeded, total
 
     async def add_all(self, urls: list[str]):
         """Add multiple urls concurrently as pending items."""
-        parsed = [parse_url(url) for url in urls]
-        url_client_pairs = []
-        for i, p in enumerate(parsed):
+        parsed = []
+        for url in urls:
+            p = parse_url(url)
             if p is None:
                 console.print(
-                    f"[red]Found invalid url [cyan]{urls[i]}[/cyan], skipping.",
+                    f"[red]Found invalid url [cyan]{url}[/cyan], skipping.",
                 )
                 continue
-            url_client_pairs.append((p, await self.get_logged_in_client(p.source)))
+            parsed.append(p)
 
+        clients = await self.get_logged_in_clients(p.source for p in parsed)
         pendings = await asyncio.gather(
             *[
-                url.into_pending(client, self.config, self.database)
-                for url, client in url_client_pairs
+                url.into_pending(clients[url.source], self.config, self.database)
+                for url in parsed
             ],
         )
         self.pending.extend(pendings)
 
     async def get_logged_in_client(self, source: str):
         """Return a functioning client instance for `source`."""
-        client = self.clients.get(source)
-        if client is None:
-            raise Exception(
-                f"No client named {source} available. Only have {self.clients.keys()}",
-            )
-        if not client.logged_in:
+        clients = await self.get_logged_in_clients((source,))
+        return clients[source]
+
+    async def get_logged_in_clients(self, sources: Iterable[str]) -> dict[str, Client]:
+        """Return functioning clients for every source in `sources`.
+
+        Clients with credentials in the config are logged into concurrently.
+        """
+        clients: dict[str, Client] = {}
+        for source in set(sources):
+            client = self.clients.get(source)
+            if client is None:
+                raise Exception(
+                    f"No client named {source} available. Only have {self.clients.keys()}",
+                )
+            clients[source] = client
+
+        to_login = []
+        for client in clients.values():
+            if client.logged_in:
+                continue
             prompter = get_prompter(client, self.config)
             if not prompter.has_creds():
                 # Get credentials from user and log into client
                 await prompter.prompt_and_login()
                 prompter.save()
             else:
-                with console.status(f"[cyan]Logging into {source}", spinner="dots"):
-                    # Log into client using credentials from config
-                    await client.login()
+                to_login.append(client)
 
-        assert client.logged_in
-        return client
+        if len(to_login) > 0:
+            names = ", ".join(c.source for c in to_login)
+            with console.status(f"[cyan]Logging into {names}", spinner="dots"):
+                # Log into clients using credentials from config
+                await asyncio.gather(*[c.login() for c in to_login])
+
+        assert all(c.logged_in for c in clients.values())
+        return clients
 
     async def resolve(self):
         """Resolve all currently pending items."""
@@ -298,6 +393,9 @@ class Main:
             if hasattr(client, "session"):
                 await client.session.close()
 
+        self.sessions.save()
+        await self.database.close()
+
         # close global progress bar manager
         clear_progress()
         # We remove artwork tempdirs here because multiple singles
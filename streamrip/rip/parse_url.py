@@ -6,7 +6,7 @@ from abc import ABC, abstractmethod
 
 from ..client import Client, SoundcloudClient
 from ..config import Config
-from ..db import Database
+from ..db import AsyncDatabase
 from ..media import (
     Pending,
     PendingAlbum,
@@ -46,7 +46,7 @@ class URL(ABC):
         self,
         client: Client,
         config: Config,
-        db: Database,
+        db: AsyncDatabase,
     ) -> Pending:
         raise NotImplementedError
 
@@ -68,7 +68,7 @@ class GenericURL(URL):
         self,
         client: Client,
         config: Config,
-        db: Database,
+        db: AsyncDatabase,
     ) -> Pending:
         source, media_type, item_id = self.match.groups()
         assert client.source == source
@@ -101,7 +101,7 @@ class QobuzInterpreterURL(URL):
         self,
         client: Client,
         config: Config,
-        db: Database,
+        db: AsyncDatabase,
     ) -> Pending:
         url = self.match.group(0)
         possible_id = self.match.group(1)
@@ -152,7 +152,7 @@ class DeezerDynamicURL(URL):
         self,
         client: Client,
         config: Config,
-        db: Database,
+        db: AsyncDatabase,
     ) -> Pending:
         url = self.match.group(0)  # entire dynamic link
         media_type, item_id = await self._extract_info_from_dynamic_link(url, client)
@@ -197,7 +197,7 @@ class SoundcloudURL(URL):
         self,
         client: SoundcloudClient,
         config: Config,
-        db: Database,
+        db: AsyncDatabase,
     ) -> Pending:
         resolved = await client.resolve_url(self.url)
         media_type = resolved["kind"]
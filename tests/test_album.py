@@ -0,0 +1,56 @@
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from streamrip.config import Config
+from streamrip.media.album import PendingAlbum
+from streamrip.metadata.util import get_album_track_ids
+
+with open("tests/qobuz_album_resp.json") as f:
+    ALBUM_RESP = json.load(f)
+ALBUM_RESP["tracks"] = {"items": [{"id": i} for i in range(1, 4)]}
+
+
+def _pending_album(tmp_path, downloaded: set[str]) -> PendingAlbum:
+    config = Config.defaults()
+    config.session.downloads.folder = str(tmp_path)
+    client = MagicMock()
+    client.source = "qobuz"
+    client.get_metadata = AsyncMock(return_value=ALBUM_RESP)
+    db = MagicMock()
+    db.downloaded_many = AsyncMock(return_value=downloaded)
+    db.unavailable = AsyncMock(return_value=False)
+    return PendingAlbum("album", client, config, db)
+
+
+@pytest.mark.asyncio
+async def test_downloaded_album_skips_folder_and_artwork(tmp_path):
+    ids = {str(i) for i in get_album_track_ids("qobuz", ALBUM_RESP)}
+    pending = _pending_album(tmp_path, ids)
+
+    with patch("streamrip.media.album.download_artwork") as download_artwork:
+        album = await pending.resolve()
+
+    assert album is not None
+    assert album.tracks == []
+    download_artwork.assert_not_called()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_partially_downloaded_album(tmp_path):
+    ids = [str(i) for i in get_album_track_ids("qobuz", ALBUM_RESP)]
+    pending = _pending_album(tmp_path, set(ids[:1]))
+
+    with patch(
+        "streamrip.media.album.download_artwork",
+        AsyncMock(return_value=(None, None)),
+    ) as download_artwork:
+        album = await pending.resolve()
+
+    assert album is not None
+    assert [str(t.id) for t in album.tracks] == ids[1:]
+    download_artwork.assert_called_once()
+    assert os.listdir(tmp_path) == [os.path.basename(album.folder)]
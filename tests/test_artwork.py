@@ -0,0 +1,218 @@
+import asyncio
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+from streamrip.config import Config
+from streamrip.media.artwork import (
+    ArtworkCache,
+    download_artwork,
+    downscale_image,
+    remove_artwork_tempdirs,
+)
+from streamrip.metadata import Covers
+
+
+def _downloadable(downloads: list[str]):
+    """A BasicDownloadable that writes a 200x100 JPEG."""
+
+    def make(session, url, extension):
+        async def download(path, callback):
+            downloads.append(url)
+            await asyncio.sleep(0)
+            Image.new("RGB", (200, 100)).save(path, "JPEG")
+
+        d = MagicMock()
+        d.download = download
+        return d
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_artwork_cache(tmp_path):
+    cache = ArtworkCache(str(tmp_path / "cache"), 2**20)
+    out = str(tmp_path / "cover.jpg")
+    downloads = []
+    with patch("streamrip.media.artwork.BasicDownloadable", _downloadable(downloads)):
+        original = await cache.fetch(MagicMock(), "https://covers/1.jpg", -1, out)
+        small = await cache.fetch(MagicMock(), "https://covers/1.jpg", 50, out)
+        assert Image.open(out).size == (50, 25)
+        assert await cache.fetch(MagicMock(), "https://covers/1.jpg", 50, out) == small
+        # A new cache over the same folder, as in the next session
+        cache = ArtworkCache(str(tmp_path / "cache"), 2**20)
+        assert (
+            await cache.fetch(MagicMock(), "https://covers/1.jpg", -1, out) == original
+        )
+
+    assert downloads == ["https://covers/1.jpg"]
+    assert Image.open(original).size == (200, 100)
+    assert Image.open(small).size == (50, 25)
+    assert Image.open(out).size == (200, 100)
+    # Only the entries are left, no temporary files
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+        os.path.basename(p) for p in (original, small)
+    )
+
+
+@pytest.mark.asyncio
+async def test_artwork_cache_evicts_least_recently_used(tmp_path):
+    out = str(tmp_path / "cover.jpg")
+    downloads = []
+    with patch("streamrip.media.artwork.BasicDownloadable", _downloadable(downloads)):
+        cache = ArtworkCache(str(tmp_path / "cache"), 2**20)
+        first = await cache.fetch(MagicMock(), "https://covers/1.jpg", -1, out)
+        await cache.fetch(MagicMock(), "https://covers/2.jpg", -1, out)
+        # Using the first cover makes the second the least recently used
+        await cache.fetch(MagicMock(), "https://covers/1.jpg", -1, out)
+
+        # Enough for two and a half covers, so one is evicted
+        cache.max_size = os.stat(first).st_size * 5 // 2
+        third = await cache.fetch(MagicMock(), "https://covers/3.jpg", -1, out)
+
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+        os.path.basename(p) for p in (first, third)
+    )
+    assert cache.size() == os.stat(first).st_size + os.stat(third).st_size
+
+
+@pytest.mark.asyncio
+async def test_artwork_cache_loads_order_from_disk(tmp_path):
+    out = str(tmp_path / "cover.jpg")
+    with patch("streamrip.media.artwork.BasicDownloadable", _downloadable([])):
+        cache = ArtworkCache(str(tmp_path / "cache"), 2**20)
+        first = await cache.fetch(MagicMock(), "https://covers/1.jpg", -1, out)
+        second = await cache.fetch(MagicMock(), "https://covers/2.jpg", -1, out)
+        os.utime(first, (1, 1))
+        os.utime(second, (0, 0))
+
+        size = os.stat(first).st_size * 5 // 2
+        cache = ArtworkCache(str(tmp_path / "cache"), size)
+        third = await cache.fetch(MagicMock(), "https://covers/3.jpg", -1, out)
+
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+        os.path.basename(p) for p in (first, third)
+    )
+
+
+@pytest.mark.asyncio
+async def test_artwork_cache_keeps_pinned_entries(tmp_path):
+    out = str(tmp_path / "cover.jpg")
+    with patch("streamrip.media.artwork.BasicDownloadable", _downloadable([])):
+        cache = ArtworkCache(str(tmp_path / "cache"), 1)
+        first = await cache.fetch(MagicMock(), "https://covers/1.jpg", -1, out)
+        # As if another fetch were about to copy it
+        assert await cache._get("https://covers/1.jpg", -1) == first
+        second = await cache.fetch(MagicMock(), "https://covers/2.jpg", -1, out)
+        assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+            os.path.basename(p) for p in (first, second)
+        )
+
+        cache._unpin(first)
+        third = await cache.fetch(MagicMock(), "https://covers/3.jpg", -1, out)
+
+    # Entries are only evicted once they are no longer being copied from
+    assert os.listdir(tmp_path / "cache") == [os.path.basename(third)]
+    assert Image.open(out).size == (200, 100)
+
+
+@pytest.mark.asyncio
+async def test_artwork_downloaded_once(tmp_path):
+    config = Config.defaults().session.artwork
+    config.cache_size_mb = 0
+    config.embed_max_width = 50
+
+    def covers():
+        c = Covers()
+        c.set_cover("large", "https://covers/album.jpg", None)
+        return c
+
+    downloads = []
+    with patch("streamrip.media.artwork.BasicDownloadable", _downloadable(downloads)):
+        results = await asyncio.gather(
+            *[
+                download_artwork(MagicMock(), str(tmp_path), covers(), config, True)
+                for _ in range(20)
+            ]
+        )
+        # Another folder gets a copy of the finished image
+        other, _ = await download_artwork(
+            MagicMock(), str(tmp_path / "other"), covers(), config, True
+        )
+
+    assert downloads == ["https://covers/album.jpg"]
+    embed_path, saved_path = results[0]
+    assert saved_path is None
+    assert all(r == results[0] for r in results)
+    assert Image.open(embed_path).size == (50, 25)
+    assert other is not None
+    assert Image.open(other).size == (50, 25)
+    remove_artwork_tempdirs()
+
+
+@pytest.mark.asyncio
+async def test_embed_artwork_derived_from_saved(tmp_path):
+    config = Config.defaults().session.artwork
+    config.cache_size_mb = 0
+    config.saved_max_width = 100
+    config.embed_max_width = 50
+    covers = Covers()
+    covers.set_cover("large", "https://covers/album.jpg", None)
+
+    downloads = []
+    with patch("streamrip.media.artwork.BasicDownloadable", _downloadable(downloads)):
+        embed_path, saved_path = await download_artwork(
+            MagicMock(), str(tmp_path), covers, config, False
+        )
+
+    # The embedded cover is downscaled from the saved one
+    assert downloads == ["https://covers/album.jpg"]
+    assert saved_path is not None and embed_path is not None
+    assert Image.open(saved_path).size == (100, 50)
+    assert Image.open(embed_path).size == (50, 25)
+    remove_artwork_tempdirs()
+
+
+@pytest.mark.asyncio
+async def test_cached_cover_copied_over_stale_file(tmp_path):
+    config = Config.defaults().session.artwork
+    config.saved_max_width = -1
+    config.embed = False
+    covers = Covers()
+    covers.set_cover("large", "https://covers/album.jpg", None)
+    folder = tmp_path / "Album"
+    folder.mkdir()
+    (folder / "cover.jpg").write_bytes(b"stale")
+    cache = ArtworkCache(str(tmp_path / "cache"), 2**20)
+
+    with (
+        patch("streamrip.media.artwork.BasicDownloadable", _downloadable([])),
+        patch("streamrip.media.artwork.get_artwork_cache", return_value=cache),
+    ):
+        _, saved_path = await download_artwork(
+            MagicMock(), str(folder), covers, config, False
+        )
+
+    assert saved_path is not None
+    assert Image.open(saved_path).size == (200, 100)
+    # A copy, so changing the cover doesn't change the cache entry
+    entry = cache.entry_path("https://covers/album.jpg", -1)
+    assert os.stat(saved_path).st_ino != os.stat(entry).st_ino
+    assert sorted(os.listdir(folder)) == ["cover.jpg"]
+    remove_artwork_tempdirs()
+
+
+def test_downscale_image(tmp_path):
+    path = str(tmp_path / "cover.jpg")
+    Image.new("RGB", (2000, 1000), "red").save(path, "JPEG")
+    downscale_image(path, 300)
+    image = Image.open(path)
+    assert image.size == (300, 150)
+    assert image.format == "JPEG"
+    assert image.getpixel((150, 75))[0] > 200
+
+    # Already small enough
+    downscale_image(path, 500)
+    assert Image.open(path).size == (300, 150)
@@ -14,6 +14,7 @@ from streamrip.config import (
     DeezerConfig,
     DownloadsConfig,
     FilepathsConfig,
+    InvalidConfigError,
     LastFmConfig,
     MetadataConfig,
     MiscConfig,
@@ -136,7 +137,7 @@ def test_config_file_update():
     assert toml["cli"]["text_output"] is True  # type: ignore
     assert toml["cli"]["progress_bars"] is True  # type: ignore
     assert toml["cli"]["max_search_results"] == 100  # type: ignore
-    assert toml["misc"]["version"] == "2.0.6"  # type: ignore
+    assert toml["misc"]["version"] == "2.1.0"  # type: ignore
     assert "YouTubeVideos" in str(toml["youtube"]["video_downloads_folder"])
     # type: ignore
     os.remove("tests/test_config_old2.toml")
@@ -173,6 +174,8 @@ def test_sample_config_data_fields(sample_config_data):
             quality=3,
             download_booklets=True,
             secrets=["secret1", "secret2"],
+            validated_secret="secret2",
+            validated_secret_timestamp=1700000000,
         ),
         tidal=TidalConfig(
             user_id="userid",
@@ -213,6 +216,7 @@ def test_sample_config_data_fields(sample_config_data):
             embed_max_width=-1,
             save_artwork=True,
             saved_max_width=-1,
+            cache_size_mb=500,
         ),
         metadata=MetadataConfig(
             set_playlist_to_album=True,
@@ -237,6 +241,10 @@ def test_sample_config_data_fields(sample_config_data):
             downloads_path="downloadspath",
             failed_downloads_enabled=True,
             failed_downloads_path="faileddownloadspath",
+            isrc_duplicates="download",
+            link_playlist_tracks=False,
+            permanent_failure_ttl_hours=720,
+            transient_failure_ttl_hours=6,
         ),
         conversion=ConversionConfig(
             enabled=False,
@@ -244,6 +252,7 @@ def test_sample_config_data_fields(sample_config_data):
             sampling_rate=48000,
             bit_depth=24,
             lossy_bitrate=320,
+            targets=[],
         ),
         misc=MiscConfig(version="2.0", check_for_updates=True),
         _modified=False,
@@ -288,6 +297,34 @@ def test_config_dont_update_without_set_modified():
     assert conf2.session.downloads.folder == "test_folder"
 
 
+@pytest.mark.parametrize(
+    "target",
+    [
+        "OPUS",
+        {"codec": "OPUS"},
+        {"folder": "opus"},
+        {"codec": "WAV", "folder": "wav"},
+        {"codec": "OPUS", "folder": "opus", "lossy_bitrate": "128k"},
+        {"codec": "OPUS", "folder": "opus", "bitrate": 128},
+    ],
+)
+def test_invalid_conversion_target(target):
+    with pytest.raises(InvalidConfigError):
+        _config_with_targets([target])
+
+
+def test_conversion_target():
+    target = {"codec": "opus", "folder": "opus", "lossy_bitrate": 128}
+    assert _config_with_targets([target]).conversion.targets == [target]
+
+
+def _config_with_targets(targets: list) -> ConfigData:
+    with open(SAMPLE_CONFIG) as f:
+        toml = tomlkit.parse(f.read())
+    toml["conversion"]["targets"] = targets  # type: ignore
+    return ConfigData.from_toml(tomlkit.dumps(toml))
+
+
 # Other tests for the Config class can be added as needed
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import os
+import shutil
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from streamrip import converter
+
+
+@pytest.fixture(autouse=True)
+def ffmpeg():
+    with patch("streamrip.converter.shutil.which", return_value="/usr/bin/ffmpeg"):
+        yield
+
+
+@pytest.fixture
+def flac(tmp_path) -> str:
+    # 16 bit, 44.1 kHz
+    path = str(tmp_path / "track.flac")
+    shutil.copy("tests/silence.flac", path)
+    return path
+
+
+def test_satisfied_by_source(flac):
+    assert converter.FLAC(flac).satisfied_by_source()
+    assert converter.FLAC(flac, sampling_rate=48000, bit_depth=16).satisfied_by_source()
+    assert not converter.FLAC(flac, sampling_rate=22050).satisfied_by_source()
+    assert not converter.ALAC(flac).satisfied_by_source()
+    assert not converter.LAME(flac).satisfied_by_source()
+
+
+def test_lossy_satisfied_by_source(tmp_path):
+    mp3 = str(tmp_path / "track.mp3")
+
+    def probe(bitrate: int):
+        audio = MagicMock(spec=converter.mp3.MP3)
+        audio.info = MagicMock(bitrate=bitrate)
+        return patch("streamrip.converter.mutagen.File", return_value=audio)
+
+    with probe(320000):
+        assert converter.LAME(mp3).satisfied_by_source()
+        assert not converter.LAME(mp3, ffmpeg_arg="-b:a 128k").satisfied_by_source()
+        assert converter.LAME(mp3, ffmpeg_arg="-b:a 320k").satisfied_by_source()
+        assert not converter.LAME(mp3, ffmpeg_arg="-q:a 4").satisfied_by_source()
+    with probe(128000):
+        assert converter.LAME(mp3, ffmpeg_arg="-b:a 192k").satisfied_by_source()
+
+
+@pytest.mark.asyncio
+async def test_redundant_conversion_skipped(flac):
+    engine = converter.FLAC(flac, sampling_rate=48000, bit_depth=24)
+    with patch("streamrip.converter.asyncio.create_subprocess_exec") as ffmpeg:
+        await engine.convert(flac)
+    ffmpeg.assert_not_called()
+
+
+def test_stream_copy_command(flac):
+    engine = converter.FLAC(flac, sampling_rate=48000, bit_depth=16)
+    engine.final_fn = flac.replace("track.flac", "copy.flac")
+    engine.copy_stream = True
+    command = engine._gen_command()
+    assert command[command.index("-c:a") + 1] == "copy"
+    assert "-af" not in command
+
+
+def test_multi_output_command(flac, tmp_path):
+    lossless = converter.FLAC(flac, sampling_rate=44100, bit_depth=16)
+    lossless.set_output(str(tmp_path / "flac" / "track.flac"))
+    lossy = converter.OPUS(flac, ffmpeg_arg="-b:a 128k")
+    lossy.set_output(str(tmp_path / "opus" / "track.opus"))
+
+    command = converter._gen_command(flac, [lossless, lossy])
+    assert command.count("-i") == 1
+    assert command.index(lossless.tempfile) < command.index("libopus")
+    assert command[-1] == lossy.tempfile
+    assert command[command.index("-b:a") + 1] == "128k"
+
+
+@pytest.mark.asyncio
+async def test_convert_all(flac, tmp_path):
+    engines = []
+    for codec in ("ALAC", "OPUS"):
+        engine = converter.get(codec)(flac, remove_source=codec == "ALAC")
+        engine.set_output(str(tmp_path / f"track.{engine.container}"))
+        engines.append(engine)
+
+    def ffmpeg(*command, **_):
+        for engine in engines:
+            with open(engine.tempfile, "wb") as f:
+                f.write(b"audio")
+        process = AsyncMock(returncode=0)
+        process.communicate.return_value = (None, b"")
+        return process
+
+    with patch(
+        "streamrip.converter.asyncio.create_subprocess_exec", side_effect=ffmpeg
+    ) as run:
+        await converter.convert_all(engines)
+
+    run.assert_called_once()
+    assert sorted(os.listdir(tmp_path)) == ["track.m4a", "track.opus"]
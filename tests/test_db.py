@@ -0,0 +1,246 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from streamrip import db
+
+
+def _row(item_id: str, source: str = "qobuz") -> tuple:
+    return db.DownloadRecord(source, "track", item_id).as_row()
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    table = db.Downloads(str(tmp_path / "downloads.db"))
+    yield table
+    table.close()
+
+
+def _rows_on_disk(table: db.DatabaseBase) -> list:
+    with sqlite3.connect(table.path) as conn:
+        return list(conn.execute(f"SELECT * FROM {table.name}"))
+
+
+def test_uses_wal(downloads):
+    mode = downloads.conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_added_rows_are_batched(downloads):
+    downloads.add(_row("1"))
+    assert downloads.contains(id="1")
+    assert _rows_on_disk(downloads) == []
+
+    downloads.flush()
+    assert [r[2] for r in _rows_on_disk(downloads)] == ["1"]
+
+
+def test_full_batch_is_written(downloads):
+    for i in range(db.WRITE_BATCH_SIZE):
+        downloads.add(_row(str(i)))
+    assert len(_rows_on_disk(downloads)) == db.WRITE_BATCH_SIZE
+
+
+def test_duplicates_are_replaced(downloads):
+    downloads.add(_row("1"))
+    downloads.add(_row("1"))
+    downloads.flush()
+    downloads.add(_row("1"))
+    assert len(downloads.all()) == 1
+
+
+def test_close_writes_pending_rows(tmp_path):
+    path = str(tmp_path / "failed.db")
+    failed = db.Failed(path)
+    failed.add(("qobuz", "track", "123", 0, "", 0))
+    failed.close()
+
+    failed = db.Failed(path)
+    assert failed.contains(source="qobuz", id="123")
+    assert not failed.contains(source="tidal", id="123")
+    failed.close()
+
+
+def test_downloaded_ids_are_indexed(downloads):
+    downloads.add(_row("1"))
+    downloads.flush()
+    downloads.close()
+
+    reopened = db.Downloads(downloads.path)
+    assert reopened.contains(id="1")
+    assert reopened.contains(id=1)
+    assert reopened.contains(source="qobuz", id="1")
+    assert not reopened.contains(source="tidal", id="1")
+    reopened.add(_row("2", "tidal"))
+    assert reopened.ids == {"1", "2"}
+    reopened.close()
+
+
+def test_downloaded_many(tmp_path):
+    downloads = db.Downloads(str(tmp_path / "downloads.db"))
+    failed = db.Failed(str(tmp_path / "failed.db"))
+    database = db.Database(downloads, failed)
+    for i in range(3):
+        database.set_downloaded(db.DownloadRecord("qobuz", "track", str(i)))
+
+    assert database.downloaded_many([0, "2", "5"]) == {"0", "2"}
+    assert database.downloaded_many([0, "2", "5"], "qobuz") == {"0", "2"}
+    assert database.downloaded_many([0, "2", "5"], "deezer") == set()
+    assert db.Database(db.Dummy(), db.Dummy()).downloaded_many(["0"]) == set()
+
+    database.set_failed("qobuz", "track", "7")
+    assert failed.existing_ids(["7", "8"]) == {"7"}
+    assert failed.existing_ids(["7", "8"], "tidal") == set()
+    database.close()
+
+
+def test_download_records(tmp_path):
+    database = db.Database(db.Downloads(str(tmp_path / "d.db")), db.Dummy())
+    record = db.DownloadRecord(
+        "tidal", "track", "5", "/music/a.flac", 1000, 3, "USUM71703861", 1700000000
+    )
+    database.set_downloaded(record)
+    database.set_downloaded(db.DownloadRecord("qobuz", "track", "6", isrc="other"))
+
+    assert database.get_downloads(isrc="USUM71703861") == [record]
+    assert database.get_downloads(path="/music/a.flac") == [record]
+    assert database.get_downloads(source="qobuz")[0].timestamp > 0
+    database.close()
+
+
+def test_migrates_id_only_table(tmp_path):
+    path = str(tmp_path / "downloads.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE downloads (id TEXT UNIQUE NOT NULL)")
+        conn.executemany("INSERT INTO downloads VALUES (?)", [("1",), ("2",)])
+    conn.close()
+
+    downloads = db.Downloads(path)
+    assert downloads.conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert sorted(r[2] for r in downloads.all()) == ["1", "2"]
+    # The source of migrated rows is unknown, so they match every source
+    assert downloads.contains(source="deezer", id="1")
+    indexes = {row[1] for row in downloads.conn.execute("PRAGMA index_list(downloads)")}
+    assert {"downloads_id", "downloads_isrc", "downloads_path"} <= indexes
+    downloads.close()
+
+
+@pytest.mark.asyncio
+async def test_async_database_runs_on_its_own_thread(tmp_path):
+    downloads = db.Downloads(str(tmp_path / "downloads.db"))
+    database = db.AsyncDatabase(db.Database(downloads, db.Dummy()))
+    threads = set()
+    add = downloads.add
+
+    def record_thread(items):
+        threads.add(threading.current_thread().name)
+        add(items)
+
+    downloads.add = record_thread  # type: ignore
+
+    await database.set_downloaded(db.DownloadRecord("qobuz", "track", "1"))
+    assert await database.downloaded("1", "qobuz")
+    assert await database.downloaded_many(["1", "2"]) == {"1"}
+    assert [r.id for r in await database.get_downloads(source="qobuz")] == ["1"]
+    await database.close()
+
+    assert len(threads) == 1
+    assert threads.pop().startswith("streamrip-db")
+    assert [r[2] for r in _rows_on_disk(downloads)] == ["1"]
+
+
+def test_unavailable(tmp_path):
+    database = db.Database(db.Dummy(), db.Failed(str(tmp_path / "failed.db")))
+    database.set_failed("qobuz", "track", "1", permanent=True, reason="Geo")
+    database.set_failed("qobuz", "track", "2", reason="Timeout")
+    database.failed.add(
+        (
+            "qobuz",
+            "track",
+            "3",
+            0,
+            "Timeout",
+            int(time.time()) - db.TRANSIENT_FAILURE_TTL - 1,
+        )
+    )
+
+    assert database.unavailable("qobuz", "track", "1")
+    assert database.unavailable("qobuz", "track", "2")
+    assert not database.unavailable("qobuz", "track", "3")
+    assert not database.unavailable("tidal", "track", "1")
+    assert not database.unavailable("qobuz", "album", "1")
+    assert not db.Database(db.Dummy(), db.Dummy()).unavailable("qobuz", "track", "1")
+
+    # Failing again replaces the old entry
+    database.set_failed("qobuz", "track", "3", permanent=True)
+    assert len(database.get_failed_downloads()) == 3
+    assert database.unavailable("qobuz", "track", "3")
+    database.close()
+
+
+def test_unavailable_ttl(tmp_path):
+    failed = db.Failed(str(tmp_path / "failed.db"))
+    database = db.Database(db.Dummy(), failed, permanent_ttl=60, transient_ttl=0)
+    database.set_failed("qobuz", "track", "1", permanent=True, reason="Geo")
+    database.set_failed("qobuz", "track", "2", reason="Timeout")
+    failed.add(("qobuz", "track", "3", 1, "Geo", int(time.time()) - 61))
+
+    assert database.unavailable("qobuz", "track", "1")
+    assert not database.unavailable("qobuz", "track", "2")
+    assert not database.unavailable("qobuz", "track", "3")
+
+    database.permanent_ttl = 0
+    assert not database.unavailable("qobuz", "track", "1")
+    database.close()
+
+
+def test_migrates_failed_table(tmp_path):
+    path = str(tmp_path / "failed.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE failed_downloads (source TEXT NOT NULL, "
+            "media_type TEXT NOT NULL, id TEXT UNIQUE NOT NULL)"
+        )
+        conn.execute("INSERT INTO failed_downloads VALUES ('deezer', 'track', '1')")
+    conn.close()
+
+    failed = db.Failed(path)
+    assert failed.all() == [("deezer", "track", "1", 0, "", 0)]
+    # Old entries have no timestamp, so they are tried again
+    assert not db.Database(db.Dummy(), failed).unavailable("deezer", "track", "1")
+    failed.close()
+
+
+def test_iter_rows(downloads):
+    for i in range(25):
+        source = "qobuz" if i % 2 == 0 else "tidal"
+        downloads.add(_row(str(i), source))
+
+    rows = downloads.iter_rows(batch_size=10)
+    assert not isinstance(rows, list)
+    assert [r[2] for r in rows] == [str(i) for i in range(25)]
+
+    page = downloads.iter_rows(limit=5, offset=10)
+    assert [r[2] for r in page] == [str(i) for i in range(10, 15)]
+
+    tidal = downloads.iter_rows({"source": "tidal"}, limit=3)
+    assert [r[2] for r in tidal] == ["1", "3", "5"]
+
+    glob = downloads.iter_rows({"id": "1*"})
+    assert [r[2] for r in glob] == ["1"] + [str(i) for i in range(10, 20)]
+
+
+def test_iter_batches(downloads):
+    for i in range(25):
+        downloads.add(_row(str(i), "qobuz"))
+
+    ids = []
+    for batch in downloads.iter_batches(batch_size=10):
+        assert len(batch) <= 10
+        ids.extend(r[2] for r in batch)
+        # Rows replaced during iteration are not yielded again
+        downloads.add_many([_row(r[2], "qobuz") for r in batch])
+    assert ids == [str(i) for i in range(25)]
+    assert list(db.Dummy().iter_batches()) == []
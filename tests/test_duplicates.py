@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from streamrip import db
+from streamrip.config import Config, DatabaseConfig, InvalidConfigError
+from streamrip.media.playlist import PendingPlaylistTrack
+from streamrip.media.track import LinkedTrack, find_duplicate
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = db.Database(db.Downloads(str(tmp_path / "downloads.db")), db.Dummy())
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def existing(tmp_path, database) -> str:
+    path = str(tmp_path / "existing.flac")
+    shutil.copy("tests/silence.flac", path)
+    database.set_downloaded(
+        db.DownloadRecord("tidal", "track", "1", path=path, isrc="USUM71703861")
+    )
+    return path
+
+
+def _meta(isrc: str | None) -> MagicMock:
+    meta = MagicMock()
+    meta.isrc = isrc
+    meta.title = "Song"
+    meta.info.id = "2"
+    meta.info.quality = 3
+    meta.format_track_path.return_value = "01. Artist - Song"
+    return meta
+
+
+def _config(policy: str) -> Config:
+    config = Config.defaults()
+    config.session.database.isrc_duplicates = policy
+    return config
+
+
+def test_find_isrc(database, existing):
+    assert database.find_isrc("usum71703861").path == existing  # type: ignore
+    assert database.find_isrc("GBAYE0000000") is None
+
+    os.remove(existing)
+    assert database.find_isrc("USUM71703861") is None
+
+
+@pytest.mark.asyncio
+async def test_skip_duplicate(tmp_path, database, existing):
+    async_db = db.AsyncDatabase(database)
+    config = _config("skip")
+
+    assert await find_duplicate(
+        _meta("USUM71703861"), "qobuz", config, str(tmp_path), async_db
+    ) == (True, None)
+    assert await find_duplicate(
+        _meta("GBAYE0000000"), "qobuz", config, str(tmp_path), async_db
+    ) == (False, None)
+    assert await find_duplicate(
+        _meta(None), "qobuz", config, str(tmp_path), async_db
+    ) == (False, None)
+    assert await find_duplicate(
+        _meta("USUM71703861"), "qobuz", _config("download"), str(tmp_path), async_db
+    ) == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_link_duplicate(tmp_path, database, existing):
+    async_db = db.AsyncDatabase(database)
+    folder = str(tmp_path / "Playlist")
+
+    duplicate, linked = await find_duplicate(
+        _meta("USUM71703861"), "qobuz", _config("link"), folder, async_db
+    )
+    assert duplicate
+    assert isinstance(linked, LinkedTrack)
+
+    await linked.rip()
+
+    assert linked.download_path == os.path.join(folder, "01. Artist - Song.flac")
+    assert os.stat(linked.download_path).st_ino == os.stat(existing).st_ino
+    assert await async_db.downloaded("2", "qobuz")
+    [record] = await async_db.get_downloads(source="qobuz", id="2")
+    assert record.size == os.stat(existing).st_size
+
+
+@pytest.mark.asyncio
+async def test_invalid_duplicate_policy(tmp_path, database, existing):
+    with pytest.raises(InvalidConfigError):
+        DatabaseConfig(
+            "",
+            "",
+            "",
+            "",
+            isrc_duplicates="skipp",
+            link_playlist_tracks=False,
+            permanent_failure_ttl_hours=720,
+            transient_failure_ttl_hours=6,
+        )
+
+    config = _config("link")
+    config.session.database.isrc_duplicates = "skipp"
+    with pytest.raises(ValueError):
+        await find_duplicate(
+            _meta("USUM71703861"),
+            "qobuz",
+            config,
+            str(tmp_path),
+            db.AsyncDatabase(database),
+        )
+
+
+@pytest.mark.asyncio
+async def test_linked_track_retag(tmp_path, database, existing):
+    async_db = db.AsyncDatabase(database)
+    folder = str(tmp_path / "Playlist")
+    linked = LinkedTrack(
+        _meta("USUM71703861"), "qobuz", existing, _config("link"), folder, async_db
+    )
+    linked.retag = True
+    tag_file = AsyncMock()
+
+    with patch("streamrip.media.track.tag_file", tag_file):
+        await linked.rip()
+
+    # A separate copy, so tagging it doesn't change the original
+    assert os.stat(linked.download_path).st_ino != os.stat(existing).st_ino
+    assert os.listdir(folder) == ["01. Artist - Song.flac"]
+    staged = tag_file.call_args.args[0]
+    assert os.path.dirname(staged) == folder
+    assert tag_file.call_args.args[2] is None
+
+
+def _playlist_track(tmp_path, database, folder: str) -> PendingPlaylistTrack:
+    config = Config.defaults()
+    config.session.database.link_playlist_tracks = True
+    with open("tests/qobuz_track_resp.json") as f:
+        resp = json.load(f)
+    client = MagicMock(source="qobuz")
+    client.get_metadata = AsyncMock(return_value=resp)
+    return PendingPlaylistTrack(
+        str(resp["id"]),
+        client,
+        config,
+        folder,
+        "My Playlist",
+        5,
+        db.AsyncDatabase(database),
+    )
+
+
+@pytest.mark.asyncio
+async def test_playlist_track_linked_by_id(tmp_path, database):
+    path = str(tmp_path / "Album" / "01. Song.flac")
+    os.makedirs(os.path.dirname(path))
+    shutil.copy("tests/silence.flac", path)
+    database.set_downloaded(db.DownloadRecord("qobuz", "track", "216020864", path))
+    assert database.find_download("216020864", "qobuz").path == path  # type: ignore
+    assert database.find_download("216020864", "tidal") is None
+
+    pending = _playlist_track(tmp_path, database, str(tmp_path / "Playlist"))
+    linked = await pending.resolve()
+
+    assert isinstance(linked, LinkedTrack)
+    assert linked.existing_path == path
+    # The playlist number and album are written to the copy
+    assert linked.retag
+    assert linked.meta.tracknumber == 5
+    assert linked.meta.album.album == "My Playlist"
+
+    with patch("streamrip.media.track.tag_file", AsyncMock()):
+        await linked.rip()
+
+    # The album download's record is kept, and the link has its own
+    [record] = database.get_downloads(source="qobuz", media_type="track")
+    assert record.path == path
+    [link] = database.get_downloads(source="qobuz", media_type=db.LINK_MEDIA_TYPE)
+    assert link.path == linked.download_path
+    assert link.size == os.stat(linked.download_path).st_size
+    assert database.downloads.ids == {"216020864"}
+
+    # The next run skips it before fetching metadata
+    pending = _playlist_track(tmp_path, database, str(tmp_path / "Playlist"))
+    assert await pending.resolve() is None
+    pending.client.get_metadata.assert_not_called()
+    # Other playlists still get their own link
+    other = _playlist_track(tmp_path, database, str(tmp_path / "Other"))
+    assert isinstance(await other.resolve(), LinkedTrack)
+
+
+@pytest.mark.asyncio
+async def test_playlist_track_already_in_folder(tmp_path, database):
+    folder = str(tmp_path / "Playlist")
+    path = os.path.join(folder, "05. Song.flac")
+    os.makedirs(folder)
+    shutil.copy("tests/silence.flac", path)
+    database.set_downloaded(db.DownloadRecord("qobuz", "track", "216020864", path))
+
+    pending = _playlist_track(tmp_path, database, folder)
+    assert await pending.resolve() is None
+    pending.client.get_metadata.assert_not_called()
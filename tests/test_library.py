@@ -0,0 +1,100 @@
+import os
+import shutil
+from unittest.mock import MagicMock
+
+from mutagen.flac import FLAC
+from mutagen.mp4 import MP4
+
+from streamrip import db
+from streamrip.library import (
+    LIBRARY_SOURCE,
+    _quality,
+    import_library,
+    iter_audio_files,
+    read_library_row,
+)
+
+
+def _library(tmp_path) -> str:
+    folder = tmp_path / "library"
+    (folder / "Artist - Album").mkdir(parents=True)
+    tagged = str(folder / "Artist - Album" / "01. Artist - Song.flac")
+    shutil.copy("tests/silence.flac", tagged)
+    audio = FLAC(tagged)
+    audio["ISRC"] = "usum71703861"
+    audio.save()
+    shutil.copy("tests/silence.flac", folder / "untagged.flac")
+    (folder / "cover.jpg").write_bytes(b"")
+    return str(folder)
+
+
+def test_iter_audio_files(tmp_path):
+    folder = _library(tmp_path)
+    assert sorted(os.path.basename(p) for p in iter_audio_files(folder)) == [
+        "01. Artist - Song.flac",
+        "untagged.flac",
+    ]
+
+
+def test_iter_nested_audio_files(tmp_path):
+    expected = []
+    for i in range(5):
+        folder = tmp_path.joinpath(*[f"{i}-{depth}" for depth in range(i + 1)])
+        folder.mkdir(parents=True)
+        (folder / f"{i}.mp3").write_bytes(b"")
+        expected.append(str(folder / f"{i}.mp3"))
+
+    assert sorted(iter_audio_files(str(tmp_path), threads=2)) == sorted(expected)
+
+
+def test_read_library_row(tmp_path):
+    folder = _library(tmp_path)
+    path = os.path.join(folder, "Artist - Album", "01. Artist - Song.flac")
+    record = db.DownloadRecord(*read_library_row(path))  # type: ignore
+
+    assert record.source == LIBRARY_SOURCE
+    assert record.path == path
+    assert record.isrc == "USUM71703861"
+    assert record.size == os.path.getsize(path)
+    assert read_library_row(os.path.join(folder, "cover.jpg")) is None
+
+
+def test_import_library(tmp_path):
+    folder = _library(tmp_path)
+    downloads = db.Downloads(str(tmp_path / "downloads.db"))
+    database = db.Database(downloads, db.Dummy())
+
+    counts = []
+    assert import_library(folder, downloads, workers=1, callback=counts.append) == 2
+    assert counts == [2]
+
+    records = database.get_downloads(isrc="USUM71703861")
+    assert [os.path.basename(r.path) for r in records] == ["01. Artist - Song.flac"]
+    assert len(database.get_downloads(source=LIBRARY_SOURCE)) == 2
+
+    # Importing again updates the existing records
+    import_library(folder, downloads, workers=1)
+    assert len(downloads.all()) == 2
+    database.close()
+
+
+def test_imported_ids_not_indexed(tmp_path):
+    folder = _library(tmp_path)
+    downloads = db.Downloads(str(tmp_path / "downloads.db"))
+    import_library(folder, downloads, workers=1)
+
+    assert len(downloads.ids) == 0
+    assert downloads.contains(isrc="USUM71703861")
+    # Also when the index is loaded from the table
+    downloads._ids = None
+    assert len(downloads.ids) == 0
+    assert downloads.contains(isrc="USUM71703861")
+    downloads.close()
+
+
+def test_alac_quality():
+    audio = MagicMock(spec=MP4)
+    audio.info = MagicMock(codec="alac", bits_per_sample=24, sample_rate=96000)
+    assert _quality(audio) == 3
+    audio.info.codec = "mp4a.40.2"
+    assert _quality(audio) == 1
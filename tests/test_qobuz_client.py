@@ -1,6 +1,7 @@
 import hashlib
 import logging
 import os
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from util import arun
@@ -8,7 +9,7 @@ from util import arun
 from streamrip.client.downloadable import BasicDownloadable
 from streamrip.client.qobuz import QobuzClient
 from streamrip.config import Config
-from streamrip.exceptions import MissingCredentialsError
+from streamrip.exceptions import MissingCredentialsError, NonStreamableError
 
 logger = logging.getLogger("streamrip")
 
@@ -81,3 +82,130 @@ def test_client_search_no_limit(qobuz_client):
         total += len(r["albums"]["items"])
         correct_total = max(correct_total, r["albums"]["total"])
     assert total == correct_total
+
+
+def _mock_paginated_api(total: int, key: str, page_limit: int = 500):
+    async def api_request(epoint, params):
+        offset = params["offset"]
+        limit = min(params["limit"], page_limit)
+        items = [{"id": str(i)} for i in range(offset, min(offset + limit, total))]
+        return 200, {
+            "name": "test",
+            key: {"items": items, "total": total, "limit": limit, "offset": offset},
+        }
+
+    return AsyncMock(side_effect=api_request)
+
+
+@pytest.mark.asyncio
+async def test_get_metadata_fetches_all_artist_albums():
+    client = QobuzClient(Config.defaults())
+    client._api_request = _mock_paginated_api(1234, "albums")
+
+    resp = await client.get_metadata("123", "artist")
+
+    assert [a["id"] for a in resp["albums"]["items"]] == [str(i) for i in range(1234)]
+    offsets = sorted(c.args[1]["offset"] for c in client._api_request.call_args_list)
+    assert offsets == [0, 500, 1000]
+    assert all(c.args[1]["extra"] == "albums" for c in client._api_request.mock_calls)
+
+
+@pytest.mark.asyncio
+async def test_user_favorites_paginate_by_type():
+    client = QobuzClient(Config.defaults())
+    client._api_request = _mock_paginated_api(30, "tracks", page_limit=10)
+
+    pages = await client.get_user_favorites("track", limit=25)
+
+    assert len(pages) == 3
+
+
+@pytest.mark.asyncio
+async def test_paginate_non_200_raises():
+    client = QobuzClient(Config.defaults())
+    client._api_request = AsyncMock(return_value=(404, {"message": "not found"}))
+
+    with pytest.raises(NonStreamableError):
+        await client.get_metadata("123", "playlist")
+
+
+def _login_client(validated_secret: str) -> QobuzClient:
+    config = Config.defaults()
+    c = config.session.qobuz
+    c.email_or_userid, c.password_or_token = "user", "token"
+    c.app_id, c.secrets = "12345", ["secret1", "secret2"]
+    c.validated_secret = validated_secret
+    client = QobuzClient(config)
+    client.get_session = AsyncMock(return_value=MagicMock(headers={}))
+    login_resp = {
+        "user": {"credential": {"parameters": {"lossy_streaming": True}}},
+        "user_auth_token": "uat",
+    }
+    client._api_request = AsyncMock(return_value=(200, login_resp))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_login_uses_validated_secret():
+    client = _login_client("secret2")
+    client._test_secret = AsyncMock()
+
+    await client.login()
+
+    assert client.secret == "secret2"
+    client._test_secret.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_login_validates_and_saves_secret():
+    client = _login_client("")
+    client._test_secret = AsyncMock(side_effect=[None, "secret2"])
+
+    await client.login()
+
+    assert client.secret == "secret2"
+    assert client.config.file.qobuz.validated_secret == "secret2"
+    assert client.config.file.modified
+
+
+@pytest.mark.asyncio
+async def test_rejected_secret_is_revalidated():
+    client = _login_client("secret1")
+    await client.login()
+    client._test_secret = AsyncMock(side_effect=[None, "secret2"])
+    client._request_file_url = AsyncMock(
+        side_effect=[(400, {}), (200, {"url": "https://example.com/track.flac"})]
+    )
+
+    downloadable = await client.get_downloadable("19512574", 3)
+
+    assert downloadable.url == "https://example.com/track.flac"
+    assert client.secret == "secret2"
+    assert client._request_file_url.call_args.args[2] == "secret2"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "code,message,permanent",
+    [
+        ("TrackRestrictedByGeolocation", "Track restricted by geolocation.", True),
+        (
+            "FormatRestrictedByFormatAvailability",
+            "Format restricted by format availability.",
+            False,
+        ),
+        ("UserUncredentialed", "User uncredentialed.", False),
+    ],
+)
+async def test_restricted_track(code, message, permanent):
+    client = _login_client("secret1")
+    await client.login()
+    client._request_file_url = AsyncMock(
+        return_value=(200, {"restrictions": [{"code": code}]})
+    )
+
+    with pytest.raises(NonStreamableError) as e:
+        await client.get_downloadable("19512574", 3)
+
+    assert e.value.message == message
+    assert e.value.permanent is permanent
@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from streamrip import db
+from streamrip.config import Config
+from streamrip.rip.main import Main
+
+
+@pytest.fixture
+def main(tmp_path):
+    config = Config.defaults()
+    config.session.database.downloads_path = str(tmp_path / "downloads.db")
+    config.session.database.failed_downloads_path = str(tmp_path / "failed.db")
+    return Main(config)
+
+
+def _pending(main: Main, source: str, media_type: str, id: str):
+    """A pending item that succeeds for even IDs and fails for odd ones."""
+    pending = MagicMock()
+
+    async def resolve():
+        if int(id) % 2 == 1:
+            return None
+        media = MagicMock()
+
+        async def rip():
+            await main.database.set_downloaded(
+                db.DownloadRecord(source, media_type, id)
+            )
+
+        media.rip = rip
+        return media
+
+    pending.resolve = resolve
+    return pending
+
+
+@pytest.mark.asyncio
+async def test_retry_failed(main):
+    database = main.database.db
+    for source, id in (("qobuz", "1"), ("qobuz", "2"), ("tidal", "4")):
+        database.set_failed(source, "track", id, permanent=True, reason="Geo")
+
+    main.get_logged_in_clients = AsyncMock(
+        side_effect=lambda sources: {s: MagicMock(source=s) for s in sources}
+    )
+    main._pending_by_id = lambda client, media_type, id: _pending(
+        main, client.source, media_type, id
+    )
+
+    assert await main.retry_failed(max_concurrent=2) == (2, 3)
+
+    main.get_logged_in_clients.assert_called_once()
+    assert set(main.get_logged_in_clients.call_args.args[0]) == {"qobuz", "tidal"}
+    # Only the item that failed again is left, with its original reason
+    rows = database.get_failed_downloads()
+    assert [(r[0], r[2], r[3], r[4]) for r in rows] == [("qobuz", "1", 1, "Geo")]
+    await main.database.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_failed_empty(main):
+    main.get_logged_in_clients = AsyncMock()
+    assert await main.retry_failed() == (0, 0)
+    main.get_logged_in_clients.assert_not_called()
+    await main.database.close()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_retry_keeps_row(main):
+    database = main.database.db
+    database.set_failed("qobuz", "track", "2", permanent=True, reason="Geo")
+
+    async def resolve():
+        # Not skipped by the negative cache while it is retried
+        assert not await main.database.unavailable("qobuz", "track", "2")
+        raise asyncio.CancelledError
+
+    main.get_logged_in_clients = AsyncMock(
+        side_effect=lambda sources: {s: MagicMock(source=s) for s in sources}
+    )
+    main._pending_by_id = lambda *_: MagicMock(resolve=resolve)
+
+    with pytest.raises(asyncio.CancelledError):
+        await main.retry_failed()
+
+    rows = database.get_failed_downloads()
+    assert [(r[0], r[2], r[3], r[4]) for r in rows] == [("qobuz", "2", 1, "Geo")]
+    assert database.unavailable("qobuz", "track", "2")
+    await main.database.close()
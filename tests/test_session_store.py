@@ -0,0 +1,93 @@
+import os
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from streamrip.client import DeezerClient, QobuzClient, SessionStore
+from streamrip.config import Config
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "sessions.json")
+
+
+def _read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def test_session_round_trip(store_path):
+    store = SessionStore(store_path)
+    store.set("qobuz", "user:pass", {"uat": "token"}, time.time() + 60)
+    store.save()
+
+    assert SessionStore(store_path).get("qobuz", "user:pass") == {"uat": "token"}
+
+
+@pytest.mark.asyncio
+async def test_session_credentials_not_stored(store_path):
+    config = Config.defaults()
+    config.session.deezer.arl = "secret-arl"
+    store = SessionStore(store_path)
+    client = DeezerClient(config, store)
+    client.get_session = AsyncMock()
+
+    def login_via_arl(arl):
+        client.client.session.cookies.set("arl", arl, domain=".deezer.com")
+        client.client.session.cookies.set("sid", "secret-sid", domain=".deezer.com")
+        return True
+
+    with patch.object(client.client, "login_via_arl", side_effect=login_via_arl):
+        await client.login()
+    store.save()
+
+    assert os.stat(store_path).st_mode & 0o777 == 0o600
+    contents = _read(store_path)
+    assert "secret-arl" not in contents
+    assert "secret-sid" not in contents
+
+    # The ARL cookie comes back from the config
+    restored = DeezerClient(config, SessionStore(store_path))
+    restored.get_session = AsyncMock()
+    with patch.object(restored.client, "change_account"):
+        await restored.login()
+    assert restored.client.gw.session.cookies.get("arl") == "secret-arl"
+
+
+def test_session_mismatch_or_expired(store_path):
+    store = SessionStore(store_path)
+    store.set("qobuz", "user:pass", {"uat": "token"}, time.time() + 60)
+    store.set("tidal", "token", {}, time.time() - 1)
+
+    assert store.get("qobuz", "other:pass") is None
+    assert store.get("tidal", "token") is None
+    assert store.get("deezer", "arl") is None
+
+
+def test_corrupt_session_file_ignored(store_path):
+    with open(store_path, "w") as f:
+        f.write("{not json")
+
+    assert SessionStore(store_path).get("qobuz", "user:pass") is None
+
+
+@pytest.mark.asyncio
+async def test_qobuz_login_with_saved_session(store_path):
+    config = Config.defaults()
+    c = config.session.qobuz
+    c.email_or_userid, c.password_or_token = "user", "token"
+    c.app_id, c.secrets, c.validated_secret = "12345", ["secret"], "secret"
+
+    store = SessionStore(store_path)
+    client = QobuzClient(config, store)
+    store.set("qobuz", client._credentials(), {"uat": "saved"}, time.time() + 60)
+    client.get_session = AsyncMock(return_value=MagicMock(headers={}))
+    client._api_request = AsyncMock()
+
+    await client.login()
+
+    assert client.logged_in
+    assert client.session.headers["X-User-Auth-Token"] == "saved"
+    client._api_request.assert_not_called()
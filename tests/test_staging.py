@@ -0,0 +1,122 @@
+import os
+import shutil
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from streamrip import db
+from streamrip.config import Config
+from streamrip.filepath_utils import link_or_copy, staging_path
+from streamrip.media.track import Track
+
+
+def _track(folder: str) -> Track:
+    config = Config.defaults()
+    config.session.conversion.enabled = False
+    config.session.cli.progress_bars = False
+
+    async def download(path, callback, tag_space=0):
+        shutil.copy("tests/silence.flac", path)
+
+    downloadable = MagicMock(extension="flac", source="qobuz")
+    downloadable.download = download
+    downloadable.size = AsyncMock(return_value=0)
+    meta = MagicMock(tracknumber=1, title="Song", isrc=None)
+    meta.info.id = "123"
+    meta.info.quality = 2
+    return Track(
+        meta=meta,
+        downloadable=downloadable,
+        config=config,
+        folder=folder,
+        cover_path=None,
+        db=db.AsyncDatabase(db.Database(db.Dummy(), db.Dummy())),
+    )
+
+
+@pytest.mark.asyncio
+async def test_track_is_staged(tmp_path):
+    folder = str(tmp_path / "album")
+    track = _track(folder)
+    seen = []
+
+    async def tag_file(path, meta, cover_path):
+        # Tagged while it is still hidden
+        seen.append((path, sorted(os.listdir(folder))))
+
+    with (
+        patch("streamrip.media.track.track_filename", return_value="01. Song"),
+        patch("streamrip.media.track.reserved_tag_space", return_value=0),
+        patch("streamrip.media.track.tag_file", tag_file),
+    ):
+        await track.rip()
+
+    final = os.path.join(folder, "01. Song.flac")
+    assert track.download_path == final
+    assert seen == [(track.staging_path, [os.path.basename(track.staging_path)])]
+    assert os.path.basename(track.staging_path).startswith(".")
+    assert os.listdir(folder) == ["01. Song.flac"]
+    assert os.stat(final).st_size == os.stat("tests/silence.flac").st_size
+    await track.db.close()
+
+
+@pytest.mark.asyncio
+async def test_targets_converted_with_original_kept(tmp_path):
+    folder = str(tmp_path / "downloads" / "album")
+    track = _track(folder)
+    c = track.config.session
+    c.downloads.folder = str(tmp_path / "downloads")
+    c.conversion.targets = [
+        {"codec": "OPUS", "folder": str(tmp_path / "opus"), "lossy_bitrate": 96}
+    ]
+    convert_all = AsyncMock()
+
+    with (
+        patch("streamrip.media.track.track_filename", return_value="01. Song"),
+        patch("streamrip.media.track.reserved_tag_space", return_value=0),
+        patch("streamrip.media.track.tag_file", AsyncMock()),
+        patch("streamrip.converter.shutil.which", return_value="/usr/bin/ffmpeg"),
+        patch("streamrip.media.track.converter.convert_all", convert_all),
+    ):
+        await track.rip()
+
+    [engines] = convert_all.call_args.args
+    [opus] = engines
+    assert opus.final_fn == str(tmp_path / "opus" / "album" / "01. Song.opus")
+    assert opus.ffmpeg_arg == "-b:a 96k"
+    # Not converted, since conversion.enabled is false
+    assert os.listdir(folder) == ["01. Song.flac"]
+    await track.db.close()
+
+
+def test_staging_path():
+    path = os.path.join("music", "x" * 250 + ".flac")
+    staged = staging_path(path)
+    assert os.path.dirname(staged) == "music"
+    assert staged.endswith(".flac")
+    assert len(os.path.basename(staged)) < 64
+    assert staging_path(path) == staged
+
+
+def test_link_or_copy_fallback(tmp_path):
+    src = str(tmp_path / "src.flac")
+    dst = str(tmp_path / "dst.flac")
+    shutil.copy("tests/silence.flac", src)
+    with patch("streamrip.filepath_utils.os.link", side_effect=OSError):
+        link_or_copy(src, dst)
+    assert sorted(os.listdir(tmp_path)) == ["dst.flac", "src.flac"]
+    assert os.stat(dst).st_ino != os.stat(src).st_ino
+
+
+def test_link_or_copy_replaces_other_file(tmp_path):
+    src = str(tmp_path / "src.flac")
+    dst = str(tmp_path / "dst.flac")
+    shutil.copy("tests/silence.flac", src)
+    with open(dst, "wb") as f:
+        f.write(b"other")
+
+    link_or_copy(src, dst)
+    assert os.stat(dst).st_ino == os.stat(src).st_ino
+    # Already linked
+    link_or_copy(src, dst)
+    assert sorted(os.listdir(tmp_path)) == ["dst.flac", "src.flac"]
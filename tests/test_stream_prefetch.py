@@ -0,0 +1,116 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import aiohttp
+import pytest
+
+from streamrip.exceptions import NonStreamableError
+from streamrip.media.playlist import Playlist
+from streamrip.media.track import STREAM_URL_TTL, Track
+
+
+def _track(**kwargs) -> Track:
+    return Track(
+        meta=MagicMock(),
+        downloadable=MagicMock(),
+        config=MagicMock(),
+        folder="",
+        cover_path=None,
+        db=MagicMock(),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_fresh_downloadable_is_kept():
+    refresh = AsyncMock()
+    track = _track(refresh_downloadable=refresh)
+    original = track.downloadable
+
+    await track._refresh_stale_downloadable()
+
+    refresh.assert_not_called()
+    assert track.downloadable is original
+
+
+@pytest.mark.asyncio
+async def test_stale_downloadable_is_refreshed():
+    new = MagicMock()
+    refresh = AsyncMock(return_value=new)
+    track = _track(
+        refresh_downloadable=refresh,
+        downloadable_time=time.time() - STREAM_URL_TTL - 1,
+    )
+
+    await track._refresh_stale_downloadable()
+
+    refresh.assert_called_once()
+    assert track.downloadable is new
+    assert time.time() - track.downloadable_time < STREAM_URL_TTL
+
+
+@pytest.mark.asyncio
+async def test_unstreamable_refresh_is_recorded():
+    refresh = AsyncMock(side_effect=NonStreamableError("gone", permanent=True))
+    track = _track(
+        refresh_downloadable=refresh,
+        downloadable_time=time.time() - STREAM_URL_TTL - 1,
+    )
+    track.db = AsyncMock()
+
+    assert not await track._refresh_stale_downloadable()
+
+    track.db.set_failed.assert_called_once()
+    assert track.db.set_failed.call_args.kwargs["permanent"] is True
+
+
+@pytest.mark.asyncio
+async def test_refresh_request_error_is_recorded():
+    refresh = AsyncMock(side_effect=aiohttp.ClientConnectionError("reset"))
+    track = _track(
+        refresh_downloadable=refresh,
+        downloadable_time=time.time() - STREAM_URL_TTL - 1,
+    )
+    track.db = AsyncMock()
+
+    assert not await track._refresh_stale_downloadable()
+
+    track.db.set_failed.assert_called_once()
+    assert "permanent" not in track.db.set_failed.call_args.kwargs
+
+
+@pytest.mark.asyncio
+async def test_playlist_resolves_next_batch_during_downloads():
+    events = []
+
+    def pending(i):
+        item = MagicMock()
+        track = MagicMock()
+
+        async def resolve():
+            events.append(("resolve", i))
+            return track
+
+        async def rip():
+            events.append(("rip start", i))
+            await asyncio.sleep(0.01)
+            events.append(("rip end", i))
+
+        item.resolve = resolve
+        track.rip = rip
+        return item
+
+    playlist = Playlist(
+        name="Test Playlist",
+        config=MagicMock(),
+        client=MagicMock(),
+        tracks=[pending(i) for i in range(25)],
+    )
+
+    await playlist.download()
+
+    # Track 20 is in the second batch and is resolved before the first batch
+    # has finished downloading
+    assert events.index(("resolve", 20)) < events.index(("rip end", 0))
+    assert sum(1 for e in events if e[0] == "rip end") == 25
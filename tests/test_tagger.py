@@ -1,18 +1,25 @@
+import asyncio
+import copy
 import os
 import shutil
+from unittest.mock import patch
 
 import pytest
 from mutagen.flac import FLAC
+from mutagen.id3 import ID3
 from util import arun
 
 from streamrip.metadata import (
     AlbumInfo,
     AlbumMetadata,
     Covers,
+    TagSpaceReserver,
     TrackInfo,
     TrackMetadata,
+    reserved_tag_space,
     tag_file,
 )
+from streamrip.metadata.tagger import Container, CoverCache
 
 TEST_FLAC_ORIGINAL = "tests/silence.flac"
 TEST_FLAC_COPY = "tests/silence_copy.flac"
@@ -109,3 +116,127 @@ def test_tag_flac_cover(sample_metadata):
         assert file.pictures[0].data == img.read()
     assert "purchase_date" not in file, file["purchase_date"]
     os.remove(TEST_FLAC_COPY)
+
+
+def _feed(reserver: TagSpaceReserver, data: bytes, chunk_size: int) -> bytes:
+    out = b"".join(
+        reserver.feed(data[i : i + chunk_size]) for i in range(0, len(data), chunk_size)
+    )
+    return out + reserver.flush()
+
+
+def test_tag_flac_in_place(sample_metadata, tmp_path):
+    with open(TEST_FLAC_ORIGINAL, "rb") as f:
+        original = f.read()
+    space = reserved_tag_space(sample_metadata, test_cover)
+    path = str(tmp_path / "track.flac")
+    with open(path, "wb") as f:
+        f.write(_feed(TagSpaceReserver("flac", space), original, 7))
+
+    assert os.path.getsize(path) >= len(original) + space - 4096
+    size = os.path.getsize(path)
+    arun(tag_file(path, sample_metadata, test_cover))
+    # Tags fit in the reserved padding, so the file wasn't resized
+    assert os.path.getsize(path) == size
+    file = FLAC(path)
+    assert file["title"][0] == "testtitle"
+    with open(test_cover, "rb") as img:
+        assert file.pictures[-1].data == img.read()
+    assert file.info.total_samples == FLAC(TEST_FLAC_ORIGINAL).info.total_samples
+
+
+def test_tag_mp3_in_place(sample_metadata, tmp_path):
+    # Bare MPEG frame headers, without an ID3 tag
+    frames = b"\xff\xfb\x90\x00" + bytes(1000)
+    space = reserved_tag_space(sample_metadata, test_cover)
+    path = str(tmp_path / "track.mp3")
+    with open(path, "wb") as f:
+        f.write(_feed(TagSpaceReserver("mp3", space), frames, 3))
+
+    size = os.path.getsize(path)
+    assert size == 10 + space + len(frames)
+    arun(tag_file(path, sample_metadata, test_cover))
+    assert os.path.getsize(path) == size
+    assert ID3(path)["TIT2"].text == ["testtitle"]
+    with open(path, "rb") as f:
+        assert f.read()[-len(frames) :] == frames
+
+
+def test_tag_space_reserver_passthrough():
+    data = b"not an audio header" * 10
+    assert _feed(TagSpaceReserver("flac", 1000), data, 5) == data
+    assert _feed(TagSpaceReserver("m4a", 1000), data, 5) == data
+    assert _feed(TagSpaceReserver("mp3", 0), data, 5) == data
+
+
+@pytest.mark.asyncio
+async def test_cover_cache():
+    cache = CoverCache(maxsize=1)
+    with patch.object(
+        Container, "make_cover", autospec=True, side_effect=Container.make_cover
+    ) as make_cover:
+        covers = await asyncio.gather(
+            *[cache.get(Container.FLAC, test_cover) for _ in range(5)]
+        )
+        # Read and built once, and shared by every caller
+        assert make_cover.call_count == 1
+        assert all(c is covers[0] for c in covers)
+        assert len(covers[0].data) == os.stat(test_cover).st_size
+
+        assert await cache.get(Container.FLAC, test_cover) is covers[0]
+        assert make_cover.call_count == 1
+
+        # Evicts the FLAC picture
+        await cache.get(Container.MP3, test_cover)
+        await cache.get(Container.FLAC, test_cover)
+        assert make_cover.call_count == 3
+    assert len(cache.pending) == 0
+
+
+@pytest.mark.asyncio
+async def test_tag_files_batched_per_album(sample_metadata, tmp_path):
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"{i}.flac")
+        shutil.copy(TEST_FLAC_ORIGINAL, path)
+        paths.append(path)
+    tracks = []
+    for i, path in enumerate(paths):
+        meta = copy.copy(sample_metadata)
+        meta.title = f"title {i}"
+        tracks.append((path, meta))
+
+    with patch.object(
+        Container,
+        "get_album_tag_pairs",
+        autospec=True,
+        side_effect=Container.get_album_tag_pairs,
+    ) as album_pairs:
+        await asyncio.gather(*[tag_file(path, meta, None) for path, meta in tracks])
+    # The first file starts a job, and the others queued meanwhile are
+    # written together in the next one with the album's tags computed once
+    assert album_pairs.call_count == 2
+
+    for i, path in enumerate(paths):
+        file = FLAC(path)
+        assert file["title"] == [f"title {i}"]
+        assert file["album"] == ["testalbum"]
+        assert file["tracktotal"] == ["14"]
+
+
+@pytest.mark.asyncio
+async def test_tag_batch_error(sample_metadata, tmp_path):
+    path = str(tmp_path / "track.flac")
+    shutil.copy(TEST_FLAC_ORIGINAL, path)
+    missing = str(tmp_path / "missing.flac")
+
+    results = await asyncio.gather(
+        tag_file(path, sample_metadata, None),
+        tag_file(missing, sample_metadata, None),
+        tag_file(path, sample_metadata, None),
+        return_exceptions=True,
+    )
+    # Only the missing file fails, others in its batch are still tagged
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], Exception)
+    assert FLAC(path)["title"] == ["testtitle"]
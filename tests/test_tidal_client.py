@@ -0,0 +1,61 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from streamrip.client.tidal import TidalClient
+from streamrip.config import Config
+
+
+@pytest.fixture
+def tidal_client():
+    config = Config.defaults()
+    config.session.downloads.requests_per_minute = -1
+    return TidalClient(config)
+
+
+def _page(offset: int, limit: int) -> dict:
+    return {"items": [{"item": {"id": i}} for i in range(offset, offset + limit)]}
+
+
+@pytest.mark.asyncio
+async def test_get_metadata_fetches_all_item_pages(tidal_client):
+    async def api_request(path, params=None, base=None):
+        if path == "playlists/abc":
+            return {"numberOfTracks": 250}
+        return _page(params["offset"], params["limit"])
+
+    tidal_client._api_request = AsyncMock(side_effect=api_request)
+
+    item = await tidal_client.get_metadata("abc", "playlist")
+
+    assert [t["id"] for t in item["tracks"]] == list(range(250))
+    offsets = [
+        call.args[1]["offset"]
+        for call in tidal_client._api_request.call_args_list
+        if call.args[0].endswith("/items")
+    ]
+    assert offsets == [0, 100, 200]
+
+
+@pytest.mark.asyncio
+async def test_search_respects_limit(tidal_client):
+    async def api_request(path, params=None, base=None):
+        offset = params.get("offset", 0)
+        page = _page(offset, params["limit"])
+        page["totalNumberOfItems"] = 1000
+        return page
+
+    tidal_client._api_request = AsyncMock(side_effect=api_request)
+
+    pages = await tidal_client.search("track", "query", limit=150)
+
+    assert sum(len(p["items"]) for p in pages) == 150
+    assert len(pages) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_no_results(tidal_client):
+    tidal_client._api_request = AsyncMock(
+        return_value={"items": [], "totalNumberOfItems": 0}
+    )
+    assert await tidal_client.search("album", "nothing") == []